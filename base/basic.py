@@ -1,3 +1,5 @@
+from typing import Any, List, Tuple
+
 from base.block import BlockFixed
 
 
@@ -18,16 +20,25 @@ class Drawer(BlockFixed):
         pass
     # end def
 
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return []
+    # end def
+
     def val(self) -> float:
         return self._conn_in[0].value if self._conn_in[0] is not None else None
+    # end def
+
+    def val_vec(self) -> Any:
+        return self._conn_in[0].value_vec if self._conn_in[0] is not None else None
+    # end def
 # end class
 
 
 class Point(BlockFixed):
     def __init__(self, x: int, y: int):
         BlockFixed.__init__(self, 0, 2)
-        self._pin_value[0] = x
-        self._pin_value[1] = y
+        self._pin_preset[0] = x
+        self._pin_preset[1] = y
     # end def
 
     @property
@@ -43,6 +54,14 @@ class Point(BlockFixed):
     def _calc_values(self):
         pass
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return list(self._pin_value)
+    # end def
+
+    def params(self) -> Tuple:
+        return tuple(self._pin_preset)
+    # end def
 # end class
 
 
@@ -51,6 +70,7 @@ class DynamicPoint(Point):
         Point.__init__(self, x, y)
     # end def
 
+    # The current position is part of the evaluation, so it's kept in the active evaluation context
     def set_x(self, value: int):
         self._pin_value[0] = value
     # end def
@@ -70,21 +90,60 @@ class Size(BlockFixed):
 
     @property
     def width(self) -> int:
-        return int(self._pin_value[0])
+        return int(self._pin_preset[0])
     # end def
 
     @property
     def height(self) -> int:
-        return int(self._pin_value[1])
+        return int(self._pin_preset[1])
     # end def
 
     def set_size(self, width: int, height: int):
-        self._pin_value[0] = width
-        self._pin_value[1] = height
+        self._pin_preset[0] = width
+        self._pin_preset[1] = height
     # end def
 
     def _calc_values(self):
-        pass
+        self._pin_value[:] = self._pin_preset
+    # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return list(self._pin_preset)
+    # end def
+
+    def params(self) -> Tuple:
+        return tuple(self._pin_preset)
+    # end def
+# end class
+
+
+class Time(BlockFixed):
+    # Point in time of the image, e.g. in seconds since the start of an animation
+    def __init__(self, t: float = 0.):
+        BlockFixed.__init__(self, 0, 1)
+
+        self.set_time(t)
+    # end def
+
+    @property
+    def t(self) -> float:
+        return float(self._pin_preset[0])
+    # end def
+
+    def set_time(self, t: float):
+        self._pin_preset[0] = t
+    # end def
+
+    def _calc_values(self):
+        self._pin_value[:] = self._pin_preset
+    # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return list(self._pin_preset)
+    # end def
+
+    def params(self) -> Tuple:
+        return tuple(self._pin_preset)
     # end def
 # end class
 
@@ -94,12 +153,17 @@ class Circuit:
         self.__cur_pos = DynamicPoint(0, 0)
         self.__drawer = Drawer()
         self.__size = Size()
+        self.__time = Time()
     # end def
 
     def set_size(self, width: int, height: int):
         self.__size.set_size(width, height)
     # end def
 
+    def set_time(self, t: float):
+        self.__time.set_time(t)
+    # end def
+
     @property
     def point(self):
         return self.__cur_pos
@@ -110,6 +174,11 @@ class Circuit:
         return self.__size
     # end def
 
+    @property
+    def time(self):
+        return self.__time
+    # end def
+
     @property
     def drawer(self):
         return self.__drawer
@@ -125,4 +194,16 @@ class Circuit:
 
         return res
     # end def
+
+    def eval_vec(self, x: Any, y: Any) -> Any:
+        # Same as eval(), but x and y may be numpy arrays holding all coordinates to evaluate in one pass
+        self.__cur_pos.set_x(x)
+        self.__cur_pos.set_y(y)
+
+        res = self.__drawer.val_vec()
+
+        self.drawer.reset_evaluated()
+
+        return res
+    # end def
 # end class
@@ -1,7 +1,10 @@
 from __future__ import annotations
-from typing import List, Optional
+from typing import Any, List, Optional, Tuple
+import numpy as np
 
-from base.block import IBlock, IBox, BlockFixed, Conn
+from base.block import IBlock, IBox, Block, BlockFixed, Conn
+from base.context import EvalContext
+from base import kernels
 
 
 __author__ = "Anton Höß"
@@ -11,13 +14,6 @@ __copyright__ = "Copyright 2021"
 class _PassThroughFixed(BlockFixed):
     def __init__(self, n_in_out: int) -> None:
         BlockFixed.__init__(self, n_in_out, n_in_out)
-
-    # end def
-
-    @property
-    def conn_in(self) -> List[Conn]:
-        return self._conn_in
-
     # end def
 
     def _calc_values(self) -> None:
@@ -25,6 +21,10 @@ class _PassThroughFixed(BlockFixed):
             self._pin_value[i] = self._conn_in[i].value
         # end for
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return list(x)
+    # end def
 # end class
 
 
@@ -32,68 +32,89 @@ class _PassThroughFixedRepeat(BlockFixed):
     # Note: n_in_out gives the number of inputs and outputs, but the inputs are 1 more, since the last one is the input for the number of repetitions
     def __init__(self, n_in_out: int, partner_block: BlockFixed) -> None:
         BlockFixed.__init__(self, n_in_out + 1, n_in_out)
-        self.__cnt = 0
-        self.__n_rep = 0
-        self.__recursion_active = False
         self.__partner_block: BlockFixed = partner_block
+        self.__cont: Optional[Conn] = None
     # end def
 
     @property
-    def conn_in(self) -> List[Conn]:
-        return self._conn_in
+    def cont(self) -> Optional[Conn]:
+        return self.__cont
+    # end def
+
+    def set_cont(self, conn: Optional[Conn]) -> None:
+        self.__cont = conn
     # end def
 
     def _calc_values(self) -> None:
-        if not self.__recursion_active:
-            self.__n_rep = int(self._conn_in[self.n_in - 1].value) - 1
-            self.__recursion_active = True
-        # end if
+        self.__calc_values(vec=False)
+    # end def
+
+    def _calc_values_vec(self) -> None:
+        self.__calc_values(vec=True)
+    # end def
 
-        x = list()
-        if self.__cnt < self.__n_rep:
-            self.__cnt += 1
+    def __calc_values(self, vec: bool) -> None:
+        # The values of this layer are the state of the loop, which the partner block (the box's output layer) reads through
+        # the circuit inside the box to calculate the next state. After all repetitions they hold the final state, which is
+        # the value of the whole box.
+        def value(conn: Optional[Conn]) -> Any:
+            if conn is None:
+                return None
+            # end if
 
-            for pin in range(self.n_out):
-                x.append(Conn(self.__partner_block, pin).value)  # This recursively triggers _calc_values()
-            # end for
-            self.__partner_block.reset_evaluated()
+            return conn.value if not vec else conn.value_vec
+        # end def
+
+        def step(state: List[Any]) -> List[Any]:
+            # Starting a new epoch invalidates the values of the previous repetition within the box
+            Block.reset_evaluated(self)
 
-        else:
-            self.__cnt = 0
-            self.__recursion_active = False
             for pin in range(self.n_out):
-                x.append(self._conn_in[pin].value)
+                self._pin_value[pin] = state[pin]
             # end for
-        # end if
+            self._epoch = ctx.epoch
 
-        for pin in range(self.n_out):
-            self._pin_value[pin] = x[pin]
-        # end for
-    # end def
+            x = [self.__partner_block.value(pin) if not vec else self.__partner_block.value_vec(pin) for pin in range(self.n_out)]
 
-    def reset_evaluated(self) -> None:
-        if not self.__recursion_active:
-            self._values_calculated = False
+            if self.__cont is not None:
+                x.append(value(self.__cont))
+            # end if
 
-            blocks = []
+            return x
+        # end def
 
-            for conn in self._conn_in:
-                if conn is not None and conn.in_block not in blocks:
-                    blocks.append(conn.in_block)
-                # end if
-            # end for
+        # Nested repeat boxes start new epochs while this loop is running. The values of this layer are still the current
+        # state of the loop then and must not be calculated again.
+        ctx = EvalContext.current()
 
-            for block in blocks:
-                block.reset_evaluated()
-            # end for
+        if self in ctx.active_loops:
+            return
         # end if
+
+        n_rep = kernels.repetitions(value(self._conn_in[self.n_in - 1]))
+        x = [value(conn) for conn in self._conn_in[:self.n_out]]
+        ctx.active_loops.add(self)
+
+        try:
+            # Variables inside the box keep their values between the steps, so they always need the full arrays
+            x = kernels.repeat(step, x, n_rep, compress=False, cont=self.__cont is not None)
+        finally:
+            ctx.active_loops.discard(self)
+        # end try
+
+        Block.reset_evaluated(self)
+
+        for pin in range(self.n_out):
+            self._pin_value[pin] = x[pin]
+        # end for
     # end def
 # end class
 
 
 class BlackBox(IBlock, IBox):
-    def __init__(self, n_in: int, n_out: int, name: Optional[str] = None) -> None:
+    def __init__(self, n_in: int, n_out: int, name: Optional[str] = None, filename: Optional[str] = None) -> None:
         self._name = name
+        self._filename = filename
         self._input_layer: _PassThroughFixed = _PassThroughFixed(n_in)
         self._output_layer: _PassThroughFixed = _PassThroughFixed(n_out)
     # end def
@@ -102,6 +123,27 @@ class BlackBox(IBlock, IBox):
         return f"Black Box with {self.n_in} inputs and {self.n_out} outputs."
     # end def
 
+    @property
+    def name(self) -> Optional[str]:
+        return self._name
+    # end def
+
+    @property
+    def filename(self) -> Optional[str]:
+        # File the box was loaded from (see BlackBoxFactory), if any
+        return self._filename
+    # end def
+
+    @property
+    def input_layer(self) -> BlockFixed:
+        return self._input_layer
+    # end def
+
+    @property
+    def output_layer(self) -> BlockFixed:
+        return self._output_layer
+    # end def
+
     @property
     def n_in(self) -> int:
         return self._input_layer.n_in
@@ -124,10 +166,22 @@ class BlackBox(IBlock, IBox):
         return self._input_layer.conn_to_prev_block(prev_block, prev_pin, in_pin)
     # end def
 
+    def reserve_in_pin(self) -> int:
+        return 0
+    # end def
+
+    def source(self, pin: int) -> Tuple[IBlock, int]:
+        return self, pin
+    # end def
+
     def value(self, pin: Optional[int] = None) -> float:
         return self._output_layer.value(pin)
     # end def
 
+    def value_vec(self, pin: Optional[int] = None) -> Any:
+        return self._output_layer.value_vec(pin)
+    # end def
+
     def reset_evaluated(self) -> None:
         self._output_layer.reset_evaluated()
     # end def
@@ -135,12 +189,158 @@ class BlackBox(IBlock, IBox):
 
 
 class RepeatBox(BlackBox):
-    def __init__(self, n_in_out: int, name: Optional[str] = None) -> None:
-        BlackBox.__init__(self, n_in_out, n_in_out, name)
+    def __init__(self, n_in_out: int, name: Optional[str] = None, filename: Optional[str] = None) -> None:
+        BlackBox.__init__(self, n_in_out, n_in_out, name, filename)
         self._input_layer: _PassThroughFixedRepeat = _PassThroughFixedRepeat(n_in_out, self._output_layer)
     # end def
 
     def __str__(self) -> str:
         return f"Repeat Box with {self.n_in} inputs and {self.n_out} outputs."
     # end def
+
+    @property
+    def cont(self) -> Optional[Conn]:
+        # Optional condition, which stops the repetitions for a point as soon as it's false (or undefined)
+        return self._input_layer.cont
+    # end def
+
+    def assign_cont(self, block: IBlock, block_pin: Optional[int]) -> bool:
+        self._input_layer.set_cont(Conn(*block.source(block_pin if block_pin is not None else 0)))
+
+        return True
+    # end def
+
+    def value(self, pin: Optional[int] = None) -> float:
+        return self._input_layer.value(pin)
+    # end def
+
+    def value_vec(self, pin: Optional[int] = None) -> Any:
+        return self._input_layer.value_vec(pin)
+    # end def
+# end class
+
+
+class FlatBox(IBlock, IBox):
+    # Flattened black box without any pass-through layers. The blocks inside the box get connected directly to the blocks
+    # outside of it, so the box itself is never part of an evaluation. It only keeps track of its interface and its blocks
+    # for debugging and displaying purposes.
+    def __init__(self, n_in: int, n_out: int, name: Optional[str] = None, filename: Optional[str] = None) -> None:
+        self._name = name
+        self._filename = filename
+        self.__n_in = n_in
+        self.__n_out = n_out
+        self.__blocks: List[IBlock] = list()
+        self.__bonds_in: List[List[Tuple[IBlock, int]]] = [list() for _ in range(n_in)]  # Inner blocks and their pins per in pin
+        self.__conns_in: List[Optional[Tuple[IBlock, int]]] = [None] * n_in  # Outer block and pin connected to each in pin
+        self.__sources: List[Optional[Tuple[IBlock, int]]] = [None] * n_out  # Inner block and pin providing each out pin
+    # end def
+
+    def __str__(self) -> str:
+        return f"Flat Box with {self.n_in} inputs and {self.n_out} outputs."
+    # end def
+
+    @property
+    def name(self) -> Optional[str]:
+        return self._name
+    # end def
+
+    @property
+    def filename(self) -> Optional[str]:
+        # File the box was loaded from (see BlackBoxFactory), if any
+        return self._filename
+    # end def
+
+    @property
+    def blocks(self) -> List[IBlock]:
+        return self.__blocks
+    # end def
+
+    @property
+    def n_in(self) -> int:
+        return self.__n_in
+    # end def
+
+    @property
+    def n_out(self) -> int:
+        return self.__n_out
+    # end def
+
+    def add_block(self, block: IBlock) -> None:
+        self.__blocks.append(block)
+    # end def
+
+    def assign_conn_in(self, block: IBlock, block_pin: Optional[int], in_pin: int) -> bool:
+        if not 0 <= in_pin < self.__n_in:
+            raise ValueError(f"Pin {in_pin} not in range 0..{self.__n_in}.")
+        # end if
+
+        # Reserve the block's pin right now, so it keeps its position among the block's other inputs
+        if block_pin is None:
+            block_pin = block.reserve_in_pin()
+        # end if
+
+        self.__bonds_in[in_pin].append((block, block_pin))
+
+        if self.__conns_in[in_pin] is not None:
+            prev_block, prev_pin = self.__conns_in[in_pin]
+            block.conn_to_prev_block(prev_block, prev_pin, block_pin)
+        # end if
+
+        return True
+    # end def
+
+    def assign_pin_value(self, block: IBlock, block_pin: Optional[int], out_pin: int) -> bool:
+        if not 0 <= out_pin < self.__n_out:
+            raise ValueError(f"Pin {out_pin} not in range 0..{self.__n_out}.")
+        # end if
+
+        self.__sources[out_pin] = block.source(block_pin if block_pin is not None else 0)
+
+        return True
+    # end def
+
+    def conn_to_prev_block(self, prev_block: IBlock, prev_pin: Optional[int] = None, in_pin: Optional[int] = None) -> bool:
+        prev_pin = prev_pin if prev_pin is not None else 0
+        in_pin = in_pin if in_pin is not None else 0
+
+        if not 0 <= in_pin < self.__n_in:
+            raise ValueError(f"Pin {in_pin} not in range 0..{self.__n_in}.")
+        # end if
+
+        self.__conns_in[in_pin] = prev_block.source(prev_pin)
+
+        for block, block_pin in self.__bonds_in[in_pin]:
+            block.conn_to_prev_block(prev_block, prev_pin, block_pin)
+        # end for
+
+        return True
+    # end def
+
+    def reserve_in_pin(self) -> int:
+        return 0
+    # end def
+
+    def source(self, pin: int) -> Tuple[IBlock, int]:
+        if self.__sources[pin] is None:
+            raise ValueError(f"Out pin {pin} of box '{self._name}' is not assigned to any block.")
+        # end if
+
+        return self.__sources[pin]
+    # end def
+
+    def value(self, pin: Optional[int] = None) -> float:
+        block, block_pin = self.source(pin if pin is not None else 0)
+
+        return block.value(block_pin)
+    # end def
+
+    def value_vec(self, pin: Optional[int] = None) -> Any:
+        block, block_pin = self.source(pin if pin is not None else 0)
+
+        return block.value_vec(block_pin)
+    # end def
+
+    def reset_evaluated(self) -> None:
+        Block.reset_evaluated(self)
+    # end def
 # end class
@@ -1,7 +1,11 @@
 from __future__ import annotations
-from typing import List, Optional
+from typing import Any, List, Optional, Tuple
 from abc import ABC, abstractmethod
 
+from base import intervals, kernels
+from base.context import EvalContext
+from base.intervals import Interval
+
 
 __author__ = "Anton Höß"
 __copyright__ = "Copyright 2021"
@@ -25,11 +29,26 @@ class IBlock(ABC):
         raise NotImplementedError
     # end def
 
+    @abstractmethod
+    def reserve_in_pin(self) -> int:
+        raise NotImplementedError
+    # end def
+
+    @abstractmethod
+    def source(self, pin: int) -> Tuple[IBlock, int]:
+        raise NotImplementedError
+    # end def
+
     @abstractmethod
     def value(self, pin: Optional[int] = None) -> float:
         raise NotImplementedError
     # end def
 
+    @abstractmethod
+    def value_vec(self, pin: Optional[int] = None) -> Any:
+        raise NotImplementedError
+    # end def
+
     @abstractmethod
     def reset_evaluated(self) -> None:
         raise NotImplementedError
@@ -51,8 +70,10 @@ class IBox(ABC):
 
 
 class Block(IBlock):
+    # The values of the output pins are kept in the active EvalContext and not in the block itself, see _pin_value. The
+    # block only holds their presets, i.e. the settings of blocks like constants, which every context starts with.
     def __init__(self, n_in: Optional[int], n_out: Optional[int], name: Optional[str] = None) -> None:
-        self._pin_value: List[Optional[float]] = list()
+        self._pin_preset: List[Optional[float]] = list()
         self._conn_in: List[Optional[Conn]] = list()
 
         # Connection from previous block into this one
@@ -74,7 +95,7 @@ class Block(IBlock):
             self._n_out = n_out
 
             for i in range(self._n_out):
-                self._pin_value.append(None)  # None = not yet evaluated
+                self._pin_preset.append(None)  # None = not yet evaluated
             # end for
         else:
             self.__n_out_fixed = False
@@ -82,7 +103,6 @@ class Block(IBlock):
         # end if
 
         self._name = name
-        self._values_calculated = False
     # end def
 
     def __str__(self) -> str:
@@ -99,6 +119,39 @@ class Block(IBlock):
         return self._n_out
     # end def
 
+    @property
+    def name(self) -> Optional[str]:
+        return self._name
+    # end def
+
+    @property
+    def conn_in(self) -> List[Optional[Conn]]:
+        return self._conn_in
+    # end def
+
+    @property
+    def has_kernel(self) -> bool:
+        # Blocks without a kernel (e.g. user defined blocks only implementing _calc_values()) can only be evaluated per pixel
+        return type(self).kernel is not Block.kernel
+    # end def
+
+    @property
+    def _pin_value(self) -> List[Optional[float]]:
+        # Values of the output pins within the active evaluation context
+        return EvalContext.current().values(self, self._pin_preset)
+    # end def
+
+    @property
+    def _epoch(self) -> int:
+        # Epoch in which the values were calculated the last time within the active evaluation context
+        return EvalContext.current().epoch_of(self)
+    # end def
+
+    @_epoch.setter
+    def _epoch(self, epoch: int) -> None:
+        EvalContext.current().set_epoch_of(self, epoch)
+    # end def
+
     def conn_to_prev_block(self, prev_block: IBlock, prev_pin: Optional[int] = None, in_pin: Optional[int] = None):
         if prev_pin is None:
             prev_pin = 0
@@ -114,7 +167,7 @@ class Block(IBlock):
         # end if
 
         if 0 <= prev_pin < prev_block.n_out and 0 <= in_pin < self.n_in:
-            conn: Conn = Conn(prev_block, prev_pin)
+            conn: Conn = Conn(*prev_block.source(prev_pin))
             if self._conn_in[in_pin]:
                 print(f"Overwriting in pin {in_pin}")
             self._conn_in[in_pin] = conn
@@ -123,17 +176,37 @@ class Block(IBlock):
         # end if
     # end def
 
+    def reserve_in_pin(self) -> int:
+        # Returns the in pin a following call of conn_to_prev_block() without an in pin would connect to. For blocks with a
+        # flexible number of inputs a new pin gets added, so its position is fixed even if it gets connected later on.
+        if self._n_in_fixed:
+            return 0
+        # end if
+
+        self._conn_in.append(None)
+        self._n_in += 1
+
+        return self._n_in - 1
+    # end def
+
+    def source(self, pin: int) -> Tuple[IBlock, int]:
+        # Block and pin that actually provide the value of the given pin
+        return self, pin
+    # end def
+
     def value(self, pin: Optional[int] = None) -> float:
         if pin is None:
             pin = 0
 
         if 0 <= pin < self._n_out:
-            if not self._values_calculated:
+            ctx = EvalContext.current()
+
+            if ctx.epoch_of(self) != ctx.epoch:
                 self._calc_values()
-                self._values_calculated = True
+                ctx.set_epoch_of(self, ctx.epoch)
             # end if
 
-            value = self._pin_value[pin]
+            value = ctx.values(self, self._pin_preset)[pin]
         else:
             raise ValueError(f"Pin {pin} not in range 0..{self._n_out}.")
         # end if
@@ -141,26 +214,65 @@ class Block(IBlock):
         return value
     # end def
 
-    def reset_evaluated(self) -> None:
-        self._values_calculated = False
+    def value_vec(self, pin: Optional[int] = None) -> Any:
+        if pin is None:
+            pin = 0
 
-        blocks = []
+        if 0 <= pin < self._n_out:
+            ctx = EvalContext.current()
 
-        for conn in self._conn_in:
-            if conn is not None and conn.in_block not in blocks:
-                blocks.append(conn.in_block)
+            if ctx.epoch_of(self) != ctx.epoch:
+                self._calc_values_vec()
+                ctx.set_epoch_of(self, ctx.epoch)
             # end if
-        # end for
 
-        for block in blocks:
-            block.reset_evaluated()
-        # end for
+            value = ctx.values(self, self._pin_preset)[pin]
+        else:
+            raise ValueError(f"Pin {pin} not in range 0..{self._n_out}.")
+        # end if
+
+        return value
+    # end def
+
+    # Calculates the values of all output pins at once from the given input values, which might also be numpy arrays.
+    # Blocks that don't provide a kernel get evaluated per pixel by CrazyMatrix, see has_kernel.
+    def kernel(self, x: List[Any]) -> List[Any]:
+        raise NotImplementedError(f"{type(self).__name__} has no kernel, so it can only be evaluated per pixel (see EvalMode.SCALAR).")
+    # end def
+
+    # Bounds of the values of all output pins for the given bounds of the input values, e.g. for a whole tile of the image.
+    # Without specific bounds they're only known if all inputs are single values, see base.intervals. Nothing is known
+    # about blocks without a kernel, since their values might even depend on the order of evaluation.
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        if not self.has_kernel:
+            return [Interval.unbounded() for _ in range(self.n_out)]
+        # end if
+
+        return intervals.generic(self.kernel, x, self.n_out)
+    # end def
+
+    # Settings of the block that influence the results of kernel() besides its inputs, e.g. the value of a constant.
+    # Blocks of the same type with equal parameters and equal inputs always calculate the same values.
+    def params(self) -> Tuple:
+        return tuple()
+    # end def
+
+    def reset_evaluated(self) -> None:
+        EvalContext.current().new_epoch()
     # end def
 
     @abstractmethod
     def _calc_values(self) -> None:
         raise NotImplementedError
     # end def
+
+    def _calc_values_vec(self) -> None:
+        x = [conn.value_vec if conn is not None else None for conn in self._conn_in]
+
+        for pin, value in enumerate(self.kernel(x)):
+            self._pin_value[pin] = kernels.scalar(value)
+        # end for
+    # end def
 # end class
 
 
@@ -187,8 +299,18 @@ class Conn:
         return self.__in_block
     # end def
 
+    @property
+    def in_pin(self) -> int:
+        return self.__in_pin
+    # end def
+
     @property
     def value(self) -> float:
         return self.__in_block.value(self.__in_pin)
     # end def
+
+    @property
+    def value_vec(self) -> Any:
+        return self.__in_block.value_vec(self.__in_pin)
+    # end def
 # end class
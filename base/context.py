@@ -0,0 +1,74 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Set
+from contextvars import ContextVar, Token
+from weakref import WeakKeyDictionary
+
+
+__author__ = "Anton Höß"
+__copyright__ = "Copyright 2021"
+
+
+class EvalContext:
+    # Holds everything that changes while evaluating a circuit: the values of all blocks, the epoch in which they were
+    # calculated and the repeat boxes whose loops are currently running. The block graph itself only holds the wiring
+    # and the settings of its blocks, so any number of threads or async tasks can evaluate the same circuit concurrently,
+    # each one within its own context.
+    # Contexts get activated using the with statement. Without an active context each thread (or async task) uses its own
+    # default one, which lives as long as the thread. The default context only holds weak references to the blocks, so it
+    # doesn't keep circuits (and their last values) alive, which were evaluated without a context and dropped afterwards.
+    __current: ContextVar[Optional[EvalContext]] = ContextVar("eval_context", default=None)
+
+    def __init__(self, weak: bool = False) -> None:
+        self.epoch: int = 0  # The values of a block are only valid, if they were calculated within the current epoch
+        self.active_loops: Set[Any] = set()
+        self.__values: Dict[Any, List[Any]] = WeakKeyDictionary() if weak else dict()
+        self.__epochs: Dict[Any, int] = WeakKeyDictionary() if weak else dict()
+        self.__tokens: List[Token] = list()
+    # end def
+
+    def __enter__(self) -> EvalContext:
+        self.__tokens.append(EvalContext.__current.set(self))
+
+        return self
+    # end def
+
+    def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        EvalContext.__current.reset(self.__tokens.pop())
+    # end def
+
+    @staticmethod
+    def current() -> EvalContext:
+        ctx = EvalContext.__current.get()
+
+        if ctx is None:
+            ctx = EvalContext(weak=True)
+            EvalContext.__current.set(ctx)
+        # end if
+
+        return ctx
+    # end def
+
+    def values(self, block: Any, presets: List[Any]) -> List[Any]:
+        # Values of the block's output pins, starting with a copy of the given presets
+        values = self.__values.get(block)
+
+        if values is None:
+            values = self.__values[block] = list(presets)
+        # end if
+
+        return values
+    # end def
+
+    def epoch_of(self, block: Any) -> int:
+        return self.__epochs.get(block, -1)
+    # end def
+
+    def set_epoch_of(self, block: Any, epoch: int) -> None:
+        self.__epochs[block] = epoch
+    # end def
+
+    def new_epoch(self) -> None:
+        # Invalidates the values of all blocks at once instead of walking through the whole graph
+        self.epoch += 1
+    # end def
+# end class
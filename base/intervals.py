@@ -0,0 +1,490 @@
+from __future__ import annotations
+from typing import Any, Callable, List, Optional, Tuple
+from functools import reduce, wraps
+import numpy as np
+
+from base import kernels
+
+
+__author__ = "Anton Höß"
+__copyright__ = "Copyright 2021"
+
+
+# Interval counterparts of the functions in base.kernels. Instead of the values themselves they calculate bounds of all
+# values a pin can take within a region of the image (e.g. a tile) from the bounds of the input values. The bounds are
+# conservative, i.e. they may be wider than the actual values, but never narrower. If all inputs are single values, the
+# result gets calculated by the kernel itself, so it's exactly the value each pixel would get.
+
+
+class Interval:
+    # Bounds lo..hi of all defined values, nan tells whether undefined values are possible as well. An interval without
+    # any defined values (lo > hi) stands for a pin that is undefined everywhere.
+    def __init__(self, lo: float, hi: float, nan: bool = False) -> None:
+        self.lo: float = float(lo)
+        self.hi: float = float(hi)
+        self.nan: bool = bool(nan)
+    # end def
+
+    def __str__(self) -> str:
+        if self.empty:
+            return "[undefined]"
+        # end if
+
+        return f"[{self.lo}, {self.hi}]" + (" or undefined" if self.nan else "")
+    # end def
+
+    def __repr__(self) -> str:
+        return str(self)
+    # end def
+
+    @staticmethod
+    def point(value: Any) -> Interval:
+        # Bounds of the given value, which may also be None or a numpy array
+        a = np.asarray(value if value is not None else np.nan, dtype=float)
+        defined = a[~np.isnan(a)]
+
+        if defined.size == 0:
+            return Interval.undefined()
+        # end if
+
+        return Interval(defined.min(), defined.max(), defined.size < a.size)
+    # end def
+
+    @staticmethod
+    def undefined() -> Interval:
+        return Interval(np.inf, -np.inf, True)
+    # end def
+
+    @staticmethod
+    def unbounded() -> Interval:
+        return Interval(-np.inf, np.inf, True)
+    # end def
+
+    @property
+    def empty(self) -> bool:
+        return self.lo > self.hi
+    # end def
+
+    @property
+    def is_point(self) -> bool:
+        # Exactly one defined value
+        return self.lo == self.hi and not self.nan
+    # end def
+
+    @property
+    def single(self) -> bool:
+        # The whole region has the same value, i.e. it's a single defined value or undefined everywhere
+        return self.is_point or self.empty
+    # end def
+
+    @property
+    def value(self) -> float:
+        return self.lo if not self.empty else np.nan
+    # end def
+
+    def contains(self, value: float) -> bool:
+        return self.lo <= value <= self.hi
+    # end def
+# end class
+
+
+def _rounded(lo: float, hi: float, nan: bool) -> Interval:
+    # Widens the bounds by the rounding error of the calculation
+    if np.isnan(lo) or np.isnan(hi):
+        return Interval.unbounded()
+    # end if
+
+    return Interval(np.nextafter(lo, -np.inf), np.nextafter(hi, np.inf), nan)
+# end def
+
+
+def _any_nan(*x: Interval) -> bool:
+    return any(v.nan for v in x)
+# end def
+
+
+def generic(kernel: Callable[..., Any], x: List[Interval], n_out: int) -> List[Interval]:
+    # Fallback for all blocks without specific bounds: exact for single values, unbounded otherwise
+    if all(v.is_point for v in x):
+        with np.errstate(all="ignore"):
+            return [Interval.point(value) for value in kernel([v.value for v in x])]
+        # end with
+    # end if
+
+    return [Interval.unbounded() for _ in range(n_out)]
+# end def
+
+
+def _bounds(kernel: Callable[..., Any], propagate: bool = True) -> Callable:
+    # Calculates single values exactly using the kernel. If propagate is set, the kernel's result is undefined as soon as
+    # one of its inputs is, so the result of an input that is undefined everywhere is undefined everywhere as well. The
+    # decorated function therefore only gets inputs with defined values in this case.
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        @wraps(func)
+        def wrapper(*x: Interval) -> Any:
+            values = [v for v in x if isinstance(v, Interval)]
+            args = [v.value if isinstance(v, Interval) else v for v in x]
+
+            if all(v.is_point for v in values):
+                with np.errstate(all="ignore"):
+                    res = kernel(*args)
+                # end with
+
+                return tuple(Interval.point(r) for r in res) if isinstance(res, tuple) else Interval.point(res)
+            # end if
+
+            if propagate and any(v.empty for v in values):
+                res = func(*[Interval(0, 0) if isinstance(v, Interval) else v for v in x])
+
+                return tuple(Interval.undefined() for _ in res) if isinstance(res, tuple) else Interval.undefined()
+            # end if
+
+            with np.errstate(all="ignore"):
+                return func(*x)
+            # end with
+        # end def
+
+        return wrapper
+    # end def
+
+    return decorator
+# end def
+
+
+def boolean(true_possible: bool, false_possible: bool, nan: bool) -> Interval:
+    return Interval(0. if false_possible else 1., 1. if true_possible else 0., nan)
+# end def
+
+
+def _nonzero_possible(a: Interval) -> bool:
+    return not (a.lo == 0 and a.hi == 0)
+# end def
+
+
+def _mul(a: Interval, b: Interval) -> Interval:
+    # Multiplying with exactly 0 is exact, e.g. for masks
+    for zero, other in [(a, b), (b, a)]:
+        if zero.is_point and zero.lo == 0 and np.isfinite(other.lo) and np.isfinite(other.hi):
+            return Interval(0., 0., other.nan)
+        # end if
+    # end for
+
+    products = [a.lo * b.lo, a.lo * b.hi, a.hi * b.lo, a.hi * b.hi]
+
+    if any(np.isnan(p) for p in products):
+        return Interval.unbounded()
+    # end if
+
+    return _rounded(min(products), max(products), a.nan or b.nan)
+# end def
+
+
+def _reciprocal(a: Interval) -> Interval:
+    # Division by 0 is undefined, values close to 0 have unbounded reciprocals
+    if a.contains(0):
+        return Interval.unbounded()
+    # end if
+
+    return _rounded(1. / a.hi, 1. / a.lo, a.nan)
+# end def
+
+
+def _contains_phase(lo: float, hi: float, phase: float) -> bool:
+    # Whether phase + k * 2 * pi lies within lo..hi for any integer k
+    k = np.ceil((lo - phase) / (2 * np.pi))
+
+    return phase + k * 2 * np.pi <= hi
+# end def
+
+
+def _periodic(a: Interval, factor: float, func: Callable[[float], float], phase_max: float, phase_min: float) -> Interval:
+    # Bounds of sine and cosine, which reach their extremes at the given phases
+    lo, hi = np.nextafter(a.lo * factor, -np.inf), np.nextafter(a.hi * factor, np.inf)
+
+    if not (np.isfinite(lo) and np.isfinite(hi)) or hi - lo >= 2 * np.pi:
+        return Interval(-1., 1., a.nan or not (np.isfinite(lo) and np.isfinite(hi)))
+    # end if
+
+    v_lo, v_hi = sorted([func(lo), func(hi)])
+    v_hi = 1. if _contains_phase(lo, hi, phase_max) else v_hi
+    v_lo = -1. if _contains_phase(lo, hi, phase_min) else v_lo
+    res = _rounded(v_lo, v_hi, a.nan)
+
+    return Interval(max(res.lo, -1.), min(res.hi, 1.), res.nan)
+# end def
+
+
+@_bounds(kernels.add_n)
+def add_n(*x: Interval) -> Interval:
+    return _rounded(sum(v.lo for v in x), sum(v.hi for v in x), _any_nan(*x))
+# end def
+
+
+@_bounds(kernels.sub)
+def sub(a: Interval, b: Interval) -> Interval:
+    return _rounded(a.lo - b.hi, a.hi - b.lo, a.nan or b.nan)
+# end def
+
+
+@_bounds(kernels.mul_n)
+def mul_n(*x: Interval) -> Interval:
+    return reduce(_mul, x)
+# end def
+
+
+@_bounds(kernels.div)
+def div(a: Interval, b: Interval) -> Interval:
+    return _mul(a, _reciprocal(b))
+# end def
+
+
+@_bounds(kernels.inv)
+def inv(a: Interval) -> Interval:
+    return _reciprocal(a)
+# end def
+
+
+@_bounds(kernels.abs_)
+def abs_(a: Interval) -> Interval:
+    if a.lo >= 0:
+        return Interval(a.lo, a.hi, a.nan)
+
+    elif a.hi <= 0:
+        return Interval(-a.hi, -a.lo, a.nan)
+    # end if
+
+    return Interval(0., max(-a.lo, a.hi), a.nan)
+# end def
+
+
+@_bounds(kernels.minus)
+def minus(a: Interval) -> Interval:
+    return Interval(-a.hi, -a.lo, a.nan)
+# end def
+
+
+@_bounds(kernels.mod)
+def mod(a: Interval, b: Interval) -> Interval:
+    nan = a.nan or b.nan or not (np.isfinite(a.lo) and np.isfinite(a.hi))
+
+    if b.is_point and b.lo != 0 and np.isfinite(a.lo) and np.isfinite(a.hi):
+        # Within a single period the modulo is just a shift
+        if np.floor(a.lo / b.lo) == np.floor(a.hi / b.lo):
+            lo, hi = sorted([np.mod(a.lo, b.lo), np.mod(a.hi, b.lo)])
+
+            return Interval(lo, hi, nan)
+        # end if
+    # end if
+
+    if b.lo > 0:
+        return Interval(0., b.hi, nan)
+
+    elif b.hi < 0:
+        return Interval(b.lo, 0., nan)
+    # end if
+
+    return Interval.unbounded()
+# end def
+
+
+@_bounds(kernels.exp)
+def exp(a: Interval) -> Interval:
+    res = _rounded(np.exp(a.lo), np.exp(a.hi), a.nan)
+
+    return Interval(max(res.lo, 0.), res.hi, res.nan)
+# end def
+
+
+@_bounds(kernels.log)
+def log(a: Interval, b: Interval) -> Interval:
+    return Interval.unbounded()
+# end def
+
+
+@_bounds(kernels.ln)
+def ln(a: Interval) -> Interval:
+    if a.hi < 0:
+        return Interval.undefined()
+    # end if
+
+    return _rounded(np.log(max(a.lo, 0.)), np.log(a.hi), a.nan or a.lo < 0)
+# end def
+
+
+@_bounds(kernels.pow_)
+def pow_(a: Interval, b: Interval) -> Interval:
+    # Only defined for non-negative bases
+    if a.hi < 0:
+        return Interval.undefined()
+    # end if
+
+    # For non-negative bases the power is monotonic in the base for any exponent and in the exponent for any base, so its
+    # bounds are among the powers of the corners
+    nan = a.nan or b.nan or a.lo < 0
+
+    with np.errstate(divide="ignore", over="ignore", under="ignore"):
+        corners = np.power([max(a.lo, 0.), max(a.lo, 0.), a.hi, a.hi], [b.lo, b.hi, b.lo, b.hi])
+    # end with
+
+    return _rounded(corners.min(), corners.max(), nan)
+# end def
+
+
+@_bounds(kernels.sq)
+def sq(a: Interval) -> Interval:
+    a = abs_(a)
+    res = _rounded(np.square(a.lo), np.square(a.hi), a.nan)
+
+    return Interval(max(res.lo, 0.), res.hi, res.nan)
+# end def
+
+
+@_bounds(kernels.sqrt)
+def sqrt(a: Interval) -> Interval:
+    if a.hi < 0:
+        return Interval.undefined()
+    # end if
+
+    res = _rounded(np.sqrt(max(a.lo, 0.)), np.sqrt(a.hi), a.nan or a.lo < 0)
+
+    return Interval(max(res.lo, 0.), res.hi, res.nan)
+# end def
+
+
+@_bounds(kernels.min_n)
+def min_n(*x: Interval) -> Interval:
+    return Interval(min(v.lo for v in x), min(v.hi for v in x), _any_nan(*x))
+# end def
+
+
+@_bounds(kernels.max_n)
+def max_n(*x: Interval) -> Interval:
+    return Interval(max(v.lo for v in x), max(v.hi for v in x), _any_nan(*x))
+# end def
+
+
+@_bounds(kernels.sin)
+def sin(a: Interval, deg: bool) -> Interval:
+    return _periodic(a, np.pi / 180 if deg else 1., np.sin, np.pi / 2, -np.pi / 2)
+# end def
+
+
+@_bounds(kernels.cos)
+def cos(a: Interval, deg: bool) -> Interval:
+    return _periodic(a, np.pi / 180 if deg else 1., np.cos, 0., np.pi)
+# end def
+
+
+@_bounds(kernels.tan)
+def tan(a: Interval, deg: bool) -> Interval:
+    factor = np.pi / 180 if deg else 1.
+    lo, hi = np.nextafter(a.lo * factor, -np.inf), np.nextafter(a.hi * factor, np.inf)
+
+    # Unbounded as soon as there's a pole in between
+    if not (np.isfinite(lo) and np.isfinite(hi)) or hi - lo >= np.pi or np.floor(lo / np.pi - .5) != np.floor(hi / np.pi - .5):
+        return Interval(-np.inf, np.inf, a.nan or not (np.isfinite(lo) and np.isfinite(hi)))
+    # end if
+
+    return _rounded(np.tan(lo), np.tan(hi), a.nan)
+# end def
+
+
+@_bounds(kernels.atan)
+def atan(a: Interval, deg: bool) -> Interval:
+    factor = 180 / np.pi if deg else 1.
+
+    return _rounded(np.arctan(a.lo) * factor, np.arctan(a.hi) * factor, a.nan)
+# end def
+
+
+@_bounds(kernels.atan2)
+def atan2(a: Interval, b: Interval, deg: bool) -> Interval:
+    factor = 180 / np.pi if deg else 1.
+
+    return _rounded(-np.pi * factor, np.pi * factor, a.nan or b.nan)
+# end def
+
+
+@_bounds(kernels.cadd_n)
+def cadd_n(*x: Interval) -> Tuple[Interval, Interval]:
+    n = len(x) // 2
+
+    return add_n(*x[0:2 * n:2]), add_n(*x[1:2 * n:2])
+# end def
+
+
+@_bounds(kernels.csub)
+def csub(a_real: Interval, a_imag: Interval, b_real: Interval, b_imag: Interval) -> Tuple[Interval, Interval]:
+    return sub(a_real, b_real), sub(a_imag, b_imag)
+# end def
+
+
+@_bounds(kernels.cmul_n)
+def cmul_n(*x: Interval) -> Tuple[Interval, Interval]:
+    n = len(x) // 2
+    real, imag = x[0], x[1]
+
+    for i in range(1, n):
+        b_real, b_imag = x[2 * i], x[2 * i + 1]
+        real, imag = sub(mul_n(real, b_real), mul_n(imag, b_imag)), add_n(mul_n(real, b_imag), mul_n(imag, b_real))
+    # end for
+
+    return real, imag
+# end def
+
+
+@_bounds(kernels.cdiv)
+def cdiv(a_real: Interval, a_imag: Interval, b_real: Interval, b_imag: Interval) -> Tuple[Interval, Interval]:
+    return Interval.unbounded(), Interval.unbounded()
+# end def
+
+
+@_bounds(kernels.and_n)
+def and_n(*x: Interval) -> Interval:
+    return boolean(all(_nonzero_possible(v) for v in x), any(v.contains(0) for v in x), _any_nan(*x))
+# end def
+
+
+@_bounds(kernels.or_n)
+def or_n(*x: Interval) -> Interval:
+    return boolean(any(_nonzero_possible(v) for v in x), all(v.contains(0) for v in x), _any_nan(*x))
+# end def
+
+
+@_bounds(kernels.not_)
+def not_(a: Interval) -> Interval:
+    return boolean(a.contains(0), _nonzero_possible(a), a.nan)
+# end def
+
+
+@_bounds(kernels.gt)
+def gt(a: Interval, b: Interval) -> Interval:
+    return boolean(a.hi > b.lo, a.lo <= b.hi, a.nan or b.nan)
+# end def
+
+
+@_bounds(kernels.lt)
+def lt(a: Interval, b: Interval) -> Interval:
+    return boolean(a.lo < b.hi, a.hi >= b.lo, a.nan or b.nan)
+# end def
+
+
+@_bounds(kernels.eq_n)
+def eq_n(*x: Interval) -> Interval:
+    # Equality is possible if all intervals overlap, inequality unless all are the same single value
+    overlap = max(v.lo for v in x) <= min(v.hi for v in x)
+    same = all(v.is_point and v.lo == x[0].lo for v in x)
+
+    return boolean(overlap, not same, _any_nan(*x))
+# end def
+
+
+@_bounds(kernels.variable, propagate=False)
+def variable(a: Interval, value: Optional[float]) -> Interval:
+    # Undefined values get replaced by the variable's value
+    if value is None or not a.nan:
+        return a
+    # end if
+
+    return Interval(min(a.lo, value), max(a.hi, value))
+# end def
@@ -0,0 +1,339 @@
+from __future__ import annotations
+from typing import Any, Callable, List, Optional, Tuple
+from functools import reduce
+import numpy as np
+
+
+__author__ = "Anton Höß"
+__copyright__ = "Copyright 2021"
+
+
+# Vectorized counterparts of the blocks' _calc_values() functions. All of them work on scalars as well as on numpy arrays
+# of arbitrary (broadcastable) shape. Undefined values, which are represented by None in the scalar evaluation, are
+# represented by NaN here, since this is the only way to keep them within a numeric array.
+# The results have the floating point type of the array inputs, e.g. float32 for float32 coordinates. Python scalars don't
+# influence the type (see the promotion rules of numpy), which is why scalar results get passed on as such (see scalar()).
+
+
+def scalar(value: Any) -> Any:
+    # Turns numpy scalars and zero-dimensional arrays into Python scalars, so results that are the same for all points
+    # (e.g. folded constants) keep the precision of the arrays they get combined with instead of raising it to float64
+    if isinstance(value, (np.generic, np.ndarray)) and value.ndim == 0:
+        return value.item()
+    # end if
+
+    return value
+# end def
+
+
+def _bool(cond: Any, *x: Any) -> Any:
+    undefined = reduce(np.logical_or, [np.isnan(v) for v in x], False)
+
+    return np.where(undefined, np.nan, np.where(cond, 1., 0.)).astype(np.result_type(*x, 0.), copy=False)
+# end def
+
+
+def add_n(*x: Any) -> Any:
+    return reduce(np.add, x) if len(x) > 0 else np.nan
+# end def
+
+
+def sub(a: Any, b: Any) -> Any:
+    return np.subtract(a, b)
+# end def
+
+
+def mul_n(*x: Any) -> Any:
+    return reduce(np.multiply, x) if len(x) > 0 else np.nan
+# end def
+
+
+def div(a: Any, b: Any) -> Any:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(np.equal(b, 0), np.nan, np.true_divide(a, b))
+    # end with
+# end def
+
+
+def inv(a: Any) -> Any:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(np.equal(a, 0), np.nan, np.true_divide(1., a))
+    # end with
+# end def
+
+
+def abs_(a: Any) -> Any:
+    return np.abs(a)
+# end def
+
+
+def minus(a: Any) -> Any:
+    return np.negative(a)
+# end def
+
+
+def mod(a: Any, b: Any) -> Any:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(np.equal(b, 0), np.nan, np.mod(a, b))
+    # end with
+# end def
+
+
+def exp(a: Any) -> Any:
+    with np.errstate(over="ignore"):
+        return np.exp(a)
+    # end with
+# end def
+
+
+def log(a: Any, b: Any) -> Any:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        defined = np.logical_and(np.logical_and(np.greater_equal(a, 0), np.not_equal(a, 1)), np.greater(b, 0))
+
+        return np.where(defined, np.true_divide(np.log(b), np.log(a)), np.nan)
+    # end with
+# end def
+
+
+def ln(a: Any) -> Any:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.log(a)
+    # end with
+# end def
+
+
+def pow_(a: Any, b: Any) -> Any:
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        return np.where(np.greater_equal(a, 0), np.power(np.multiply(a, 1.), b), np.nan)
+    # end with
+# end def
+
+
+def sq(a: Any) -> Any:
+    with np.errstate(over="ignore"):
+        return np.square(a)
+    # end with
+# end def
+
+
+def sqrt(a: Any) -> Any:
+    with np.errstate(invalid="ignore"):
+        return np.sqrt(a)
+    # end with
+# end def
+
+
+def min_n(*x: Any) -> Any:
+    return reduce(np.minimum, x) if len(x) > 0 else np.nan
+# end def
+
+
+def max_n(*x: Any) -> Any:
+    return reduce(np.maximum, x) if len(x) > 0 else np.nan
+# end def
+
+
+def sin(a: Any, deg: bool) -> Any:
+    return np.sin(np.multiply(a, np.pi / 180 if deg else 1.))
+# end def
+
+
+def cos(a: Any, deg: bool) -> Any:
+    return np.cos(np.multiply(a, np.pi / 180 if deg else 1.))
+# end def
+
+
+def tan(a: Any, deg: bool) -> Any:
+    return np.tan(np.multiply(a, np.pi / 180 if deg else 1.))
+# end def
+
+
+def atan(a: Any, deg: bool) -> Any:
+    return np.multiply(np.arctan(a), 180 / np.pi if deg else 1.)
+# end def
+
+
+def atan2(a: Any, b: Any, deg: bool) -> Any:
+    return np.multiply(np.arctan2(b, a), 180 / np.pi if deg else 1.)
+# end def
+
+
+def cadd_n(*x: Any) -> Tuple[Any, Any]:
+    n = len(x) // 2
+
+    if n == 0:
+        return np.nan, np.nan
+    # end if
+
+    return reduce(np.add, x[0:2 * n:2]), reduce(np.add, x[1:2 * n:2])
+# end def
+
+
+def csub(a_real: Any, a_imag: Any, b_real: Any, b_imag: Any) -> Tuple[Any, Any]:
+    return np.subtract(a_real, b_real), np.subtract(a_imag, b_imag)
+# end def
+
+
+def cmul_n(*x: Any) -> Tuple[Any, Any]:
+    n = len(x) // 2
+
+    if n == 0:
+        return np.nan, np.nan
+    # end if
+
+    real, imag = x[0], x[1]
+
+    for i in range(1, n):
+        b_real, b_imag = x[2 * i], x[2 * i + 1]
+        real, imag = real * b_real - imag * b_imag, real * b_imag + imag * b_real
+    # end for
+
+    return real, imag
+# end def
+
+
+def cdiv(a_real: Any, a_imag: Any, b_real: Any, b_imag: Any) -> Tuple[Any, Any]:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        defined = np.logical_and(np.not_equal(b_real, 0), np.not_equal(b_imag, 0))
+        z = np.true_divide(np.add(a_real, np.multiply(a_imag, 1j)), np.add(b_real, np.multiply(b_imag, 1j)))
+
+        return np.where(defined, z.real, np.nan), np.where(defined, z.imag, np.nan)
+    # end with
+# end def
+
+
+def and_n(*x: Any) -> Any:
+    if len(x) == 0:
+        return np.nan
+    # end if
+
+    return _bool(reduce(np.logical_and, [np.not_equal(v, 0) for v in x]), *x)
+# end def
+
+
+def or_n(*x: Any) -> Any:
+    if len(x) == 0:
+        return np.nan
+    # end if
+
+    return _bool(reduce(np.logical_or, [np.not_equal(v, 0) for v in x]), *x)
+# end def
+
+
+def not_(a: Any) -> Any:
+    return _bool(np.equal(a, 0), a)
+# end def
+
+
+def gt(a: Any, b: Any) -> Any:
+    return _bool(np.greater(a, b), a, b)
+# end def
+
+
+def lt(a: Any, b: Any) -> Any:
+    return _bool(np.less(a, b), a, b)
+# end def
+
+
+def eq_n(*x: Any) -> Any:
+    if len(x) == 0:
+        return np.nan
+    # end if
+
+    return _bool(reduce(np.logical_and, [np.equal(v, x[0]) for v in x[1:]], True), *x)
+# end def
+
+
+def variable(a: Any, value: Optional[float]) -> Any:
+    if value is None:
+        return a
+    # end if
+
+    return np.where(np.isnan(a), value, a)
+# end def
+
+
+def repetitions(n_rep: Any) -> Any:
+    # Number of repetitions of a repeat box for each point, at least one. Undefined values also result in one repetition.
+    return np.fmax(np.trunc(np.asarray(n_rep if n_rep is not None else np.nan, dtype=float)), 1).astype(int)
+# end def
+
+
+def _continues(cont: Any) -> Any:
+    # Points continue iterating only as long as their condition is defined and true
+    if cont is None:
+        return False
+    # end if
+
+    return np.logical_and(np.not_equal(cont, 0), np.logical_not(np.isnan(cont)))
+# end def
+
+
+def repeat(step: Callable[[List[Any]], List[Any]], state: List[Any], n: Any, compress: bool = True, cont: bool = False) -> List[Any]:
+    # Applies step to the state n times, where n might differ for each point. In this case a mask keeps track of the points
+    # that still need to be iterated, all others keep their state. With compress only these active points are passed to
+    # step as one-dimensional arrays, so the work of each repetition is proportional to the number of points still
+    # iterating. Otherwise step always gets the full arrays, which is needed if it keeps values between its calls.
+    # With cont step returns an additional value after the new state, which tells for each point whether to continue. Once
+    # it's false, the point keeps the state of this repetition and stops iterating.
+    n = np.asarray(n)
+
+    if n.size == 0 or n.ndim == 0 or np.all(n == n.flat[0]):
+        n_uniform = int(n.flat[0]) if n.size > 0 else 0
+
+        for i in range(n_uniform):
+            values = list(step(state))
+
+            if not cont:
+                state = values
+                continue
+            # end if
+
+            state, go = values[:-1], _continues(values[-1])
+
+            if np.all(go):
+                continue
+
+            elif np.ndim(go) == 0 or not np.any(go):
+                break
+            # end if
+
+            # From now on only some of the points continue, so go on with a mask
+            return repeat(step, state, np.where(go, n_uniform - i - 1, 0), compress, cont)
+        # end for
+
+        return state
+    # end if
+
+    shape = np.broadcast_shapes(n.shape, *[np.shape(v) for v in state if v is not None])
+    n = np.broadcast_to(n, shape).ravel()
+    dtype = np.result_type(*[v for v in state if v is not None], 0.)
+    state = [np.array(np.broadcast_to(v if v is not None else np.nan, shape), dtype=dtype).ravel() for v in state]
+    active = np.flatnonzero(n > 0)
+    i = 0
+
+    while active.size > 0:
+        if compress:
+            values = [np.broadcast_to(value if value is not None else np.nan, active.shape)
+                      for value in step([v[active] for v in state])]
+        else:
+            values = [np.broadcast_to(value if value is not None else np.nan, shape).ravel()[active]
+                      for value in step([v.reshape(shape).copy() for v in state])]
+        # end if
+
+        for v, value in zip(state, values):
+            v[active] = value
+        # end for
+
+        i += 1
+        go = n[active] > i
+
+        if cont:
+            go = np.logical_and(go, _continues(values[-1]))
+        # end if
+
+        active = active[go]
+    # end while
+
+    return [v.reshape(shape) for v in state]
+# end def
@@ -1,6 +1,8 @@
-from typing import Optional, Sequence
+from typing import Any, List, Optional, Sequence
 
 from base.block import BlockFixed, Block, IBlock
+from base import kernels, intervals
+from base.intervals import Interval
 
 
 __author__ = "Anton Höß"
@@ -36,6 +38,14 @@ class AndN(Block):
 
         self._pin_value[0] = int(value) if value_calculated else None
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [kernels.and_n(*x)]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return [intervals.and_n(*x)]
+    # end def
 # end class
 
 
@@ -68,6 +78,14 @@ class OrN(Block):
 
         self._pin_value[0] = int(value) if value_calculated else None
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [kernels.or_n(*x)]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return [intervals.or_n(*x)]
+    # end def
 # end class
 
 
@@ -87,6 +105,14 @@ class Not(BlockFixed):
             self._pin_value[0] = None
         # end if
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [kernels.not_(x[0])]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return [intervals.not_(x[0])]
+    # end def
 # end class
 
 
@@ -110,6 +136,14 @@ class Gt(BlockFixed):
             self._pin_value[0] = None
         # end if
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [kernels.gt(x[0], x[1])]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return [intervals.gt(x[0], x[1])]
+    # end def
 # end class
 
 
@@ -133,6 +167,14 @@ class Lt(BlockFixed):
             self._pin_value[0] = None
         # end if
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [kernels.lt(x[0], x[1])]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return [intervals.lt(x[0], x[1])]
+    # end def
 # end class
 
 
@@ -172,4 +214,12 @@ class EqN(Block):
 
         self._pin_value[0] = int(eq) if value_calculated else None
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [kernels.eq_n(*x)]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return [intervals.eq_n(*x)]
+    # end def
 # end class
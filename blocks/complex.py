@@ -1,4 +1,8 @@
+from typing import Any, List, Optional
+
 from base.block import Block, BlockFixed
+from base import kernels, intervals
+from base.intervals import Interval
 
 
 __author__ = "Anton Höß"
@@ -6,8 +10,8 @@ __copyright__ = "Copyright 2021"
 
 
 class ComplexAddN(Block):
-    def __init__(self):
-        Block.__init__(self, None, 2)
+    def __init__(self, name: Optional[str] = None):
+        Block.__init__(self, None, 2, name=name)
     # end def
 
     def _calc_values(self):
@@ -37,12 +41,20 @@ class ComplexAddN(Block):
         self._pin_value[0] = accum.real if value_calculated else None
         self._pin_value[1] = accum.imag if value_calculated else None
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return list(kernels.cadd_n(*x))
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return list(intervals.cadd_n(*x))
+    # end def
 # end class
 
 
 class ComplexSub(BlockFixed):
-    def __init__(self):
-        BlockFixed.__init__(self, 4, 2)
+    def __init__(self, name: Optional[str] = None):
+        BlockFixed.__init__(self, 4, 2, name=name)
     # end def
 
     def _calc_values(self):
@@ -57,12 +69,20 @@ class ComplexSub(BlockFixed):
             self._pin_value[1] = None
         # end if
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return list(kernels.csub(*x))
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return list(intervals.csub(*x))
+    # end def
 # end class
 
 
 class ComplexMulN(Block):
-    def __init__(self):
-        Block.__init__(self, None, 2)
+    def __init__(self, name: Optional[str] = None):
+        Block.__init__(self, None, 2, name=name)
     # end def
 
     def _calc_values(self):
@@ -92,12 +112,20 @@ class ComplexMulN(Block):
         self._pin_value[0] = accum.real if value_calculated else None
         self._pin_value[1] = accum.imag if value_calculated else None
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return list(kernels.cmul_n(*x))
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return list(intervals.cmul_n(*x))
+    # end def
 # end class
 
 
 class ComplexDiv(BlockFixed):
-    def __init__(self):
-        BlockFixed.__init__(self, 4, 2)
+    def __init__(self, name: Optional[str] = None):
+        BlockFixed.__init__(self, 4, 2, name=name)
     # end def
 
     def _calc_values(self):
@@ -113,4 +141,12 @@ class ComplexDiv(BlockFixed):
             self._pin_value[1] = None
         # end if
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return list(kernels.cdiv(*x))
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return list(intervals.cdiv(*x))
+    # end def
 # end class
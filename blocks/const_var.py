@@ -1,7 +1,9 @@
 from __future__ import annotations
-from typing import Optional
+from typing import Any, List, Optional, Tuple
 
 from base.block import BlockFixed
+from base import kernels, intervals
+from base.intervals import Interval
 import numpy as np
 
 
@@ -12,15 +14,23 @@ __copyright__ = "Copyright 2021"
 class Const(BlockFixed):
     def __init__(self, value: float, name: Optional[str] = None):
         BlockFixed.__init__(self, 0, 1, name=name)
-        self._pin_value[0] = value
+        self._pin_preset[0] = value
     # end def
 
     def __str__(self):
-        return f"Const with a value of {self._pin_value[0]}. Has no inputs."
+        return f"Const with a value of {self._pin_preset[0]}. Has no inputs."
     # end def
 
     def _calc_values(self):
-        pass
+        self._pin_value[0] = self._pin_preset[0]
+    # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return list(self._pin_preset)
+    # end def
+
+    def params(self) -> Tuple:
+        return tuple(self._pin_preset)
     # end def
 # end class
 
@@ -42,7 +52,7 @@ class ConstE(Const):
 class Variable(BlockFixed):
     def __init__(self, value: Optional[float] = None, name: Optional[str] = None):
         BlockFixed.__init__(self, 1, 1, name=name)
-        self._pin_value[0] = value
+        self._pin_preset[0] = value
     # end def
 
     # @property
@@ -51,7 +61,8 @@ class Variable(BlockFixed):
     # # end def
 
     def set_value(self, value: float):
-        self._pin_value[0] = value
+        # Initial value for all evaluations started afterwards, it keeps the last defined input value within each evaluation
+        self._pin_preset[0] = value
     # end def
 
     def _calc_values(self):
@@ -59,4 +70,16 @@ class Variable(BlockFixed):
             self._pin_value[0] = self._conn_in[0].value
         # end if
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [kernels.variable(x[0], self._pin_value[0]) if x[0] is not None else self._pin_value[0]]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return [intervals.variable(x[0], self._pin_value[0]) if x[0] is not None else Interval.point(self._pin_value[0])]
+    # end def
+
+    def params(self) -> Tuple:
+        return tuple(self._pin_preset)
+    # end def
 # end class
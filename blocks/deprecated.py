@@ -1,4 +1,9 @@
+from typing import Any, List
+import numpy as np
+
 from base.block import BlockFixed
+from base import kernels, intervals
+from base.intervals import Interval
 
 
 __author__ = "Anton Höß"
@@ -14,6 +19,14 @@ class Add2(BlockFixed):
     def _calc_values(self):
         self._pin_value[0] = self._conn_in[0].value + self._conn_in[1].value
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [kernels.add_n(x[0], x[1])]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return [intervals.add_n(x[0], x[1])]
+    # end def
 # end class
 
 
@@ -26,6 +39,14 @@ class Mul2(BlockFixed):
     def _calc_values(self):
         self._pin_value[0] = self._conn_in[0].value * self._conn_in[1].value
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [kernels.mul_n(x[0], x[1])]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return [intervals.mul_n(x[0], x[1])]
+    # end def
 # end class
 
 
@@ -37,6 +58,14 @@ class Min2(BlockFixed):
     def _calc_values(self):
         self._pin_value[0] = min(self._conn_in[0].value, self._conn_in[1].value)
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [kernels.min_n(x[0], x[1])]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return [intervals.min_n(x[0], x[1])]
+    # end def
 # end class
 
 
@@ -48,6 +77,14 @@ class Max2(BlockFixed):
     def _calc_values(self):
         self._pin_value[0] = max(self._conn_in[0].value, self._conn_in[1].value)
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [kernels.max_n(x[0], x[1])]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return [intervals.max_n(x[0], x[1])]
+    # end def
 # end class
 
 
@@ -63,6 +100,15 @@ class And2(BlockFixed):
             self._pin_value[0] = 0
         # end if
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [np.where(np.logical_and(np.greater(x[0], 0), np.greater(x[1], 0)), 1., 0.).astype(np.result_type(*x, 0.), copy=False)]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        # Undefined values count as not greater than 0
+        return [intervals.boolean(x[0].hi > 0 and x[1].hi > 0, x[0].lo <= 0 or x[0].nan or x[1].lo <= 0 or x[1].nan, False)]
+    # end def
 # end class
 
 
@@ -78,6 +124,14 @@ class Or2(BlockFixed):
             self._pin_value[0] = 0
         # end if
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [np.where(np.logical_or(np.greater(x[0], 0), np.greater(x[1], 0)), 1., 0.).astype(np.result_type(*x, 0.), copy=False)]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return [intervals.boolean(x[0].hi > 0 or x[1].hi > 0, (x[0].lo <= 0 or x[0].nan) and (x[1].lo <= 0 or x[1].nan), False)]
+    # end def
 # end class
 
 
@@ -93,6 +147,17 @@ class Eq2(BlockFixed):
             self._pin_value[0] = 0
         # end if
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [np.where(np.equal(x[0], x[1]), 1., 0.).astype(np.result_type(*x, 0.), copy=False)]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        overlap = max(x[0].lo, x[1].lo) <= min(x[0].hi, x[1].hi)
+        same = x[0].is_point and x[1].is_point and x[0].lo == x[1].lo
+
+        return [intervals.boolean(overlap, not same, False)]
+    # end def
 # end class
 
 
@@ -123,6 +188,14 @@ class Rot1_4(BlockFixed):
             self._pin_value[i] = self._conn_in[(i+1) % 4].value
         # end for
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [x[(i + 1) % 4] for i in range(4)]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return [x[(i + 1) % 4] for i in range(4)]
+    # end def
 # end class
 
 
@@ -138,6 +211,14 @@ class ComplexAdd(BlockFixed):
         self._pin_value[0] = z_res.real
         self._pin_value[1] = z_res.imag
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return list(kernels.cadd_n(*x))
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return list(intervals.cadd_n(*x))
+    # end def
 # end class
 
 
@@ -153,4 +234,12 @@ class ComplexMul(BlockFixed):
         self._pin_value[0] = z_res.real
         self._pin_value[1] = z_res.imag
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return list(kernels.cmul_n(*x))
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return list(intervals.cmul_n(*x))
+    # end def
 # end class
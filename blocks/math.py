@@ -1,8 +1,10 @@
 from __future__ import annotations
-from typing import Optional, Sequence
+from typing import Any, List, Optional, Sequence, Tuple
 import numpy as np
 
 from base.block import Block, BlockFixed, IBlock
+from base import kernels, intervals
+from base.intervals import Interval
 
 
 __author__ = "Anton Höß"
@@ -38,6 +40,14 @@ class AddN(Block):
 
         self._pin_value[0] = accum if value_calculated else None
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [kernels.add_n(*x)]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return [intervals.add_n(*x)]
+    # end def
 # end class
 
 
@@ -61,6 +71,14 @@ class Sub2(BlockFixed):
             self._pin_value[0] = None
         # end if
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [kernels.sub(x[0], x[1])]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return [intervals.sub(x[0], x[1])]
+    # end def
 # end class
 
 
@@ -94,6 +112,14 @@ class MulN(Block):
 
         self._pin_value[0] = prod if value_calculated else None
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [kernels.mul_n(*x)]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return [intervals.mul_n(*x)]
+    # end def
 # end class
 
 
@@ -117,6 +143,14 @@ class Div2(BlockFixed):
             self._pin_value[0] = None
         # end if
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [kernels.div(x[0], x[1])]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return [intervals.div(x[0], x[1])]
+    # end def
 # end class
 
 
@@ -136,6 +170,14 @@ class Abs(BlockFixed):
             self._pin_value[0] = None
         # end if
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [kernels.abs_(x[0])]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return [intervals.abs_(x[0])]
+    # end def
 # end class
 
 
@@ -155,6 +197,14 @@ class Minus(BlockFixed):
             self._pin_value[0] = None
         # end if
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [kernels.minus(x[0])]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return [intervals.minus(x[0])]
+    # end def
 # end class
 
 
@@ -174,6 +224,14 @@ class Inv(BlockFixed):
             self._pin_value[0] = None
         # end if
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [kernels.inv(x[0])]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return [intervals.inv(x[0])]
+    # end def
 # end class
 
 
@@ -197,6 +255,14 @@ class Mod(BlockFixed):
             self._pin_value[0] = None
         # end if
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [kernels.mod(x[0], x[1])]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return [intervals.mod(x[0], x[1])]
+    # end def
 # end class
 
 
@@ -216,6 +282,14 @@ class Exp(BlockFixed):
             self._pin_value[0] = None
         # end if
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [kernels.exp(x[0])]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return [intervals.exp(x[0])]
+    # end def
 # end class
 
 
@@ -239,6 +313,14 @@ class Log(BlockFixed):
             self._pin_value[0] = None
         # end if
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [kernels.log(x[0], x[1])]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return [intervals.log(x[0], x[1])]
+    # end def
 # end class
 
 
@@ -258,6 +340,14 @@ class Ln(BlockFixed):
             self._pin_value[0] = None
         # end if
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [kernels.ln(x[0])]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return [intervals.ln(x[0])]
+    # end def
 # end class
 
 
@@ -281,6 +371,14 @@ class Pow(BlockFixed):
             self._pin_value[0] = None
         # end if
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [kernels.pow_(x[0], x[1])]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return [intervals.pow_(x[0], x[1])]
+    # end def
 # end class
 
 
@@ -300,6 +398,14 @@ class Sq(BlockFixed):
             self._pin_value[0] = None
         # end if
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [kernels.sq(x[0])]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return [intervals.sq(x[0])]
+    # end def
 # end class
 
 
@@ -319,6 +425,14 @@ class Sqrt(BlockFixed):
             self._pin_value[0] = None
         # end if
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [kernels.sqrt(x[0])]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return [intervals.sqrt(x[0])]
+    # end def
 # end class
 
 
@@ -356,6 +470,14 @@ class MinN(Block):
 
         self._pin_value[0] = value if value_calculated else None
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [kernels.min_n(*x)]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return [intervals.min_n(*x)]
+    # end def
 # end class
 
 
@@ -393,6 +515,14 @@ class MaxN(Block):
 
         self._pin_value[0] = value if value_calculated else None
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [kernels.max_n(*x)]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return [intervals.max_n(*x)]
+    # end def
 # end class
 
 
@@ -415,6 +545,18 @@ class Sin(BlockFixed):
             self._pin_value[0] = None
         # end if
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [kernels.sin(x[0], self.__deg)]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return [intervals.sin(x[0], self.__deg)]
+    # end def
+
+    def params(self) -> Tuple:
+        return (self.__deg,)
+    # end def
 # end class
 
 
@@ -437,6 +579,18 @@ class Cos(BlockFixed):
             self._pin_value[0] = None
         # end if
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [kernels.cos(x[0], self.__deg)]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return [intervals.cos(x[0], self.__deg)]
+    # end def
+
+    def params(self) -> Tuple:
+        return (self.__deg,)
+    # end def
 # end class
 
 
@@ -459,6 +613,18 @@ class Tan(BlockFixed):
             self._pin_value[0] = None
         # end if
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [kernels.tan(x[0], self.__deg)]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return [intervals.tan(x[0], self.__deg)]
+    # end def
+
+    def params(self) -> Tuple:
+        return (self.__deg,)
+    # end def
 # end class
 
 
@@ -481,6 +647,18 @@ class Atan(BlockFixed):
             self._pin_value[0] = None
         # end if
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [kernels.atan(x[0], self.__deg)]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return [intervals.atan(x[0], self.__deg)]
+    # end def
+
+    def params(self) -> Tuple:
+        return (self.__deg,)
+    # end def
 # end class
 
 
@@ -503,4 +681,16 @@ class Atan2(BlockFixed):
             self._pin_value[0] = None
         # end if
     # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [kernels.atan2(x[0], x[1], self.__deg)]
+    # end def
+
+    def interval(self, x: List[Interval]) -> List[Interval]:
+        return [intervals.atan2(x[0], x[1], self.__deg)]
+    # end def
+
+    def params(self) -> Tuple:
+        return (self.__deg,)
+    # end def
 # end class
@@ -0,0 +1,104 @@
+from __future__ import annotations
+from typing import Any, Iterable, Iterator, List, Tuple
+import numpy as np
+
+from base.basic import Circuit
+from base.context import EvalContext
+from core.optimizer import TapeOptimizer
+from core.precision import Precision
+from core.tape import Tape, TapeCompiler
+from core.tile_pool import pixel_coords
+
+
+__author__ = "Anton Höß"
+__copyright__ = "Copyright 2021"
+
+
+class AnimationRenderer:
+    # Renders the frames of an animation, i.e. the images of a circuit at different points in time (see Circuit.time).
+    # The circuit gets compiled with the time as an input and its operations are split into the static ones, which don't
+    # depend on the time, and the dynamic ones downstream of the time. The static operations are evaluated only once for
+    # all frames, each frame only evaluates the dynamic ones on top of their results.
+    # The frames get calculated with the given precision like the images of CrazyMatrix.
+    def __init__(self, circuit: Circuit, width: int, height: int, center: Tuple[float, float] = (0., 0.), scale: float = 1.,
+                 precision: Precision = Precision.DOUBLE) -> None:
+        self.__w: int = width
+        self.__h: int = height
+        self.__circuit: Circuit = circuit
+        self.__circuit.set_size(self.__w, self.__h)
+        self.__center: Tuple[float, float] = center
+        self.__scale: float = scale
+        self.__precision: Precision = precision
+        self.__tape: Tape = TapeOptimizer().optimize(TapeCompiler().compile(self.__circuit, time_input=True))
+        self.__static_ops, self.__dynamic_ops = self.__tape.split({Tape.SLOT_T})
+    # end def
+
+    @property
+    def n_static_ops(self) -> int:
+        return len(self.__static_ops)
+    # end def
+
+    @property
+    def n_dynamic_ops(self) -> int:
+        return len(self.__dynamic_ops)
+    # end def
+
+    def iter_frames(self, times: Iterable[float]) -> Iterator[np.ndarray]:
+        # Yields one image per point in time. The evaluation contexts never span a yield, so the caller may stop early or
+        # iterate several animations at once.
+        with EvalContext():
+            static = self.__run_static()
+        # end with
+
+        for t in times:
+            slots = list(static)
+            slots[Tape.SLOT_T] = float(t)  # A Python float doesn't change the precision of the coordinates
+
+            with EvalContext():
+                for op in self.__dynamic_ops:
+                    op.run(slots)
+                # end for
+            # end with
+
+            z = np.empty((self.__h, self.__w), dtype=self.__precision.dtype)
+            z[...] = slots[self.__tape.out_slot]
+
+            yield z
+        # end for
+    # end def
+
+    def calc_frames(self, times: Iterable[float]) -> np.ndarray:
+        # All frames at once with the frame as the first axis
+        times = list(times)
+        frames = np.empty((len(times), self.__h, self.__w), dtype=self.__precision.dtype)
+
+        for i, z in enumerate(self.iter_frames(times)):
+            frames[i] = z
+        # end for
+
+        return frames
+    # end def
+
+    def __run_static(self) -> List[Any]:
+        # Slots after evaluating the static operations, only the ones still needed by the dynamic operations are kept
+        slots: List[Any] = [None] * self.__tape.n_slots
+        slots[Tape.SLOT_X] = pixel_coords(0, self.__w, self.__w, self.__center[0], self.__scale).astype(self.__precision.dtype)[np.newaxis, :]
+        slots[Tape.SLOT_Y] = pixel_coords(0, self.__h, self.__h, self.__center[1], self.__scale).astype(self.__precision.dtype)[:, np.newaxis]
+
+        for slot, value in self.__tape.consts.items():
+            slots[slot] = value
+        # end for
+
+        for op in self.__static_ops:
+            op.run(slots)
+        # end for
+
+        needed = {self.__tape.out_slot}
+
+        for op in self.__dynamic_ops:
+            needed |= op.reads()
+        # end for
+
+        return [value if slot in needed else None for slot, value in enumerate(slots)]
+    # end def
+# end class
@@ -0,0 +1,277 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+from base import kernels
+from templates.block import BlockType, BlockTemplate
+from templates.bond import BoxSide
+from templates.circuit import CircuitFactory
+from templates.box import BlackBoxFactory, RepeatBoxFactory
+
+
+__author__ = "Anton Höß"
+__copyright__ = "Copyright 2021"
+
+
+class CodeGenerator:
+    # Names of the functions in base.kernels and additional fixed arguments for each block type
+    __KERNELS: Dict[BlockType, Tuple[str, str]] = {
+        BlockType.VAL_VAR: ("variable", "None"),
+        BlockType.MATH_ADD: ("add_n", ""),
+        BlockType.MATH_SUB: ("sub", ""),
+        BlockType.MATH_MUL: ("mul_n", ""),
+        BlockType.MATH_DIV: ("div", ""),
+        BlockType.MATH_INV: ("inv", ""),
+        BlockType.MATH_ABS: ("abs_", ""),
+        BlockType.MATH_MINUS: ("minus", ""),
+        BlockType.MATH_MOD: ("mod", ""),
+        BlockType.MATH_EXP: ("exp", ""),
+        BlockType.MATH_LOG: ("log", ""),
+        BlockType.MATH_LN: ("ln", ""),
+        BlockType.MATH_POW: ("pow_", ""),
+        BlockType.MATH_SQ: ("sq", ""),
+        BlockType.MATH_SQRT: ("sqrt", ""),
+        BlockType.MATH_MIN: ("min_n", ""),
+        BlockType.MATH_MAX: ("max_n", ""),
+        BlockType.MATH_SIN: ("sin", "True"),
+        BlockType.MATH_COS: ("cos", "True"),
+        BlockType.MATH_TAN: ("tan", "True"),
+        BlockType.MATH_ATAN: ("atan", "True"),
+        BlockType.MATH_ATAN2: ("atan2", "True"),
+        BlockType.COMPLEX_ADD: ("cadd_n", ""),
+        BlockType.COMPLEX_SUB: ("csub", ""),
+        BlockType.COMPLEX_MUL: ("cmul_n", ""),
+        BlockType.COMPLEX_DIV: ("cdiv", ""),
+        BlockType.BOOL_AND: ("and_n", ""),
+        BlockType.BOOL_OR: ("or_n", ""),
+        BlockType.BOOL_NOT: ("not_", ""),
+        BlockType.BOOL_GT: ("gt", ""),
+        BlockType.BOOL_LT: ("lt", ""),
+        BlockType.BOOL_EQ: ("eq_n", ""),
+    }
+
+    # Compiled functions, shared between all generators and identified by their source code
+    __cache: Dict[str, Callable] = dict()
+
+    def __init__(self) -> None:
+        self.__lines: List[str] = list()
+        self.__n_vars = 0
+    # end def
+
+    def generate(self, factory: CircuitFactory) -> str:
+        # Generates the source code of a function named 'circuit' that evaluates the given circuit or box. For circuits its
+        # arguments are x, y, width, height and optionally the time t and it returns the drawer's value. For boxes its arguments are the box's
+        # input values and it returns a tuple of the box's output values.
+        self.__lines = list()
+        self.__n_vars = 0
+
+        if isinstance(factory, RepeatBoxFactory):
+            in_vars = [f"i{i}" for i in range(factory.n_in - 1)]
+
+            self.__lines.append(f"def circuit({', '.join(in_vars + ['n_rep'])}):")
+            out_vars = self.__emit_repeat_box(factory, in_vars, "n_rep", indent=1)
+            self.__lines.append(f"    return {', '.join(out_vars)},")
+
+        elif isinstance(factory, BlackBoxFactory):
+            in_vars = [f"i{i}" for i in range(factory.n_in)]
+
+            self.__lines.append(f"def circuit({', '.join(in_vars)}):")
+            out_vars = self.__emit_box(factory, in_vars, indent=1)
+            self.__lines.append(f"    return {', '.join(out_vars)},")
+
+        else:
+            self.__lines.append(f"def circuit(x, y, width, height, t=0.0):")
+            out_vars = self.__emit(factory, {"0": ["x", "y"], "2": ["width", "height"], "3": ["t"]}, [], [("1", 0)], indent=1)
+            self.__lines.append(f"    return {out_vars[0]}")
+        # end if
+
+        return "\n".join(self.__lines) + "\n"
+    # end def
+
+    def compile(self, factory: CircuitFactory) -> Callable:
+        source = self.generate(factory)
+        func = CodeGenerator.__cache.get(source)
+
+        if func is None:
+            namespace = {"np": np, "_k": kernels}
+            exec(compile(source, "<crazy_matrix>", "exec"), namespace)
+            func = namespace["circuit"]
+
+            CodeGenerator.__cache[source] = func
+        # end if
+
+        return func
+    # end def
+
+    def __new_var(self) -> str:
+        self.__n_vars += 1
+
+        return f"v{self.__n_vars}"
+    # end def
+
+    def __emit_repeat_box(self, factory: RepeatBoxFactory, in_vars: List[str], n_rep_var: str, indent: int) -> List[str]:
+        # The circuit inside the box becomes a local step function, which kernels.repeat() applies to the state
+        pad = "    " * indent
+        step = f"step_{self.__new_var()}"
+        state_vars = [self.__new_var() for _ in range(factory.n_in - 1)]
+        cont = any(bond.side is BoxSide.CONT for bond in factory.bonds)
+
+        self.__lines.append(f"{pad}def {step}(state):")
+        self.__lines.append(f"{pad}    {', '.join(state_vars)}, = state")
+        body_vars = self.__emit_box(factory, state_vars + [n_rep_var], indent + 1, cont)
+        self.__lines.append(f"{pad}    return [{', '.join(body_vars)}]")
+
+        out_vars = [self.__new_var() for _ in range(factory.n_out)]
+        self.__lines.append(f"{pad}{', '.join(out_vars)}, = _k.repeat({step}, [{', '.join(in_vars)}], _k.repetitions({n_rep_var}), cont={cont})")
+
+        return out_vars
+    # end def
+
+    def __emit_box(self, factory: BlackBoxFactory, in_vars: List[str], indent: int, cont: bool = False) -> List[str]:
+        # Returns the variables of the box's outputs, followed by the one of the condition to continue if cont is set
+        box_out: List[Tuple[str, Optional[int]]] = [("", None)] * (factory.n_out + (1 if cont else 0))
+
+        for bond in factory.bonds:
+            if bond.side is BoxSide.OUT:
+                box_out[bond.box_pin] = (bond.block_id, bond.block_pin)
+
+            elif bond.side is BoxSide.CONT and cont:
+                box_out[-1] = (bond.block_id, bond.block_pin)
+            # end if
+        # end for
+
+        in_bonds = [(in_vars[bond.box_pin], bond.block_id, bond.block_pin) for bond in factory.bonds if bond.side is BoxSide.IN]
+
+        return self.__emit(factory, dict(), in_bonds, [(block_id, pin if pin is not None else 0) for block_id, pin in box_out], indent)
+    # end def
+
+    def __emit(self, factory: CircuitFactory, fixed: Dict[str, List[str]], in_bonds: List[Tuple[str, str, Optional[int]]],
+               results: List[Tuple[str, int]], indent: int) -> List[str]:
+        # Emits the statements for all blocks that are needed to calculate the given results (block ID and pin) of the given
+        # factory in topological order and returns the variables holding the results. The drawer's input is always pin 0 of
+        # the special block ID "1".
+        blocks: Dict[str, BlockTemplate] = {block.id: block for block in factory.blocks}
+        inputs: Dict[str, List[str]] = {block.id: ["None"] * (block.n_in or 0) for block in factory.blocks}  # Either a variable name or a block ID and pin as "id:pin"
+        inputs["1"] = ["None"]
+
+        def connect(source: str, block_id: str, pin: Optional[int]):
+            block_inputs = inputs[block_id]
+
+            if pin is None:
+                if block_id in blocks and blocks[block_id].n_in is None:
+                    block_inputs.append(source)
+                    return
+                # end if
+
+                pin = 0
+            # end if
+
+            while len(block_inputs) <= pin:
+                block_inputs.append("None")
+            # end while
+
+            block_inputs[pin] = source
+        # end def
+
+        for conn in factory.conns:
+            if conn.in_block_id in fixed:
+                source = fixed[conn.in_block_id][conn.in_block_pin]
+            else:
+                source = f"{conn.in_block_id}:{conn.in_block_pin}"
+            # end if
+
+            connect(source, conn.out_block_id, conn.out_block_pin)
+        # end for
+
+        for var, block_id, block_pin in in_bonds:
+            connect(var, block_id, block_pin)
+        # end for
+
+        # Iterative depth-first search (post-order) to emit the blocks in topological order
+        out_vars: Dict[str, List[str]] = dict()
+        pad = "    " * indent
+
+        def resolve(source: str) -> str:
+            if ":" not in source:
+                return source
+            # end if
+
+            block_id, pin = source.split(":")
+
+            return out_vars[block_id][int(pin)]
+        # end def
+
+        roots = [inputs["1"][0].split(":")[0] if block_id == "1" else block_id for block_id, _ in results]
+        stack: List[Tuple[str, bool]] = [(block_id, False) for block_id in roots if block_id in blocks]
+
+        while len(stack) > 0:
+            block_id, expanded = stack.pop()
+
+            if block_id in out_vars:
+                continue
+            # end if
+
+            deps = [source.split(":")[0] for source in inputs[block_id] if ":" in source]
+
+            if not expanded:
+                stack.append((block_id, True))
+                stack.extend((dep, False) for dep in deps if dep not in out_vars)
+                continue
+            # end if
+
+            block = blocks[block_id]
+            args = [resolve(source) for source in inputs[block_id]]
+
+            if block.type is BlockType.BOX and block.box_name.endswith(".cmr"):
+                box = RepeatBoxFactory().load(block.box_name)
+                args += ["None"] * (box.n_in - len(args))
+                out_vars[block_id] = self.__emit_repeat_box(box, args[:-1], args[-1], indent)
+
+            elif block.type is BlockType.BOX:
+                box = BlackBoxFactory().load(block.box_name)
+                args += ["None"] * (box.n_in - len(args))
+                out_vars[block_id] = self.__emit_box(box, args, indent)
+
+            else:
+                out_vars[block_id] = [self.__new_var() for _ in range(block.n_out)]
+                targets = ", ".join(out_vars[block_id]) + ("," if block.n_out > 1 else "")
+                comment = f"  # {block.name}" if block.name is not None else ""
+
+                if block.type is BlockType.VAL_CONST:
+                    self.__lines.append(f"{pad}{targets} = {float(block.value)!r}{comment}")
+
+                elif block.type is BlockType.VAL_CONST_E:
+                    self.__lines.append(f"{pad}{targets} = {float(np.e)!r}{comment}")
+
+                elif block.type is BlockType.VAL_CONST_PI:
+                    self.__lines.append(f"{pad}{targets} = {float(np.pi)!r}{comment}")
+
+                elif block.type in CodeGenerator.__KERNELS:
+                    kernel, extra_args = CodeGenerator.__KERNELS[block.type]
+                    args_str = ", ".join(args + ([extra_args] if extra_args != "" else []))
+
+                    self.__lines.append(f"{pad}{targets} = _k.{kernel}({args_str}){comment}")
+
+                else:
+                    raise ValueError(f"Block type {block.type} cannot be used for code generation.")
+                # end if
+            # end if
+        # end while
+
+        res = list()
+
+        for block_id, pin in results:
+            if block_id == "1":
+                res.append(resolve(inputs["1"][0]))
+
+            elif block_id in out_vars:
+                res.append(out_vars[block_id][pin])
+
+            else:
+                res.append("None")
+            # end if
+        # end for
+
+        return res
+    # end def
+# end class
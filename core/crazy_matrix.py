@@ -1,17 +1,46 @@
 from __future__ import annotations
-from typing import Optional
+from typing import Callable, Iterator, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
 import matplotlib.pyplot as plt
 import numpy as np
 
 from base.basic import Circuit
+from base.context import EvalContext
+from base.intervals import Interval
+from core.tape import Tape, TapeCompiler
+from core.deep_zoom import DeepZoomRenderer
+from core.optimizer import OptimizerReport, TapeOptimizer
+from core.precision import Precision, PrecisionReport
+from core.symmetry import Parity, SymmetryAnalysis, mirror
+from core.pyramid import PyramidExporter
+from core.render_cache import RenderCache
+from core.tile_cache import TileCache
+from core.tile_pool import TilePool, aligned_tiles, pixel_coords, tiles
 
 
 __author__ = "Anton Höß"
 __copyright__ = "Copyright 2021"
 
 
+class EvalMode(Enum):
+    SCALAR = "scalar"  # Evaluates the circuit for each pixel separately (reference implementation)
+    VECTORIZED = "vectorized"  # Evaluates the circuit for all pixels at once using numpy arrays
+    TAPE = "tape"  # Same as VECTORIZED, but on a circuit compiled into a flat list of operations
+    DEEP_ZOOM = "deep_zoom"  # Perturbation for circuits using the mandelbrot box beyond the precision of float64 (see DeepZoomRenderer)
+# end class
+# Circuits with blocks that have no kernel (see Block.has_kernel) get evaluated as in SCALAR mode by VECTORIZED and TAPE.
+
+
 class CrazyMatrix:
-    def __init__(self, circuit: Circuit, width: int, height: int, cmap: Optional[str] = None):
+    def __init__(self, circuit: Circuit, width: int, height: int, cmap: Optional[str] = None, eval_mode: EvalMode = EvalMode.VECTORIZED,
+                 tile_pool: Optional[TilePool] = None, n_threads: int = 1, tile_size: int = 128, cull_tiles: bool = False,
+                 use_symmetry: bool = False, center: Tuple[float, float] = (0., 0.), scale: float = 1., tile_cache: Optional[TileCache] = None,
+                 render_cache: Optional[RenderCache] = None, precision: Precision = Precision.DOUBLE):
+        if scale <= 0:
+            raise ValueError(f"The scale needs to be positive, but is {scale}.")
+        # end if
+
         self.__w: int = width
         self.__h: int = height
         self.__v_min = 0
@@ -19,6 +48,38 @@ class CrazyMatrix:
         self.__circuit = circuit
         self.__circuit.set_size(self.__w, self.__h)
         self.__cmap = cmap if cmap is not None else "Greys"  # "RdYlGn"
+        self.__eval_mode: EvalMode = eval_mode
+        self.__optimizer_report: Optional[OptimizerReport] = None
+        self.__tile_pool: Optional[TilePool] = tile_pool  # Renders in tiles on worker processes instead, same results as TAPE
+        self.__n_threads: int = n_threads
+        self.__tile_size: int = tile_size
+        self.__cull_tiles: bool = cull_tiles  # Skips the evaluation of tiles that have the same value everywhere, only with double precision
+        self.__bound_tape: Optional[Tape] = None
+        self.__use_symmetry: bool = use_symmetry  # Only evaluates one half (or quarter) of symmetric images and mirrors it
+        self.__symmetry: Tuple[Parity, Parity] = (Parity.NONE, Parity.NONE)
+        self.__center: Tuple[float, float] = center  # Coordinates of the middle pixel of the image, DEEP_ZOOM also takes strings or Decimals
+        self.__scale: float = scale  # Distance between two neighbouring pixels in the coordinate space
+        self.__tile_cache: Optional[TileCache] = tile_cache  # Reuses tiles rendered before, e.g. when re-rendering or panning
+        self.__circuit_hash: Optional[str] = None  # Structural hash of the circuit as of its last compilation
+        self.__render_cache: Optional[RenderCache] = render_cache  # Keeps whole images across runs and processes
+        self.__precision: Precision = precision  # Of the coordinates, which carries through all calculations and the image
+    # end def
+
+    @property
+    def optimizer_report(self) -> Optional[OptimizerReport]:
+        # Report of the optimizations applied during the last evaluation in TAPE mode
+        return self.__optimizer_report
+    # end def
+
+    @property
+    def symmetry(self) -> Tuple[Parity, Parity]:
+        # Symmetry of the image at the y- and the x-axis proven during the last evaluation with use_symmetry
+        return self.__symmetry
+    # end def
+
+    @property
+    def precision(self) -> Precision:
+        return self.__precision
     # end def
 
     @staticmethod  # XXX
@@ -36,22 +97,419 @@ class CrazyMatrix:
     # end def
 
     def calc_image(self) -> np.ndarray:
-        offset_x = int(-self.__w / 2)
-        offset_y = int(-self.__h / 2)
-        scale = 1. / 50
-
-        z = np.empty((self.__w, self.__h))
-
-        for _x in range(self.__w):
-            for _y in range(self.__h):
-                x = _x + offset_x
-                y = _y + offset_y
-                z[_x, _y] = self.__circuit.eval(x, y)
-                # z[_x, _y] = self.mandelbrot(x * scale, y * scale)
-            # end for
+        # With a render cache, cached images are returned as read-only memory maps. The circuit only gets compiled for the
+        # first image, hits of later ones cost no more than loading the file. So changes to the circuit afterwards, e.g. of
+        # its time, need a new matrix.
+        if self.__render_cache is None:
+            return self.__render()
+        # end if
+
+        if self.__circuit_hash is None:
+            self.__circuit_hash = self.__compile().structural_hash()
+        # end if
+
+        key = RenderCache.key(self.__circuit_hash, self.__w, self.__h, self.__center, self.__scale, self.__precision,
+                              self.__eval_mode.value)
+        z = self.__render_cache.load(key)
+
+        if z is None:
+            z = self.__render()
+            self.__render_cache.store(key, z)
+        # end if
+
+        return z
+    # end def
+
+    def calc_precision_report(self, z: Optional[np.ndarray] = None) -> PrecisionReport:
+        # Compares the image (rendered with this matrix' precision, unless given) to the same image rendered with double
+        # precision. Both get rendered without the caches, culling or symmetry, so they only differ by their precision.
+        def render(precision: Precision) -> np.ndarray:
+            return CrazyMatrix(self.__circuit, self.__w, self.__h, eval_mode=self.__eval_mode, tile_pool=self.__tile_pool, n_threads=self.__n_threads,
+                               tile_size=self.__tile_size, center=self.__center, scale=self.__scale, precision=precision).calc_image()
+        # end def
+
+        if z is None:
+            z = render(self.__precision)
+        # end if
+
+        return PrecisionReport.compare(z, render(Precision.DOUBLE), self.__precision)
+    # end def
+
+    def iter_image_progressive(self, n_levels: int = 4) -> Iterator[np.ndarray]:
+        # Renders the image from coarse to fine, similar to interlaced GIF files. The first level only evaluates every
+        # 2^(n_levels - 1)-th pixel in both directions, each following level halves this distance and only evaluates the
+        # pixels in between. After each level the image gets yielded with the missing pixels filled in by the closest
+        # evaluated pixel to the upper left, the last one is the final image.
+        if n_levels < 1:
+            raise ValueError(f"The number of levels needs to be at least 1, but is {n_levels}.")
+        # end if
+
+        calc = self.__calc_func()
+        xs, ys = self.__coords()
+        step = 2 ** (n_levels - 1)
+
+        z = np.empty((self.__h, self.__w), dtype=self.__precision.dtype)
+        z[::step, ::step] = self.__calc_grid(calc, xs[::step], ys[::step])
+
+        while step > 1:
+            coarse = z[::step, ::step]
+            yield np.repeat(np.repeat(coarse, step, axis=0), step, axis=1)[:self.__h, :self.__w]
+
+            # The new pixels are the ones in between on the rows that were already evaluated and all pixels of the new rows
+            step //= 2
+            z[::2 * step, step::2 * step] = self.__calc_grid(calc, xs[step::2 * step], ys[::2 * step])
+            z[step::2 * step, ::step] = self.__calc_grid(calc, xs[::step], ys[step::2 * step])
+        # end while
+
+        yield z
+    # end def
+
+    def calc_image_progressive(self, callback: Callable[[np.ndarray], None], n_levels: int = 4) -> np.ndarray:
+        # Same as iter_image_progressive(), but passes each intermediate image to the callback, e.g. to show it right away
+        z = None
+
+        for z in self.iter_image_progressive(n_levels):
+            callback(z)
         # end for
 
-        z = z.transpose()
+        return z
+    # end def
+
+    def calc_image_adaptive(self, tolerance: float = 0.01, max_cell_size: int = 16, strict: bool = False) -> np.ndarray:
+        # Quadtree sampling for smooth images. The image gets divided into cells of max_cell_size pixels, of which only the
+        # corners get evaluated. Cells whose corners differ by no more than the tolerance (or are all undefined) get
+        # interpolated bilinearly, all others are split into four cells, whose new corners get evaluated, and so on until
+        # the cells are single pixels. In strict mode no cell gets interpolated, so every pixel gets evaluated exactly.
+        if max_cell_size < 1 or max_cell_size & (max_cell_size - 1) != 0:
+            raise ValueError(f"The maximum cell size needs to be a power of 2, but is {max_cell_size}.")
+        # end if
+
+        calc = self.__calc_func()
+        size = max_cell_size
+        n_y = -(-self.__h // size)
+        n_x = -(-self.__w // size)
+
+        # The lattice of the corners covers the whole image, so the corners at the lower and right edge may lie outside
+        xs = pixel_coords(0, n_x * size + 1, self.__w, self.__center[0], self.__scale).astype(self.__precision.dtype)
+        ys = pixel_coords(0, n_y * size + 1, self.__h, self.__center[1], self.__scale).astype(self.__precision.dtype)
+
+        z = np.full((len(ys), len(xs)), np.nan, dtype=self.__precision.dtype)
+        evaluated = np.zeros(z.shape, dtype=bool)
+        z[::size, ::size] = self.__calc_grid(calc, xs[::size], ys[::size])
+        evaluated[::size, ::size] = True
+        active = np.ones((n_y, n_x), dtype=bool)  # Cells that still need to be interpolated or split
+
+        while size > 1:
+            corners = z[::size, ::size]
+            c00, c01, c10, c11 = corners[:-1, :-1], corners[:-1, 1:], corners[1:, :-1], corners[1:, 1:]
+            stacked = np.stack([c00, c01, c10, c11])
+
+            with np.errstate(invalid="ignore"):
+                smooth = active & (not strict) & ((stacked.max(axis=0) - stacked.min(axis=0) <= tolerance) | np.isnan(stacked).all(axis=0))
+            # end with
+
+            if smooth.any():
+                t = np.arange(size) / size
+                ty = t[np.newaxis, :, np.newaxis, np.newaxis]
+                tx = t[np.newaxis, np.newaxis, np.newaxis, :]
+                c00, c01, c10, c11 = (c[:, np.newaxis, :, np.newaxis] for c in (c00, c01, c10, c11))
+
+                values = (c00 * (1 - tx) + c01 * tx) * (1 - ty) + (c10 * (1 - tx) + c11 * tx) * ty
+                mask = np.broadcast_to(smooth[:, np.newaxis, :, np.newaxis], values.shape).reshape(n_y * size, n_x * size)
+                mask = mask & ~evaluated[:-1, :-1]
+                z[:-1, :-1][mask] = values.reshape(n_y * size, n_x * size)[mask]
+            # end if
+
+            # Split the remaining cells and evaluate their new corners
+            active = (active & ~smooth).repeat(2, axis=0).repeat(2, axis=1)
+            size //= 2
+            n_y *= 2
+            n_x *= 2
+
+            needed = np.zeros((n_y + 1, n_x + 1), dtype=bool)
+            needed[:-1, :-1] |= active
+            needed[:-1, 1:] |= active
+            needed[1:, :-1] |= active
+            needed[1:, 1:] |= active
+            needed &= ~evaluated[::size, ::size]
+
+            rows, cols = np.nonzero(needed)
+            z[rows * size, cols * size] = calc(xs[cols * size], ys[rows * size])
+            evaluated[rows * size, cols * size] = True
+        # end while
+
+        return z[:self.__h, :self.__w]
+    # end def
+
+    def calc_image_to_file(self, filename: str) -> np.memmap:
+        # Renders the image tile by tile in row-major order straight into a memory mapped .npy file, which can be loaded
+        # later on using np.load(filename, mmap_mode="r"). Only the tiles in progress are held in memory, so the peak memory
+        # depends on the tile size and the number of threads, but not on the size of the image. With use_symmetry the tiles
+        # that are mirror images of others get copied within the file.
+        calc = self.__calc_func()
+        xs, ys = self.__coords()
+        z = np.lib.format.open_memmap(filename, mode="w+", dtype=self.__precision.dtype, shape=(self.__h, self.__w))
+
+        # Index of the pixel each column and row gets copied from and the sign to apply, i.e. its own index for the
+        # pixels to evaluate
+        src_x, src_y = np.arange(self.__w), np.arange(self.__h)
+        sign_x, sign_y = np.ones(self.__w), np.ones(self.__h)
+
+        for coords, src, sign, parity in ((xs, src_x, sign_x, self.__symmetry[0]), (ys, src_y, sign_y, self.__symmetry[1])):
+            if parity is not Parity.NONE:
+                evaluated, mirrored = mirror(coords)
+                src[~evaluated] = np.flatnonzero(evaluated)[mirrored]
+                sign[~evaluated] = -1. if parity is Parity.ODD else 1.
+            # end if
+        # end for
+
+        def is_copy(tile: Tuple[int, int, int, int]) -> bool:
+            x_start, x_end, y_start, y_end = tile
+
+            return bool((src_x[x_start:x_end] != np.arange(x_start, x_end)).all() or (src_y[y_start:y_end] != np.arange(y_start, y_end)).all())
+        # end def
+
+        def calc_tile(tile: Tuple[int, int, int, int]) -> None:
+            x_start, x_end, y_start, y_end = tile
+            z[y_start:y_end, x_start:x_end] = self.__calc_grid(calc, xs[x_start:x_end], ys[y_start:y_end])
+        # end def
+
+        def copy_tile(tile: Tuple[int, int, int, int]) -> None:
+            # All pixels the tile gets copied from are part of evaluated tiles
+            x_start, x_end, y_start, y_end = tile
+            values = z[src_y[y_start:y_end, np.newaxis], src_x[np.newaxis, x_start:x_end]]
+            z[y_start:y_end, x_start:x_end] = values * sign_y[y_start:y_end, np.newaxis] * sign_x[np.newaxis, x_start:x_end]
+        # end def
+
+        tile_list = list(tiles(self.__w, self.__h, self.__tile_size))
+
+        for func, selected in ((calc_tile, [tile for tile in tile_list if not is_copy(tile)]),
+                               (copy_tile, [tile for tile in tile_list if is_copy(tile)])):
+            if self.__n_threads <= 1:
+                for tile in selected:
+                    func(tile)
+                # end for
+
+            else:
+                with ThreadPoolExecutor(max_workers=self.__n_threads) as executor:
+                    list(executor.map(func, selected))
+                # end with
+            # end if
+        # end for
+
+        z.flush()
+
+        return z
+    # end def
+
+    def export_pyramid(self, filename: str, tile_size: int = 254, overlap: int = 1, v_min: Optional[float] = None,
+                       v_max: Optional[float] = None) -> int:
+        # Exports the image as a Deep Zoom tile pyramid with the viewport and colour map of this matrix, see PyramidExporter
+        exporter = PyramidExporter(self.__circuit, self.__w, self.__h, self.__center, self.__scale, self.__cmap, v_min, v_max, tile_size,
+                                   overlap, self.__tile_pool, self.__precision)
+
+        return exporter.export(filename)
+    # end def
+
+    def __render(self) -> np.ndarray:
+        if self.__eval_mode is EvalMode.DEEP_ZOOM:
+            z = DeepZoomRenderer(self.__circuit, self.__w, self.__h, self.__center, self.__scale).calc_image()
+
+            return z.astype(self.__precision.dtype, copy=False)
+        # end if
+
+        if self.__tile_pool is not None and self.__compile().vectorized:
+            return self.__tile_pool.render(self.__circuit, self.__w, self.__h, self.__center, self.__scale, self.__precision)
+        # end if
+
+        xs, ys = self.__coords()
+
+        return self.__calc_grid(self.__calc_func(), xs, ys)
+    # end def
+
+    def __coords(self) -> Tuple[np.ndarray, np.ndarray]:
+        # The coordinates get calculated in double precision and rounded afterwards, so they're as accurate as possible
+        return (pixel_coords(0, self.__w, self.__w, self.__center[0], self.__scale).astype(self.__precision.dtype),
+                pixel_coords(0, self.__h, self.__h, self.__center[1], self.__scale).astype(self.__precision.dtype))
+    # end def
+
+    def __compile(self) -> Tape:
+        optimizer = TapeOptimizer()
+        tape = optimizer.optimize(TapeCompiler().compile(self.__circuit))
+
+        if self.__eval_mode is EvalMode.TAPE:
+            self.__optimizer_report = optimizer.report
+        # end if
+
+        return tape
+    # end def
+
+    def __calc_func(self) -> Callable[[np.ndarray, np.ndarray], np.ndarray]:
+        # Returns a function that evaluates the circuit in the current mode for the given x- and y-coordinates, which may
+        # be any arrays that can be broadcast against each other. Each call evaluates the circuit within its own context,
+        # so concurrent calls don't interfere.
+        if self.__eval_mode is EvalMode.DEEP_ZOOM:
+            raise ValueError("Deep zoom renders whole images only, use calc_image() instead.")
+        # end if
+
+        tape = None
+
+        if self.__eval_mode is not EvalMode.SCALAR or self.__cull_tiles or self.__use_symmetry or self.__tile_cache is not None:
+            tape = self.__compile()
+        # end if
+
+        # The bounds of the tiles are calculated in double precision, which only holds for pixels evaluated in double precision
+        # as well. With a lower one, rounding (e.g. of the constants) may give other values than the bounds prove.
+        self.__bound_tape = tape if self.__cull_tiles and self.__precision is Precision.DOUBLE else None
+        self.__symmetry = SymmetryAnalysis().symmetry(tape) if self.__use_symmetry else (Parity.NONE, Parity.NONE)
+        if tape is not None:
+            self.__circuit_hash = tape.structural_hash()
+        # end if
+
+        if self.__eval_mode is EvalMode.SCALAR or not tape.vectorized:
+            return self.__calc_scalar
+
+        elif self.__eval_mode is EvalMode.TAPE:
+            def calc(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+                z = np.empty(np.broadcast_shapes(x.shape, y.shape), dtype=self.__precision.dtype)
+
+                with EvalContext():
+                    z[...] = tape.run(x, y)
+                # end with
+
+                return z
+            # end def
+
+            return calc
+
+        else:
+            return self.__calc_vectorized
+        # end if
+    # end def
+
+    def __calc_scalar(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        # The blocks calculate with Python floats, so only the results get rounded to the precision
+        x, y = np.broadcast_arrays(x, y)
+        z = np.empty(x.shape, dtype=self.__precision.dtype)
+
+        with EvalContext():
+            # Column by column, i.e. the last axis first
+            for idx in np.ndindex(*x.shape[::-1]):
+                idx = idx[::-1]
+                z[idx] = self.__circuit.eval(float(x[idx]), float(y[idx]))
+                # z[idx] = self.mandelbrot(x[idx] / 50, y[idx] / 50)
+            # end for
+        # end with
+
+        return z
+    # end def
+
+    def __calc_vectorized(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        z = np.empty(np.broadcast_shapes(x.shape, y.shape), dtype=self.__precision.dtype)
+
+        with EvalContext():
+            z[...] = self.__circuit.eval_vec(x, y)
+        # end with
+
+        return z
+    # end def
+
+    def __calc_grid(self, calc: Callable[[np.ndarray, np.ndarray], np.ndarray], xs: np.ndarray, ys: np.ndarray,
+                    symmetry: Optional[Tuple[Parity, Parity]] = None) -> np.ndarray:
+        # Evaluates all combinations of the given x- and y-coordinates and returns one row per y-coordinate. If the circuit
+        # is symmetric, only the coordinates without a mirror image get evaluated and the rest of the image gets mirrored.
+        parity_x, parity_y = symmetry if symmetry is not None else self.__symmetry
+
+        if parity_x is not Parity.NONE:
+            evaluated, src = mirror(xs)
+
+            if not evaluated.all():
+                z = np.empty((len(ys), len(xs)), dtype=self.__precision.dtype)
+                z[:, evaluated] = part = self.__calc_grid(calc, xs[evaluated], ys, (Parity.NONE, parity_y))
+                z[:, ~evaluated] = -part[:, src] if parity_x is Parity.ODD else part[:, src]
+
+                return z
+            # end if
+        # end if
+
+        if parity_y is not Parity.NONE:
+            evaluated, src = mirror(ys)
+
+            if not evaluated.all():
+                z = np.empty((len(ys), len(xs)), dtype=self.__precision.dtype)
+                z[evaluated] = part = self.__calc_tiles(calc, xs, ys[evaluated])
+                z[~evaluated] = -part[src] if parity_y is Parity.ODD else part[src]
+
+                return z
+            # end if
+        # end if
+
+        return self.__calc_tiles(calc, xs, ys)
+    # end def
+
+    def __calc_tiles(self, calc: Callable[[np.ndarray, np.ndarray], np.ndarray], xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        # Evaluates all combinations of the given x- and y-coordinates and returns one row per y-coordinate. The coordinates
+        # are passed as a single row and column, so blocks depending on only one of them get broadcast instead of
+        # calculated for each pixel.
+        if (self.__n_threads <= 1 and self.__bound_tape is None and self.__tile_cache is None) or len(xs) == 0 or len(ys) == 0:
+            return calc(xs[np.newaxis, :], ys[:, np.newaxis])
+        # end if
+
+        z = np.empty((len(ys), len(xs)), dtype=self.__precision.dtype)
+
+        def calc_tile(tile: Tuple[int, int, int, int]) -> None:
+            x_start, x_end, y_start, y_end = tile
+            tile_xs = xs[x_start:x_end]
+            tile_ys = ys[y_start:y_end]
+            key = None
+
+            # The coordinates of the pixels identify the tile within the image as well as the scale of the image. The modes
+            # may round differently, e.g. SCALAR with single precision.
+            if self.__tile_cache is not None:
+                key = (self.__circuit_hash, self.__eval_mode.value, self.__precision.value, tile_xs.tobytes(), tile_ys.tobytes())
+                values = self.__tile_cache.get(key)
+
+                if values is not None:
+                    z[y_start:y_end, x_start:x_end] = values
+                    return
+                # end if
+            # end if
+
+            # If the bounds of all values within the tile are a single value, there's no need to evaluate its pixels
+            if self.__bound_tape is not None:
+                bounds = self.__bound_tape.run_interval(Interval(tile_xs.min(), tile_xs.max()), Interval(tile_ys.min(), tile_ys.max()))
+
+                if bounds.single:
+                    z[y_start:y_end, x_start:x_end] = bounds.value
+                    return
+                # end if
+            # end if
+
+            z[y_start:y_end, x_start:x_end] = calc(tile_xs[np.newaxis, :], tile_ys[:, np.newaxis])
+
+            if key is not None:
+                self.__tile_cache.put(key, z[y_start:y_end, x_start:x_end])
+            # end if
+        # end def
+
+        # Cached tiles are aligned to the coordinate space, so panned images reuse the tiles they have in common
+        if self.__tile_cache is not None:
+            tile_list = list(aligned_tiles(xs, ys, self.__tile_size * self.__scale))
+        else:
+            tile_list = list(tiles(len(xs), len(ys), self.__tile_size))
+        # end if
+
+        if self.__n_threads <= 1 or len(tile_list) == 1:
+            for tile in tile_list:
+                calc_tile(tile)
+            # end for
+
+        else:
+            # The kernels spend most of their time in numpy, which releases the GIL, so the tiles get evaluated concurrently
+            with ThreadPoolExecutor(max_workers=self.__n_threads) as executor:
+                list(executor.map(calc_tile, tile_list))
+            # end with
+        # end if
 
         return z
     # end def
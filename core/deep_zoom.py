@@ -0,0 +1,296 @@
+from __future__ import annotations
+from typing import Any, List, Tuple, Union
+from decimal import Decimal, localcontext
+import math
+import ntpath
+import numpy as np
+
+from base import kernels
+from base.basic import Circuit
+from base.black_box import RepeatBox
+from base.context import EvalContext
+from core.optimizer import TapeOptimizer
+from core.tape import LoopOp, Tape, TapeCompiler
+from core.tile_pool import pixel_coords
+
+
+__author__ = "Anton Höß"
+__copyright__ = "Copyright 2021"
+
+
+def _reference_orbit(c: Tuple[Decimal, Decimal], z0: complex, n_rep: int, radius: float, prec: int) -> np.ndarray:
+    # Iterates z = z^2 + c with the given number of significant digits and returns the values z_0..z_n_rep rounded to
+    # complex128. The orbit ends early with the first value outside the radius, since it grows beyond any bounds afterwards.
+    orbit = [complex(z0)]
+
+    with localcontext() as ctx:
+        ctx.prec = prec
+        c_re, c_im = c
+        z_re, z_im = Decimal(z0.real), Decimal(z0.imag)
+
+        for _ in range(n_rep):
+            if abs(orbit[-1]) > radius:
+                break
+            # end if
+
+            z_re, z_im = z_re * z_re - z_im * z_im + c_re, 2 * z_re * z_im + c_im
+            orbit.append(complex(float(z_re), float(z_im)))
+        # end for
+    # end with
+
+    return np.array(orbit)
+# end def
+
+
+def _perturb(orbit: np.ndarray, dc: np.ndarray, n_rep: int, radius: float, tolerance: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Iterates the deviations d of the points c_ref + dc from the reference orbit Z in double precision, i.e.
+    # d_k = 2 Z_k-1 d_k-1 + d_k-1^2 + dc with z_k = Z_k + d_k. Returns the repetition each point escaped in (0 if it didn't),
+    # its last value z and the ratio |z| / |Z| for the points that glitched, inf for all others.
+    # A point glitches once |z| gets much smaller than |Z| (Pauldelbrot's criterion), since d then has cancelled out most
+    # of Z and its remaining digits are mostly rounding errors. Points are glitched as well, if they need a value of the
+    # reference orbit after it escaped.
+    escaped = np.zeros(dc.shape, dtype=int)
+    z_last = np.full(dc.shape, np.nan, dtype=complex)
+    ratio = np.full(dc.shape, np.inf)
+    glitched = np.zeros(dc.shape, dtype=bool)
+
+    active = np.arange(dc.size)
+    d = np.zeros(dc.shape, dtype=complex)
+    dc_active = dc
+
+    with np.errstate(over="ignore", invalid="ignore"):
+        for k in range(1, n_rep + 1):
+            if k > len(orbit):
+                glitched[active] = True
+                active = active[:0]
+                break
+            # end if
+
+            z = orbit[k - 1] + d
+            mag = np.abs(z)
+            esc = mag > radius
+            glt = ~esc & (mag < tolerance * abs(orbit[k - 1]))
+
+            escaped[active[esc]] = k
+            z_last[active[esc]] = z[esc]
+            glitched[active[glt]] = True
+            ratio[active[glt]] = mag[glt] / abs(orbit[k - 1])
+
+            go = ~(esc | glt)
+            active, d, dc_active = active[go], d[go], dc_active[go]
+            d = 2 * orbit[k - 1] * d + d * d + dc_active
+        # end for
+
+        if active.size > 0:
+            if n_rep < len(orbit):
+                z_last[active] = orbit[n_rep] + d
+            else:
+                glitched[active] = True
+            # end if
+        # end if
+    # end with
+
+    ratio[glitched & np.isinf(ratio)] = np.finfo(float).max  # Glitched without a ratio, e.g. at the end of the orbit
+
+    return escaped, z_last, ratio
+# end def
+
+
+class DeepZoomRenderer:
+    # Renders circuits using the mandelbrot box (special/mandelbrot) at zoom levels far beyond the precision of float64 by
+    # perturbation: only a single reference point gets iterated with as many digits as needed (see decimal), all other
+    # pixels get iterated as small deviations from this reference orbit in double precision. Pixels whose deviations lose
+    # their precision (glitches) get rendered again using a new reference among them, until none are left or the maximum
+    # number of references is reached. Pixels still glitched after that are undefined.
+    # The center may be given as a string or Decimal with any number of digits. The coordinates of the mandelbrot box need to
+    # be an affine function of the pixel's coordinates (e.g. scaled), its start values and number of repetitions need
+    # to be the same for all pixels. The rest of the circuit gets evaluated as usual in double precision.
+    # The box is recognized by the file it was loaded from, regardless of the name of its instance.
+    MANDELBROT_BOX = "mandelbrot_inner.cmr"
+
+    def __init__(self, circuit: Circuit, width: int, height: int, center: Tuple[Union[float, str, Decimal], Union[float, str, Decimal]] = (0., 0.),
+                 scale: float = 1., max_references: int = 32, glitch_tolerance: float = 1e-3) -> None:
+        if scale <= 0:
+            raise ValueError(f"The scale needs to be positive, but is {scale}.")
+        # end if
+
+        if max_references < 1:
+            raise ValueError(f"The maximum number of references needs to be at least 1, but is {max_references}.")
+        # end if
+
+        self.__w: int = width
+        self.__h: int = height
+        self.__center: Tuple[Decimal, Decimal] = (Decimal(center[0]), Decimal(center[1]))
+        self.__scale: float = scale
+        self.__max_references: int = max_references
+        self.__glitch_tolerance: float = glitch_tolerance
+        self.__n_references: int = 0
+        self.__n_glitched: int = 0
+
+        circuit.set_size(self.__w, self.__h)
+        self.__tape: Tape = TapeOptimizer().optimize(TapeCompiler().compile(circuit))
+        loops = [op for op in self.__tape.ops if isinstance(op, LoopOp) and self.__is_mandelbrot_box(op.block)]
+
+        if len(loops) != 1:
+            raise ValueError(f"Deep zoom needs a circuit with exactly one mandelbrot box, but it has {len(loops)}.")
+        # end if
+
+        self.__loop: LoopOp = loops[0]
+    # end def
+
+    @property
+    def n_references(self) -> int:
+        # Number of reference orbits used by the last rendering
+        return self.__n_references
+    # end def
+
+    @property
+    def n_glitched(self) -> int:
+        # Number of pixels left undefined by the last rendering
+        return self.__n_glitched
+    # end def
+
+    def calc_image(self) -> np.ndarray:
+        loop = self.__loop
+        radius = self.__radius()
+        (a, b), (z0, i0, res0, n_rep) = self.__box_inputs()
+
+        # Offsets of the pixels from the center and of their points on the complex plane from the center's point
+        u = (np.arange(self.__w) + int(-self.__w / 2)) * self.__scale
+        v = (np.arange(self.__h) + int(-self.__h / 2)) * self.__scale
+        dc = ((a[0, 0] * u[np.newaxis, :] + a[0, 1] * v[:, np.newaxis]) + 1j * (a[1, 0] * u[np.newaxis, :] + a[1, 1] * v[:, np.newaxis])).ravel()
+
+        # Enough digits for the reference to tell neighbouring pixels apart, plus some to spare
+        spacing = self.__scale * max(float(np.abs(a).max()), np.finfo(float).tiny)
+        prec = max(34, math.ceil(-math.log10(spacing)) + 20)
+
+        with localcontext() as ctx:
+            ctx.prec = prec
+            c_center = (Decimal(a[0, 0]) * self.__center[0] + Decimal(a[0, 1]) * self.__center[1] + Decimal(b[0]),
+                        Decimal(a[1, 0]) * self.__center[0] + Decimal(a[1, 1]) * self.__center[1] + Decimal(b[1]))
+        # end with
+
+        escaped = np.zeros(dc.shape, dtype=int)
+        z_last = np.full(dc.shape, np.nan, dtype=complex)
+        todo = np.arange(dc.size)
+        ref = 0j  # Offset of the reference from the center's point, the first reference is the center itself
+        self.__n_references = 0
+
+        if res0 != 0:
+            todo = todo[:0]  # The box never changes its state then
+            z_last[:] = z0
+        # end if
+
+        while todo.size > 0 and self.__n_references < self.__max_references:
+            with localcontext() as ctx:
+                ctx.prec = prec
+                c_ref = (c_center[0] + Decimal(ref.real), c_center[1] + Decimal(ref.imag))
+            # end with
+
+            orbit = _reference_orbit(c_ref, z0, n_rep, radius, prec)
+            self.__n_references += 1
+
+            esc, z, ratio = _perturb(orbit, dc[todo] - ref, n_rep, radius, self.__glitch_tolerance)
+            done = np.isinf(ratio)
+            escaped[todo[done]] = esc[done]
+            z_last[todo[done]] = z[done]
+
+            # The next reference is the glitched pixel that lost the most precision, which is usually the middle of its glitch
+            if not done.all():
+                ref = dc[todo[np.argmin(ratio)]]
+            # end if
+
+            todo = todo[~done]
+        # end while
+
+        self.__n_glitched = todo.size
+
+        # The values of the box's outputs, which the rest of the circuit continues with
+        c0 = complex(float(c_center[0]), float(c_center[1])) + dc
+        res = np.where(escaped > 0, i0 + escaped - 1, res0).astype(float)
+        res[todo] = np.nan
+        box_outs = [c0.real, c0.imag, z_last.real, z_last.imag, np.full(dc.shape, i0 + n_rep, dtype=float), res]
+
+        slots: List[Any] = [None] * self.__tape.n_slots
+        slots[Tape.SLOT_X] = pixel_coords(0, self.__w, self.__w, float(self.__center[0]), self.__scale)[np.newaxis, :]
+        slots[Tape.SLOT_Y] = pixel_coords(0, self.__h, self.__h, float(self.__center[1]), self.__scale)[:, np.newaxis]
+
+        for slot, value in self.__tape.consts.items():
+            slots[slot] = value
+        # end for
+
+        with EvalContext():
+            for op in self.__tape.ops:
+                if op is loop:
+                    for slot, value in zip(loop.outs, box_outs):
+                        slots[slot] = value.reshape(self.__h, self.__w)
+                    # end for
+                else:
+                    op.run(slots)
+                # end if
+            # end for
+        # end with
+
+        z = np.empty((self.__h, self.__w))
+        z[...] = slots[self.__tape.out_slot]
+
+        return z
+    # end def
+
+    @staticmethod
+    def __is_mandelbrot_box(box: RepeatBox) -> bool:
+        # Nested boxes are referenced by paths with Windows separators as well, which ntpath splits along with the POSIX ones
+        return box.filename is not None and ntpath.basename(box.filename) == DeepZoomRenderer.MANDELBROT_BOX
+    # end def
+
+    def __radius(self) -> float:
+        # The box compares the absolute value of z to its border constant
+        gt = next((op for op in self.__loop.body_ops if op.block.name == "abs_c_gt_2"), None)
+
+        if gt is None or gt.ins[1] not in self.__tape.consts:
+            raise ValueError("The escape radius of the mandelbrot box needs to be a constant.")
+        # end if
+
+        return float(self.__tape.consts[gt.ins[1]])
+    # end def
+
+    def __box_inputs(self) -> Tuple[Tuple[np.ndarray, np.ndarray], Tuple[complex, float, float, int]]:
+        # Evaluates the operations up to the box for a few sample coordinates to find the affine function c0 = a (x, y) + b
+        # and the start values, which must be the same for all of them
+        xs = np.array([0., 1., 0., 2., -3., .5, 7.])
+        ys = np.array([0., 0., 1., -1., 4., 7., -.25])
+
+        slots: List[Any] = [None] * self.__tape.n_slots
+        slots[Tape.SLOT_X] = xs
+        slots[Tape.SLOT_Y] = ys
+
+        for slot, value in self.__tape.consts.items():
+            slots[slot] = value
+        # end for
+
+        with EvalContext(), np.errstate(all="ignore"):
+            for op in self.__tape.ops[:self.__tape.ops.index(self.__loop)]:
+                op.run(slots)
+            # end for
+        # end with
+
+        c0_re, c0_im = (np.broadcast_to(np.asarray(slots[slot], dtype=float), xs.shape) for slot in self.__loop.ins[:2])
+        b = np.array([c0_re[0], c0_im[0]])
+        a = np.array([[c0_re[1] - b[0], c0_re[2] - b[0]], [c0_im[1] - b[1], c0_im[2] - b[1]]])
+
+        if not (np.allclose(a[0, 0] * xs + a[0, 1] * ys + b[0], c0_re, rtol=1e-9, atol=0.) and
+                np.allclose(a[1, 0] * xs + a[1, 1] * ys + b[1], c0_im, rtol=1e-9, atol=0.)):
+            raise ValueError("The coordinates of the mandelbrot box need to be an affine function of the pixel's coordinates.")
+        # end if
+
+        values = [slots[slot] for slot in self.__loop.ins[2:]]
+
+        if any(np.ndim(value) != 0 or value is None for value in values):
+            raise ValueError("The start values and the number of repetitions of the mandelbrot box need to be the same for all pixels.")
+        # end if
+
+        z0_re, z0_im, i0, res0, n_rep = values
+
+        return (a, b), (complex(z0_re, z0_im), float(i0), float(res0), int(kernels.repetitions(n_rep)))
+    # end def
+# end class
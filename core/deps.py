@@ -0,0 +1,17 @@
+from __future__ import annotations
+from enum import Flag
+
+
+__author__ = "Anton Höß"
+__copyright__ = "Copyright 2021"
+
+
+class Dep(Flag):
+    # Coordinates a value depends on. Tapes get evaluated with the x-coordinates as a single row and the y-coordinates as a
+    # single column (see Tape.run_grid()), so numpy's broadcasting calculates values depending on Dep.X once per column,
+    # those depending on Dep.Y once per row and those depending on Dep.CONST only once.
+    CONST = 0  # Same value for all pixels, e.g. constants or the image size
+    X = 1  # Only depends on the x-coordinate, i.e. same value within each column
+    Y = 2  # Only depends on the y-coordinate, i.e. same value within each row
+    XY = 3  # Depends on both coordinates
+# end class
@@ -0,0 +1,196 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Set, Tuple
+import numpy as np
+
+from core.tape import Op, LoopOp, Tape
+
+
+__author__ = "Anton Höß"
+__copyright__ = "Copyright 2021"
+
+
+def _count(ops: List[Op]) -> int:
+    return sum(1 + (_count(op.body_ops) if isinstance(op, LoopOp) else 0) for op in ops)
+# end def
+
+
+class OptimizerReport:
+    def __init__(self) -> None:
+        self.merged: List[str] = list()
+        self.folded: List[str] = list()
+        self.removed: List[str] = list()
+        self.n_ops_before: int = 0
+        self.n_ops_after: int = 0
+    # end def
+
+    def __str__(self) -> str:
+        lines = [f"Operations: {self.n_ops_before} -> {self.n_ops_after}",
+                 f"Common subexpressions merged: {len(self.merged)}"]
+        lines += [f"    {name}" for name in self.merged]
+        lines += [f"Constant folded: {len(self.folded)}"]
+        lines += [f"    {name}" for name in self.folded]
+        lines += [f"Dead blocks removed: {len(self.removed)}"]
+        lines += [f"    {name}" for name in self.removed]
+
+        return "\n".join(lines)
+    # end def
+# end class
+
+
+class TapeOptimizer:
+    # Simplifies a compiled tape before it gets evaluated for a whole image:
+    # - Common subexpression elimination: Operations of the same block type with equal parameters and equal inputs are
+    #   merged into a single one, e.g. multiple instances of the same box working on the same inputs.
+    # - Constant folding: Operations whose inputs are all known in advance (constants, the image size, unconnected pins) are
+    #   calculated once and their results are stored as constants of the tape, unless their blocks have no kernel. Inside
+    #   repeat boxes this hoists all operations out of the loop that don't depend on the loop's state. Loops with only
+    #   constant inputs get folded as a whole.
+    # - Dead block elimination: Operations whose results are never used for the drawer's value are removed. For repeat
+    #   boxes this includes the pins of the loop state that neither contribute to a used output nor to another used pin.
+    # Blocks that are not connected to the drawer at all never make it onto the tape in the first place.
+    def __init__(self) -> None:
+        self.__report: OptimizerReport = OptimizerReport()
+    # end def
+
+    @property
+    def report(self) -> OptimizerReport:
+        return self.__report
+    # end def
+
+    def optimize(self, tape: Tape) -> Tape:
+        self.__report = OptimizerReport()
+        self.__report.n_ops_before = _count(tape.ops)
+
+        consts: Dict[int, Any] = dict(tape.consts)
+        consts[Tape.SLOT_NONE] = None
+
+        replaced: Dict[int, int] = dict()
+        ops = self.__merge(tape.ops, dict(), replaced)
+        out_slot = replaced.get(tape.out_slot, tape.out_slot)
+
+        ops = self.__fold(ops, consts)
+        ops = self.__eliminate(ops, {out_slot}, record=True)
+
+        # Only keep the constants that are still in use
+        used = {out_slot}
+
+        for op in ops:
+            used |= op.reads()
+        # end for
+
+        consts = {slot: value for slot, value in consts.items() if slot in used and slot != Tape.SLOT_NONE}
+
+        self.__report.n_ops_after = _count(ops)
+
+        return Tape(ops, tape.n_slots, out_slot, consts)
+    # end def
+
+    def __merge(self, ops: List[Op], known: Dict[Tuple, List[int]], replaced: Dict[int, int]) -> List[Op]:
+        # known maps the key of every operation seen so far to its output slots, replaced maps the output slots of merged
+        # operations to the ones of the operation they were merged into
+        res: List[Op] = list()
+
+        for op in ops:
+            ins = [replaced.get(slot, slot) for slot in op.ins]
+
+            if isinstance(op, LoopOp):
+                # The body may reuse results from outside, but results from inside the body are not valid outside of it
+                body_ops = self.__merge(op.body_ops, dict(known), replaced)
+                body_outs = [replaced.get(slot, slot) for slot in op.body_outs]
+                body_cont = replaced.get(op.body_cont, op.body_cont)
+                res.append(LoopOp(op.block, ins, op.outs, op.body_ins, body_ops, body_outs, body_cont))
+                continue
+            # end if
+
+            key = (type(op.block), op.block.params(), tuple(ins))
+
+            if key in known:
+                for slot, known_slot in zip(op.outs, known[key]):
+                    replaced[slot] = known_slot
+                # end for
+
+                self.__report.merged.append(op.name)
+
+            else:
+                known[key] = op.outs
+                res.append(Op(op.block, ins, op.outs))
+            # end if
+        # end for
+
+        return res
+    # end def
+
+    def __fold(self, ops: List[Op], consts: Dict[int, Any]) -> List[Op]:
+        res: List[Op] = list()
+
+        for op in ops:
+            if op.vectorized and all(slot in consts for slot in op.reads()):
+                with np.errstate(all="ignore"):
+                    op.run(consts)
+                # end with
+
+                self.__report.folded.append(op.name)
+
+            elif isinstance(op, LoopOp):
+                body_ops = self.__fold(op.body_ops, consts)
+                res.append(LoopOp(op.block, op.ins, op.outs, op.body_ins, body_ops, op.body_outs, op.body_cont))
+
+            else:
+                res.append(op)
+            # end if
+        # end for
+
+        return res
+    # end def
+
+    def __eliminate(self, ops: List[Op], live: Set[int], record: bool) -> List[Op]:
+        # Backward pass over the operations, live holds all slots whose values are still needed and gets updated in place
+        res: List[Op] = list()
+
+        for op in reversed(ops):
+            if not any(slot in live for slot in op.outs):
+                if record:
+                    self.__report.removed.append(op.name)
+                # end if
+
+                continue
+            # end if
+
+            if isinstance(op, LoopOp):
+                op = self.__eliminate_loop(op, live, record)
+            # end if
+
+            live |= op.reads()
+            res.append(op)
+        # end for
+
+        res.reverse()
+
+        return res
+    # end def
+
+    def __eliminate_loop(self, op: LoopOp, live: Set[int], record: bool) -> LoopOp:
+        # A pin of the loop state is needed if its output is used after the loop or if the body needs its value for another
+        # needed pin or for the condition to continue, so iterate until the set of needed pins doesn't change anymore
+        state = {pin for pin, slot in enumerate(op.outs) if slot in live}
+        cont = {op.body_cont} if op.body_cont is not None else set()
+
+        while True:
+            body_live = {op.body_outs[pin] for pin in state} | cont
+            self.__eliminate(op.body_ops, body_live, record=False)
+            needed = state | {pin for pin, slot in enumerate(op.body_ins) if slot in body_live}
+
+            if needed == state:
+                break
+            # end if
+
+            state = needed
+        # end while
+
+        pins = sorted(state)
+        body_ops = self.__eliminate(op.body_ops, {op.body_outs[pin] for pin in pins} | cont, record)
+
+        return LoopOp(op.block, [op.ins[pin] for pin in pins] + [op.ins[-1]], [op.outs[pin] for pin in pins],
+                      [op.body_ins[pin] for pin in pins], body_ops, [op.body_outs[pin] for pin in pins], op.body_cont)
+    # end def
+# end class
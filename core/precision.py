@@ -0,0 +1,80 @@
+from __future__ import annotations
+from enum import Enum
+import numpy as np
+
+
+__author__ = "Anton Höß"
+__copyright__ = "Copyright 2021"
+
+
+class Precision(Enum):
+    SINGLE = "float32"  # Half the memory bandwidth and about twice the throughput, good enough for previews
+    DOUBLE = "float64"
+
+    @property
+    def dtype(self) -> np.dtype:
+        return np.dtype(self.value)
+    # end def
+# end class
+
+
+class PrecisionReport:
+    # Deviation of an image rendered with a lower precision from the same image rendered with double precision
+    def __init__(self) -> None:
+        self.precision: Precision = Precision.DOUBLE
+        self.n_pixels: int = 0
+        self.n_differing: int = 0  # Pixels whose values aren't exactly the same
+        self.n_undefined_mismatch: int = 0  # Pixels that are undefined in only one of the images
+        self.max_abs_error: float = 0.
+        self.mean_abs_error: float = 0.
+        self.max_rel_error: float = 0.
+    # end def
+
+    def __str__(self) -> str:
+        lines = [f"Precision: {self.precision.value} compared to float64",
+                 f"Pixels differing: {self.n_differing} of {self.n_pixels}",
+                 f"Pixels undefined in only one image: {self.n_undefined_mismatch}",
+                 f"Max absolute error: {self.max_abs_error:.6g}",
+                 f"Mean absolute error: {self.mean_abs_error:.6g}",
+                 f"Max relative error: {self.max_rel_error:.6g}"]
+
+        return "\n".join(lines)
+    # end def
+
+    @staticmethod
+    def compare(z: np.ndarray, z_ref: np.ndarray, precision: Precision) -> PrecisionReport:
+        # The errors only cover the pixels that are defined in both images
+        if z.shape != z_ref.shape:
+            raise ValueError(f"The images need to have the same shape, but have {z.shape} and {z_ref.shape}.")
+        # end if
+
+        report = PrecisionReport()
+        report.precision = precision
+        report.n_pixels = z_ref.size
+
+        z = np.asarray(z, dtype=float)
+        z_ref = np.asarray(z_ref, dtype=float)
+        undefined, undefined_ref = np.isnan(z), np.isnan(z_ref)
+        defined = ~undefined & ~undefined_ref
+
+        report.n_undefined_mismatch = int(np.count_nonzero(undefined != undefined_ref))
+        report.n_differing = int(np.count_nonzero(defined & (z != z_ref))) + report.n_undefined_mismatch
+
+        with np.errstate(invalid="ignore", over="ignore"):
+            abs_error = np.where(z[defined] == z_ref[defined], 0., np.abs(z[defined] - z_ref[defined]))  # Also equal infinities
+            ref = np.abs(z_ref[defined])
+        # end with
+
+        if abs_error.size > 0:
+            report.max_abs_error = float(abs_error.max())
+            report.mean_abs_error = float(abs_error.mean())
+
+            # Relative to the value of the reference, exact zeros in the reference only count if they aren't hit exactly
+            nonzero = ref > 0
+            rel_error = np.where(nonzero, abs_error / np.where(nonzero, ref, 1.), np.where(abs_error > 0, np.inf, 0.))
+            report.max_rel_error = float(rel_error.max())
+        # end if
+
+        return report
+    # end def
+# end class
@@ -0,0 +1,201 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import math
+import os
+import shutil
+import matplotlib.pyplot as plt
+import numpy as np
+
+from base.basic import Circuit
+from core.optimizer import TapeOptimizer
+from core.precision import Precision
+from core.tape import Tape, TapeCompiler
+from core.tile_pool import TilePool
+
+
+__author__ = "Anton Höß"
+__copyright__ = "Copyright 2021"
+
+
+def _level_coords(start: int, end: int, factor: int, size: int, center: float, scale: float, precision: Precision = Precision.DOUBLE) -> np.ndarray:
+    # Coordinates of the pixels start..end-1 of a level, whose pixels each cover factor pixels of the full resolution
+    # image of the given size. Each pixel samples the middle of the pixels it covers, the full resolution level has the
+    # same coordinates as the image rendered by CrazyMatrix, which are rounded to the precision only at the end.
+    return (center + (np.arange(start, end, dtype=float) * factor + (factor - 1) / 2 + int(-size / 2)) * scale).astype(precision.dtype)
+# end def
+
+
+def _export_tile(tape: Tape, task: Tuple) -> str:
+    # Renders a tile and writes it as a PNG file. The file gets written under a temporary name first, so an export that
+    # got interrupted never leaves a partially written tile behind.
+    path, (x_start, x_end, y_start, y_end), factor, (width, height, center, scale, precision), (cmap, v_min, v_max) = task
+
+    xs = _level_coords(x_start, x_end, factor, width, center[0], scale, precision)
+    ys = _level_coords(y_start, y_end, factor, height, center[1], scale, precision)
+    z = tape.run_grid(xs, ys)
+
+    tmp_path = path + ".tmp"
+    plt.imsave(tmp_path, z, cmap=cmap, vmin=v_min, vmax=v_max, format="png")
+    os.replace(tmp_path, path)
+
+    return path
+# end def
+
+
+class PyramidExporter:
+    # Exports an image as a Deep Zoom (.dzi) tile pyramid for pan and zoom viewers. Each level gets rendered by evaluating
+    # the circuit at the coordinates of its own pixels, whose distance doubles from one level to the next coarser one,
+    # instead of downsampling the full resolution image. So no level needs to be rendered as a whole at any time.
+    # The tiles are rendered by the workers of the tile pool or, without one, in this process. Tiles of a previous export
+    # of the same circuit with the same settings are kept, so only missing tiles get rendered, e.g. after an interrupted
+    # export. If the circuit or any setting changed, all tiles are stale and get rendered again.
+    # Without a given range of values, it's taken from the coarsest level that fits into a single tile. The tiles get
+    # calculated with the given precision like the images of CrazyMatrix.
+    def __init__(self, circuit: Circuit, width: int, height: int, center: Tuple[float, float] = (0., 0.), scale: float = 1.,
+                 cmap: Optional[str] = None, v_min: Optional[float] = None, v_max: Optional[float] = None, tile_size: int = 254,
+                 overlap: int = 1, tile_pool: Optional[TilePool] = None, precision: Precision = Precision.DOUBLE) -> None:
+        if tile_size < 1:
+            raise ValueError(f"The tile size needs to be at least 1, but is {tile_size}.")
+        # end if
+
+        if overlap < 0:
+            raise ValueError(f"The overlap of the tiles can't be negative, but is {overlap}.")
+        # end if
+
+        self.__circuit: Circuit = circuit
+        self.__w: int = width
+        self.__h: int = height
+        self.__center: Tuple[float, float] = center
+        self.__scale: float = scale
+        self.__cmap: str = cmap if cmap is not None else "Greys"
+        self.__v_min: Optional[float] = v_min
+        self.__v_max: Optional[float] = v_max
+        self.__tile_size: int = tile_size
+        self.__overlap: int = overlap
+        self.__tile_pool: Optional[TilePool] = tile_pool
+        self.__precision: Precision = precision
+    # end def
+
+    @property
+    def n_levels(self) -> int:
+        # Level 0 is a single pixel, the last level is the full resolution image
+        return math.ceil(math.log2(max(self.__w, self.__h, 1))) + 1
+    # end def
+
+    def level_size(self, level: int) -> Tuple[int, int]:
+        factor = 2 ** (self.n_levels - 1 - level)
+
+        return -(-self.__w // factor), -(-self.__h // factor)
+    # end def
+
+    def export(self, filename: str) -> int:
+        # Writes the descriptor to the given .dzi file and the tiles to the directory next to it (e.g. image_files for
+        # image.dzi). Returns the number of tiles rendered.
+        self.__circuit.set_size(self.__w, self.__h)
+        tape = TapeOptimizer().optimize(TapeCompiler().compile(self.__circuit))
+        v_min, v_max = self.__value_range(tape)
+
+        tiles_dir = os.path.splitext(filename)[0] + "_files"
+        manifest = {"circuit": tape.structural_hash(), "width": self.__w, "height": self.__h,
+                    "center": [float(c).hex() for c in self.__center], "scale": float(self.__scale).hex(), "cmap": self.__cmap,
+                    "v_min": float(v_min).hex(), "v_max": float(v_max).hex(), "tile_size": self.__tile_size, "overlap": self.__overlap,
+                    "precision": self.__precision.value}
+
+        if self.__load_manifest(tiles_dir) != manifest:
+            shutil.rmtree(tiles_dir, ignore_errors=True)
+            os.makedirs(tiles_dir)
+
+            with open(os.path.join(tiles_dir, "manifest.json"), "w") as f:
+                json.dump(manifest, f)
+            # end with
+        # end if
+
+        with open(filename, "w") as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                    f'<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" TileSize="{self.__tile_size}" '
+                    f'Overlap="{self.__overlap}" Format="png">\n'
+                    f'    <Size Width="{self.__w}" Height="{self.__h}"/>\n'
+                    '</Image>\n')
+        # end with
+
+        tasks = self.__tasks(tiles_dir, (self.__cmap, v_min, v_max))
+
+        if self.__tile_pool is not None:
+            for _ in self.__tile_pool.run(_export_tile, tape, self.__w, self.__h, tasks):
+                pass
+            # end for
+        else:
+            for task in tasks:
+                _export_tile(tape, task)
+            # end for
+        # end if
+
+        return len(tasks)
+    # end def
+
+    def __tasks(self, tiles_dir: str, colors: Tuple[str, float, float]) -> List[Tuple]:
+        # Tiles that don't exist yet, from the coarsest level to the finest one
+        view = (self.__w, self.__h, self.__center, self.__scale, self.__precision)
+        tasks: List[Tuple] = list()
+
+        for level in range(self.n_levels):
+            level_w, level_h = self.level_size(level)
+            factor = 2 ** (self.n_levels - 1 - level)
+            level_dir = os.path.join(tiles_dir, str(level))
+            os.makedirs(level_dir, exist_ok=True)
+
+            for row in range(-(-level_h // self.__tile_size)):
+                for col in range(-(-level_w // self.__tile_size)):
+                    path = os.path.join(level_dir, f"{col}_{row}.png")
+
+                    if os.path.exists(path):
+                        continue
+                    # end if
+
+                    # Tiles include the overlap on all sides that have a neighbour
+                    tile = (max(col * self.__tile_size - self.__overlap, 0), min((col + 1) * self.__tile_size + self.__overlap, level_w),
+                            max(row * self.__tile_size - self.__overlap, 0), min((row + 1) * self.__tile_size + self.__overlap, level_h))
+                    tasks.append((path, tile, factor, view, colors))
+                # end for
+            # end for
+        # end for
+
+        return tasks
+    # end def
+
+    def __value_range(self, tape: Tape) -> Tuple[float, float]:
+        v_min, v_max = self.__v_min, self.__v_max
+
+        if v_min is None or v_max is None:
+            level = next(level for level in range(self.n_levels - 1, -1, -1) if max(self.level_size(level)) <= self.__tile_size)
+            level_w, level_h = self.level_size(level)
+            factor = 2 ** (self.n_levels - 1 - level)
+
+            z = tape.run_grid(_level_coords(0, level_w, factor, self.__w, self.__center[0], self.__scale, self.__precision),
+                              _level_coords(0, level_h, factor, self.__h, self.__center[1], self.__scale, self.__precision))
+            z = z[np.isfinite(z)]
+
+            if v_min is None:
+                v_min = float(z.min()) if len(z) > 0 else 0.
+            # end if
+
+            if v_max is None:
+                v_max = float(z.max()) if len(z) > 0 else 1.
+            # end if
+        # end if
+
+        return v_min, v_max
+    # end def
+
+    @staticmethod
+    def __load_manifest(tiles_dir: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(tiles_dir, "manifest.json")) as f:
+                return json.load(f)
+            # end with
+        except (OSError, ValueError):
+            return None
+        # end try
+    # end def
+# end class
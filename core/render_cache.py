@@ -0,0 +1,149 @@
+from __future__ import annotations
+from typing import Any, List, Optional, Tuple
+from decimal import Decimal
+import hashlib
+import os
+import tempfile
+import numpy as np
+
+from core.precision import Precision
+
+
+__author__ = "Anton Höß"
+__copyright__ = "Copyright 2021"
+
+
+class RenderCache:
+    # Persistent cache of rendered images, stored as .npy files in a directory and loaded as read-only memory maps, so hits
+    # cost hardly more than opening a file. The total size of the files is kept within max_bytes by removing the least
+    # recently used ones.
+    # Several processes may share the directory: files get written to a temporary file first and then renamed, which is
+    # atomic, so readers either see a complete file or none at all. Files removed while another process still maps them
+    # stay valid for that process (on POSIX systems).
+    __SUFFIX = ".npy"
+
+    def __init__(self, cache_dir: str, max_bytes: int = 4 * 1024 ** 3) -> None:
+        if max_bytes < 0:
+            raise ValueError(f"The byte budget of the cache can't be negative, but is {max_bytes}.")
+        # end if
+
+        self.__cache_dir: str = cache_dir
+        self.__max_bytes: int = max_bytes
+
+        os.makedirs(self.__cache_dir, exist_ok=True)
+    # end def
+
+    @property
+    def cache_dir(self) -> str:
+        return self.__cache_dir
+    # end def
+
+    @property
+    def max_bytes(self) -> int:
+        return self.__max_bytes
+    # end def
+
+    @staticmethod
+    def key(circuit_hash: str, width: int, height: int, center: Tuple[Any, Any], scale: float,
+            precision: Precision = Precision.DOUBLE, method: str = "vectorized") -> str:
+        # Identifies an image by the structural hash of its circuit (see Tape.structural_hash()), its size, viewport, precision
+        # and the method it got rendered with (e.g. the evaluation mode of CrazyMatrix), since deep zoom approximates the
+        # values by perturbation and scalar evaluation rounds differently with single precision.
+        # Centers given with more digits than a float has (for deep zoom) keep all of them.
+        def coord(value: Any) -> str:
+            return str(Decimal(value)) if isinstance(value, (str, Decimal)) else float(value).hex()
+        # end def
+
+        desc = (circuit_hash, width, height, coord(center[0]), coord(center[1]), float(scale).hex(), precision.value, method)
+
+        return hashlib.sha256(repr(desc).encode()).hexdigest()
+    # end def
+
+    def load(self, key: str) -> Optional[np.memmap]:
+        # Returns the image as a read-only memory map or None, if it isn't cached
+        path = self.__path(key)
+
+        try:
+            z = np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None  # Missing, just removed by another process or unreadable
+        # end try
+
+        # Mark the file as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        # end try
+
+        return z
+    # end def
+
+    def store(self, key: str, z: np.ndarray) -> None:
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=self.__cache_dir)
+
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, z)
+            # end with
+
+            os.replace(tmp_path, self.__path(key))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        # end try
+
+        self.evict()
+    # end def
+
+    def evict(self) -> None:
+        # Removes the least recently used files until the rest fits into the byte budget
+        files: List[Tuple[float, int, str]] = list()
+
+        for entry in os.scandir(self.__cache_dir):
+            if not entry.name.endswith(RenderCache.__SUFFIX):
+                continue
+            # end if
+
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue  # Removed by another process in the meantime
+            # end try
+
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+        # end for
+
+        n_bytes = sum(size for _, size, _ in files)
+
+        for _, size, path in sorted(files):
+            if n_bytes <= self.__max_bytes:
+                break
+            # end if
+
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # Removed by another process in the meantime
+            # end try
+
+            n_bytes -= size
+        # end for
+    # end def
+
+    def clear(self) -> None:
+        for entry in os.scandir(self.__cache_dir):
+            if entry.name.endswith(RenderCache.__SUFFIX):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+                # end try
+            # end if
+        # end for
+    # end def
+
+    def __path(self, key: str) -> str:
+        return os.path.join(self.__cache_dir, key + RenderCache.__SUFFIX)
+    # end def
+# end class
@@ -0,0 +1,231 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from base import kernels
+from base.basic import Circuit
+from base.block import BlockFixed
+from base.context import EvalContext
+from blocks.const_var import Const, Variable
+from core.optimizer import TapeOptimizer
+from core.precision import Precision
+from core.tape import Op, LoopOp, Tape, TapeCompiler
+from core.tile_pool import pixel_coords
+
+
+__author__ = "Anton Höß"
+__copyright__ = "Copyright 2021"
+
+
+class _ConstParam(BlockFixed):
+    # Takes the place of a swept constant and passes the values of its parameter on
+    def __init__(self, name: Optional[str] = None):
+        BlockFixed.__init__(self, 1, 1, name)
+    # end def
+
+    def _calc_values(self):
+        pass
+    # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [x[0]]
+    # end def
+# end class
+
+
+class _VariableParam(BlockFixed):
+    # Takes the place of a swept variable, the second input holds the values of its parameter
+    def __init__(self, name: Optional[str] = None):
+        BlockFixed.__init__(self, 2, 1, name)
+    # end def
+
+    def _calc_values(self):
+        pass
+    # end def
+
+    def kernel(self, x: List[Any]) -> List[Any]:
+        return [kernels.variable(x[0], x[1]) if x[0] is not None else x[1]]
+    # end def
+# end class
+
+
+class ParameterSweep:
+    # Renders variants of a circuit, each with its own values for some of the constants, variables (the value undefined
+    # inputs get replaced with) or repeat boxes (the number of repetitions), which are given by their names. All blocks
+    # with the same name get the same value.
+    # The parameters become inputs of the compiled circuit with the variants as an additional first axis, so a batch of
+    # variants gets evaluated in one vectorized pass. Operations that don't depend on any parameter are evaluated only
+    # once for all variants and their results are shared. The batches may be evaluated by multiple threads.
+    # The coordinates and the values of the parameters have the given precision like the images of CrazyMatrix.
+    def __init__(self, circuit: Circuit, width: int, height: int, names: Sequence[str], center: Tuple[float, float] = (0., 0.),
+                 scale: float = 1., batch_size: Optional[int] = None, n_threads: int = 1, precision: Precision = Precision.DOUBLE) -> None:
+        self.__w: int = width
+        self.__h: int = height
+        self.__center: Tuple[float, float] = center
+        self.__scale: float = scale
+        self.__batch_size: Optional[int] = batch_size
+        self.__n_threads: int = n_threads
+        self.__precision: Precision = precision
+        self.__names: List[str] = list(names)
+
+        circuit.set_size(self.__w, self.__h)
+        tape = TapeCompiler().compile(circuit)
+        self.__n_slots: int = tape.n_slots
+        self.__found: Set[str] = set()
+
+        self.__slots: Dict[str, int] = {name: self.__new_slot() for name in self.__names}  # Values of the parameters
+        ops = self.__bind(tape.ops, self.__slots)
+
+        missing = [name for name in self.__names if name not in self.__found]
+
+        if len(missing) > 0:
+            raise ValueError(f"There's no constant, variable or repeat box named '{missing[0]}' in the circuit.")
+        # end if
+
+        self.__tape: Tape = TapeOptimizer().optimize(Tape(ops, self.__n_slots, tape.out_slot, tape.consts))
+        self.__shared_ops, self.__variant_ops = self.__tape.split(set(self.__slots.values()))
+    # end def
+
+    @property
+    def names(self) -> List[str]:
+        return self.__names
+    # end def
+
+    @property
+    def n_shared_ops(self) -> int:
+        return len(self.__shared_ops)
+    # end def
+
+    @property
+    def n_variant_ops(self) -> int:
+        return len(self.__variant_ops)
+    # end def
+
+    def calc_images(self, assignments: Sequence[Dict[str, float]]) -> np.ndarray:
+        # Renders one image per assignment of values to all parameters, with the variants as the first axis
+        for assignment in assignments:
+            if set(assignment) != set(self.__names):
+                raise ValueError(f"Each assignment needs a value for exactly the parameters {self.__names}, but got {sorted(assignment)}.")
+            # end if
+        # end for
+
+        batch_size = self.__batch_size if self.__batch_size is not None else max(len(assignments), 1)
+        batches = [range(start, min(start + batch_size, len(assignments))) for start in range(0, len(assignments), batch_size)]
+        z = np.empty((len(assignments), self.__h, self.__w), dtype=self.__precision.dtype)
+
+        with EvalContext():
+            shared = self.__run_shared()
+        # end with
+
+        def calc_batch(batch: range) -> None:
+            slots = list(shared)
+
+            for name, slot in self.__slots.items():
+                slots[slot] = np.array([float(assignments[i][name]) for i in batch], dtype=self.__precision.dtype)[:, np.newaxis, np.newaxis]
+            # end for
+
+            with EvalContext():
+                for op in self.__variant_ops:
+                    op.run(slots)
+                # end for
+            # end with
+
+            z[batch.start:batch.stop] = slots[self.__tape.out_slot]
+        # end def
+
+        if self.__n_threads <= 1:
+            for batch in batches:
+                calc_batch(batch)
+            # end for
+
+        else:
+            with ThreadPoolExecutor(max_workers=self.__n_threads) as executor:
+                list(executor.map(calc_batch, batches))
+            # end with
+        # end if
+
+        return z
+    # end def
+
+    def __new_slot(self) -> int:
+        self.__n_slots += 1
+
+        return self.__n_slots - 1
+    # end def
+
+    def __run_shared(self) -> List[Any]:
+        # Slots after evaluating the operations shared by all variants, only the ones still needed are kept
+        slots: List[Any] = [None] * self.__tape.n_slots
+        slots[Tape.SLOT_X] = pixel_coords(0, self.__w, self.__w, self.__center[0], self.__scale).astype(self.__precision.dtype)[np.newaxis, :]
+        slots[Tape.SLOT_Y] = pixel_coords(0, self.__h, self.__h, self.__center[1], self.__scale).astype(self.__precision.dtype)[:, np.newaxis]
+
+        for slot, value in self.__tape.consts.items():
+            slots[slot] = value
+        # end for
+
+        for op in self.__shared_ops:
+            op.run(slots)
+        # end for
+
+        needed = {self.__tape.out_slot}
+
+        for op in self.__variant_ops:
+            needed |= op.reads()
+        # end for
+
+        return [value if slot in needed else None for slot, value in enumerate(slots)]
+    # end def
+
+    def __used(self, ops: List[Op]) -> List[str]:
+        # Names of the parameters used within the given operations, including the bodies of repeat boxes
+        used: List[str] = list()
+
+        for op in ops:
+            names = [op.block.name] + (self.__used(op.body_ops) if isinstance(op, LoopOp) else [])
+            used += [name for name in names if name in self.__slots and name not in used]
+        # end for
+
+        return used
+    # end def
+
+    def __bind(self, ops: List[Op], params: Dict[str, int]) -> List[Op]:
+        # Replaces the parameters' blocks with operations reading the given slots of the parameters' values
+        res: List[Op] = list()
+
+        for op in ops:
+            name = op.block.name
+
+            if isinstance(op, LoopOp):
+                # The body only gets the values of the points still iterating (see kernels.repeat()), so the parameters
+                # used within the body are passed through the loop as additional pins of its state
+                used = self.__used(op.body_ops)
+                inner = {param: self.__new_slot() for param in used}
+                body_ops = self.__bind(op.body_ops, inner)
+                n_rep = op.ins[-1]
+
+                if name in params:
+                    n_rep = params[name]
+                    self.__found.add(name)
+                # end if
+
+                res.append(LoopOp(op.block, op.ins[:-1] + [params[param] for param in used] + [n_rep],
+                                  op.outs + [self.__new_slot() for _ in used], op.body_ins + [inner[param] for param in used],
+                                  body_ops, op.body_outs + [inner[param] for param in used], op.body_cont))
+
+            elif name in params and isinstance(op.block, Const):
+                res.append(Op(_ConstParam(name), [params[name]], op.outs))
+                self.__found.add(name)
+
+            elif name in params and isinstance(op.block, Variable):
+                res.append(Op(_VariableParam(name), op.ins + [params[name]], op.outs))
+                self.__found.add(name)
+
+            else:
+                res.append(op)
+            # end if
+        # end for
+
+        return res
+    # end def
+# end class
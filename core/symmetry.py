@@ -0,0 +1,272 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Set, Tuple, Type
+from enum import Enum
+import numpy as np
+
+from base.basic import Point, Size
+from blocks.bool import AndN, OrN, Not, Gt, Lt, EqN
+from blocks.complex import ComplexAddN, ComplexSub, ComplexMulN, ComplexDiv
+from blocks.const_var import Const, Variable
+from blocks.deprecated import Add2, Mul2, And2, Or2, Eq2, Rot1_4, ComplexAdd, ComplexMul
+from blocks.math import (AddN, Sub2, MulN, Div2, Abs, Minus, Inv, Log, Ln, Pow, Sq, Sin, Cos, Tan, Atan, Atan2)
+from core.deps import Dep
+from core.tape import Op, LoopOp, Tape
+
+
+__author__ = "Anton Höß"
+__copyright__ = "Copyright 2021"
+
+
+class Parity(Enum):
+    EVEN = "even"  # Mirroring the coordinate keeps the value, i.e. f(-x) = f(x)
+    ODD = "odd"  # Mirroring the coordinate negates the value, i.e. f(-x) = -f(x)
+    ZERO = "zero"  # Both of the above, i.e. the value is zero (or undefined) everywhere
+    NONE = "none"  # Nothing known
+# end class
+
+
+def _meet(a: Parity, b: Parity) -> Parity:
+    # Parity of a value that might be either of both, e.g. the state of a loop after any number of repetitions
+    if a is Parity.ZERO or a is b:
+        return b
+
+    elif b is Parity.ZERO:
+        return a
+    # end if
+
+    return Parity.NONE
+# end def
+
+
+def _const(value: Any) -> Parity:
+    if value is None:
+        return Parity.EVEN
+    # end if
+
+    return Parity.ZERO if np.all(np.isnan(value) | np.equal(value, 0)) else Parity.EVEN
+# end def
+
+
+def _even(p: List[Parity], n_out: int) -> List[Parity]:
+    # Any function of values that don't change doesn't change either
+    return [Parity.EVEN if all(q is Parity.EVEN or q is Parity.ZERO for q in p) else Parity.NONE] * n_out
+# end def
+
+
+def _sum(p: List[Parity]) -> Parity:
+    p = [q for q in p if q is not Parity.ZERO]
+
+    if len(p) == 0:
+        return Parity.ZERO
+
+    elif all(q is Parity.EVEN for q in p):
+        return Parity.EVEN
+
+    elif all(q is Parity.ODD for q in p):
+        return Parity.ODD
+    # end if
+
+    return Parity.NONE
+# end def
+
+
+def _product(p: List[Parity]) -> Parity:
+    if any(q is Parity.NONE for q in p):
+        return Parity.NONE
+
+    elif any(q is Parity.ZERO for q in p):
+        return Parity.ZERO
+    # end if
+
+    return Parity.ODD if sum(q is Parity.ODD for q in p) % 2 == 1 else Parity.EVEN
+# end def
+
+
+def _signed(p: Parity) -> bool:
+    return p is not Parity.NONE
+# end def
+
+
+def _cmul(p: List[Parity]) -> List[Parity]:
+    if len(p) < 2:
+        return [Parity.EVEN, Parity.EVEN]  # No factors, so the result is undefined everywhere
+    # end if
+
+    real, imag = p[0], p[1]
+
+    for i in range(1, len(p) // 2):
+        b_real, b_imag = p[2 * i], p[2 * i + 1]
+        real, imag = (_sum([_product([real, b_real]), _product([imag, b_imag])]),
+                      _sum([_product([real, b_imag]), _product([imag, b_real])]))
+    # end for
+
+    return [real, imag]
+# end def
+
+
+def _cadd(p: List[Parity]) -> List[Parity]:
+    n = len(p) // 2
+
+    return [_sum(p[0:2 * n:2]), _sum(p[1:2 * n:2])]
+# end def
+
+
+def _divisor(p: Parity) -> bool:
+    # Mirrored values may differ in the sign of zero, e.g. x - x, which dividing by them would turn into infinities of
+    # different signs. So only values that don't change are safe divisors.
+    return p is Parity.EVEN
+# end def
+
+
+def _variable(block: Variable, p: List[Parity]) -> List[Parity]:
+    # Without a value to replace undefined values with, the variable just passes its input on
+    return p[:1] if block.params()[0] is None else _even(p, 1)
+# end def
+
+
+def mirror(coords: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Splits the coordinates into the ones to evaluate and the ones that are the mirror image of one of them, i.e. the
+    # positive coordinates whose negation is part of the coordinates as well. Returns the mask of the coordinates to
+    # evaluate and for each mirrored coordinate the index of its mirror image among the evaluated ones.
+    mirrored = (coords > 0) & np.isin(-coords, coords)
+    evaluated = coords[~mirrored]
+    order = np.argsort(evaluated)
+
+    return ~mirrored, order[np.searchsorted(evaluated, -coords[mirrored], sorter=order)]
+# end def
+
+
+class SymmetryAnalysis:
+    # Proves whether mirroring the x- or y-coordinate at the centre of the image (i.e. x -> -x) keeps or negates the value
+    # of each slot of a tape. The rules only rely on floating point operations being exactly symmetric with respect to the
+    # sign, e.g. (-a) * b == -(a * b), so mirrored pixels get exactly the values their evaluation would give (up to the
+    # sign of zero). Blocks without a specific rule are only known to keep their values if all their inputs do.
+    # The sign of zero only stays the same for values that don't depend on any negated value, e.g. (x - x) * x is +0 for
+    # x > 0, but -0 for x < 0. Such values may only feed blocks whose results depend on the sign of zero (e.g. 0 ** -1 is
+    # inf, but -0 ** -1 is -inf), if a block that drops the sign (e.g. Abs) lies in between.
+    __RULES: Dict[Type, Callable[[Op, List[Parity]], List[Parity]]] = {
+        AddN: lambda op, p: [_sum(p)],
+        Add2: lambda op, p: [_sum(p)],
+        Sub2: lambda op, p: [_sum(p)],
+        MulN: lambda op, p: [_product(p)],
+        Mul2: lambda op, p: [_product(p)],
+        Div2: lambda op, p: [_product(p) if _divisor(p[1]) else Parity.NONE],
+        Inv: lambda op, p: [p[0] if _divisor(p[0]) else Parity.NONE],
+        Minus: lambda op, p: [p[0]],
+        Sin: lambda op, p: [p[0]],
+        Tan: lambda op, p: [p[0]],
+        Atan: lambda op, p: [p[0]],
+        Abs: lambda op, p: [Parity.EVEN if _signed(p[0]) else Parity.NONE],
+        Sq: lambda op, p: [Parity.EVEN if _signed(p[0]) else Parity.NONE],
+        Cos: lambda op, p: [Parity.EVEN if _signed(p[0]) else Parity.NONE],
+        AndN: lambda op, p: [Parity.EVEN if all(_signed(q) for q in p) else Parity.NONE],
+        OrN: lambda op, p: [Parity.EVEN if all(_signed(q) for q in p) else Parity.NONE],
+        Not: lambda op, p: [Parity.EVEN if _signed(p[0]) else Parity.NONE],
+        EqN: lambda op, p: [Parity.EVEN if _sum(p) is not Parity.NONE else Parity.NONE],
+        Eq2: lambda op, p: [Parity.EVEN if _sum(p) is not Parity.NONE else Parity.NONE],
+        Rot1_4: lambda op, p: [p[(i + 1) % 4] for i in range(4)],
+        ComplexAddN: lambda op, p: _cadd(p),
+        ComplexAdd: lambda op, p: _cadd(p),
+        ComplexSub: lambda op, p: _cadd(p),
+        ComplexMulN: lambda op, p: _cmul(p),
+        ComplexMul: lambda op, p: _cmul(p),
+        Variable: lambda op, p: _variable(op.block, p),
+        Const: lambda op, p: [_const(op.block.params()[0])],
+        Point: lambda op, p: [Parity.NONE, Parity.NONE],
+        Size: lambda op, p: [Parity.EVEN, Parity.EVEN],
+    }
+    __ZERO_SIGN_DROPPING: Tuple[Type, ...] = (Abs, Sq, Cos, AndN, OrN, Not, Gt, Lt, EqN, And2, Or2, Eq2)
+    __ZERO_SIGN_SENSITIVE: Tuple[Type, ...] = (Div2, Inv, Pow, Log, Ln, Atan2, ComplexDiv)
+
+    def __init__(self) -> None:
+        self.__parities: Dict[int, Parity] = dict()
+        self.__zero_signs: Set[int] = set()  # Slots whose mirrored values may differ in the sign of zero
+    # end def
+
+    def analyze(self, tape: Tape, axis: Dep) -> Dict[int, Parity]:
+        # Parity of every slot when mirroring the given axis (Dep.X or Dep.Y)
+        self.__parities = {Tape.SLOT_X: Parity.ODD if axis is Dep.X else Parity.EVEN,
+                           Tape.SLOT_Y: Parity.ODD if axis is Dep.Y else Parity.EVEN,
+                           Tape.SLOT_NONE: Parity.EVEN, Tape.SLOT_T: Parity.EVEN}
+        self.__parities.update({slot: _const(value) for slot, value in tape.consts.items()})
+        self.__zero_signs = {Tape.SLOT_X if axis is Dep.X else Tape.SLOT_Y}
+
+        self.__analyze_scope(tape.ops)
+
+        return self.__parities
+    # end def
+
+    def symmetry(self, tape: Tape) -> Tuple[Parity, Parity]:
+        # Parity of the tape's result when mirroring the x- and the y-coordinate
+        return self.analyze(tape, Dep.X)[tape.out_slot], self.analyze(tape, Dep.Y)[tape.out_slot]
+    # end def
+
+    def __parity(self, slot: int) -> Parity:
+        return self.__parities.get(slot, Parity.NONE)
+    # end def
+
+    def __set_zero_signs(self, slot: int, zero_signs: bool) -> None:
+        if zero_signs:
+            self.__zero_signs.add(slot)
+        else:
+            self.__zero_signs.discard(slot)
+        # end if
+    # end def
+
+    def __analyze_scope(self, ops: List[Op]) -> None:
+        for op in ops:
+            if isinstance(op, LoopOp):
+                self.__analyze_loop(op)
+                continue
+            # end if
+
+            p = [self.__parity(slot) for slot in op.ins]
+            rule = next((SymmetryAnalysis.__RULES[cls] for cls in type(op.block).__mro__ if cls in SymmetryAnalysis.__RULES), None)
+            res = rule(op, p) if rule is not None else _even(p, len(op.outs))
+            zero_signs = any(slot in self.__zero_signs for slot in op.ins)
+
+            if zero_signs and isinstance(op.block, SymmetryAnalysis.__ZERO_SIGN_SENSITIVE):
+                res = [Parity.NONE] * len(op.outs)
+            # end if
+
+            zero_signs = zero_signs and not isinstance(op.block, SymmetryAnalysis.__ZERO_SIGN_DROPPING)
+
+            for slot, parity in zip(op.outs, res):
+                self.__parities[slot] = parity
+                self.__set_zero_signs(slot, zero_signs or parity is Parity.ODD)
+            # end for
+        # end for
+    # end def
+
+    def __analyze_loop(self, op: LoopOp) -> None:
+        # Each pin of the state needs to keep its parity through all repetitions, so iterate until the state doesn't change
+        # anymore. Only if the number of repetitions and the condition to continue are the same for mirrored points, the
+        # state gets updated the same way for both of them.
+        state = [self.__parity(slot) for slot in op.ins[:-1]]
+        zero_signs = [slot in self.__zero_signs for slot in op.ins[:-1]]
+
+        while True:
+            for slot, parity, zero_sign in zip(op.body_ins, state, zero_signs):
+                self.__parities[slot] = parity
+                self.__set_zero_signs(slot, zero_sign)
+            # end for
+
+            self.__analyze_scope(op.body_ops)
+            next_state = [_meet(parity, self.__parity(slot)) for parity, slot in zip(state, op.body_outs)]
+            next_zero_signs = [zero_sign or slot in self.__zero_signs for zero_sign, slot in zip(zero_signs, op.body_outs)]
+
+            if next_state == state and next_zero_signs == zero_signs:
+                break
+            # end if
+
+            state, zero_signs = next_state, next_zero_signs
+        # end while
+
+        same_steps = self.__parity(op.ins[-1]) is Parity.EVEN and (op.body_cont is None or self.__parity(op.body_cont) is Parity.EVEN)
+
+        for slot, parity, zero_sign in zip(op.outs, state, zero_signs):
+            self.__parities[slot] = parity if same_steps else Parity.NONE
+            self.__set_zero_signs(slot, zero_sign)
+        # end for
+    # end def
+# end class
@@ -0,0 +1,408 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Set, Tuple
+import hashlib
+import numpy as np
+
+from base import kernels
+from base.intervals import Interval
+from base.basic import Circuit
+from base.block import IBlock
+from base.black_box import BlackBox, RepeatBox
+
+
+__author__ = "Anton Höß"
+__copyright__ = "Copyright 2021"
+
+
+class Op:
+    def __init__(self, block: IBlock, ins: List[int], outs: List[int]) -> None:
+        self.block: IBlock = block
+        self.ins: List[int] = ins
+        self.outs: List[int] = outs
+        self._kernel = block.kernel if hasattr(block, "kernel") else None
+    # end def
+
+    def __str__(self) -> str:
+        return f"{self.outs} = {self.name}{self.ins}"
+    # end def
+
+    def __repr__(self) -> str:
+        return str(self)
+    # end def
+
+    @property
+    def name(self) -> str:
+        name = getattr(self.block, "name", None)
+
+        return f"{type(self.block).__name__}" + (f"('{name}')" if name is not None else "")
+    # end def
+
+    @property
+    def vectorized(self) -> bool:
+        # Whether the operation can be evaluated for arrays of values, i.e. its block has a kernel
+        return getattr(self.block, "has_kernel", True)
+    # end def
+
+    def reads(self) -> Set[int]:
+        # All slots the operation reads from its surrounding scope
+        return set(self.ins)
+    # end def
+
+    def signature(self) -> Tuple:
+        # Everything the results of the operation depend on besides the values of its inputs
+        block_type = type(self.block)
+
+        return f"{block_type.__module__}.{block_type.__qualname__}", repr(self.block.params()), tuple(self.ins), tuple(self.outs)
+    # end def
+
+    def run(self, slots: List[Any]) -> None:
+        values = self._kernel([slots[i] for i in self.ins])
+
+        for pin, value in zip(self.outs, values):
+            slots[pin] = kernels.scalar(value)
+        # end for
+    # end def
+
+    def run_interval(self, slots: List[Interval]) -> None:
+        values = self.block.interval([slots[i] for i in self.ins])
+
+        for pin, value in zip(self.outs, values):
+            slots[pin] = value
+        # end for
+    # end def
+# end class
+
+
+class LoopOp(Op):
+    # ins holds the slots of the initial values followed by the slot of the number of repetitions. The body reads the current
+    # state from body_ins and writes the next state to body_outs, which becomes the new state for the next iteration.
+    # The optional body_cont is the slot of the condition to continue, which the body calculates along with the next state.
+    def __init__(self, block: RepeatBox, ins: List[int], outs: List[int], body_ins: List[int], body_ops: List[Op], body_outs: List[int],
+                 body_cont: Optional[int] = None) -> None:
+        Op.__init__(self, block, ins, outs)
+        self.body_ins: List[int] = body_ins
+        self.body_ops: List[Op] = body_ops
+        self.body_outs: List[int] = body_outs
+        self.body_cont: Optional[int] = body_cont
+    # end def
+
+    def __str__(self) -> str:
+        body = "".join(f"\n    {op}" for op in self.body_ops)
+        cont = f" while [{self.body_cont}]" if self.body_cont is not None else ""
+
+        return f"{self.outs} = {self.name}{self.ins} {{{self.body_ins} -> {self.body_outs}{cont}{body}\n}}"
+    # end def
+
+    @property
+    def vectorized(self) -> bool:
+        return all(op.vectorized for op in self.body_ops)
+    # end def
+
+    def reads(self) -> Set[int]:
+        # The inputs plus all slots the body reads, but doesn't write itself
+        reads = set(self.ins)
+        written = set(self.body_ins)
+
+        for op in self.body_ops:
+            reads |= op.reads() - written
+            written |= set(op.outs)
+        # end for
+
+        reads |= set(self.body_outs + ([self.body_cont] if self.body_cont is not None else [])) - written
+
+        return reads
+    # end def
+
+    def signature(self) -> Tuple:
+        cont = self.body_cont if self.body_cont is not None else -1
+
+        # The box itself has no parameters, its behaviour is completely described by the body
+        return ("loop", tuple(self.ins), tuple(self.outs), tuple(self.body_ins), tuple(op.signature() for op in self.body_ops),
+                tuple(self.body_outs), cont)
+    # end def
+
+    def run(self, slots: List[Any]) -> None:
+        def step(state: List[Any]) -> List[Any]:
+            for i, value in zip(self.body_ins, state):
+                slots[i] = value
+            # end for
+
+            for op in self.body_ops:
+                op.run(slots)
+            # end for
+
+            return [slots[i] for i in self.body_outs] + ([slots[self.body_cont]] if self.body_cont is not None else [])
+        # end def
+
+        # The number of repetitions may differ for each point, see kernels.repeat()
+        state = kernels.repeat(step, [slots[i] for i in self.ins[:-1]], kernels.repetitions(slots[self.ins[-1]]),
+                               cont=self.body_cont is not None)
+
+        for i, value in zip(self.outs, state):
+            slots[i] = kernels.scalar(value)
+        # end for
+    # end def
+
+    def run_interval(self, slots: List[Interval]) -> None:
+        # Bounding the state over all repetitions isn't feasible, so the loop only gets run if all it reads are single values
+        reads = self.reads()
+
+        if all(slots[i].is_point for i in reads):
+            values: List[Any] = [None] * len(slots)
+
+            for i in reads:
+                values[i] = slots[i].value
+            # end for
+
+            with np.errstate(all="ignore"):
+                self.run(values)
+            # end with
+
+            for i in self.outs:
+                slots[i] = Interval.point(values[i])
+            # end for
+
+        else:
+            for i in self.outs:
+                slots[i] = Interval.unbounded()
+            # end for
+        # end if
+    # end def
+# end class
+
+
+class Tape:
+    # Fixed slots that every tape provides
+    SLOT_X = 0
+    SLOT_Y = 1
+    SLOT_NONE = 2  # Used for unconnected pins, always holds None
+    SLOT_T = 3  # Time of the circuit, only an input of tapes compiled with time_input (see TapeCompiler)
+
+    def __init__(self, ops: List[Op], n_slots: int, out_slot: int, consts: Optional[Dict[int, Any]] = None) -> None:
+        self.ops: List[Op] = ops
+        self.n_slots: int = n_slots
+        self.out_slot: int = out_slot
+        self.consts: Dict[int, Any] = consts if consts is not None else dict()  # Slots with values known before evaluation
+    # end def
+
+    def __str__(self) -> str:
+        consts = "".join(f"[{slot}] = {value}\n" for slot, value in sorted(self.consts.items()))
+
+        return consts + "\n".join(str(op) for op in self.ops) + f"\nout = {self.out_slot}"
+    # end def
+
+    @property
+    def vectorized(self) -> bool:
+        # Tapes with operations that can only be evaluated per pixel can't be run, but still be analyzed
+        return all(op.vectorized for op in self.ops)
+    # end def
+
+    def structural_hash(self) -> str:
+        # Hash of the operations, their parameters and the constants, i.e. of everything the results depend on besides the
+        # coordinates. Separate instances of the same circuit get the same hash, so it identifies rendered images in caches.
+        consts = tuple((slot, repr(value)) for slot, value in sorted(self.consts.items()))
+        desc = (consts, tuple(op.signature() for op in self.ops), self.n_slots, self.out_slot)
+
+        return hashlib.sha256(repr(desc).encode()).hexdigest()
+    # end def
+
+    def split(self, inputs: Set[int]) -> Tuple[List[Op], List[Op]]:
+        # Splits the operations into the ones that don't depend on the given slots and the ones that do, i.e. that read one
+        # of them or the result of another dependent operation. The first ones can be evaluated once in advance for any
+        # number of evaluations with different values of the given slots.
+        dependent = set(inputs)
+        independent_ops: List[Op] = list()
+        dependent_ops: List[Op] = list()
+
+        for op in self.ops:
+            if op.reads() & dependent:
+                dependent |= set(op.outs)
+                dependent_ops.append(op)
+            else:
+                independent_ops.append(op)
+            # end if
+        # end for
+
+        return independent_ops, dependent_ops
+    # end def
+
+    def run(self, x: Any, y: Any, t: Optional[Any] = None) -> Any:
+        slots: List[Any] = [None] * self.n_slots
+        slots[Tape.SLOT_X] = x
+        slots[Tape.SLOT_Y] = y
+        slots[Tape.SLOT_T] = t
+
+        for slot, value in self.consts.items():
+            slots[slot] = value
+        # end for
+
+        for op in self.ops:
+            op.run(slots)
+        # end for
+
+        return slots[self.out_slot]
+    # end def
+
+    def run_interval(self, x: Interval, y: Interval) -> Interval:
+        # Bounds of the result for all coordinates within the given bounds
+        slots: List[Interval] = [Interval.undefined()] * self.n_slots
+        slots[Tape.SLOT_X] = x
+        slots[Tape.SLOT_Y] = y
+        slots[Tape.SLOT_T] = Interval.unbounded()  # Any time, unless it's a constant
+
+        for slot, value in self.consts.items():
+            slots[slot] = Interval.point(value)
+        # end for
+
+        for op in self.ops:
+            op.run_interval(slots)
+        # end for
+
+        return slots[self.out_slot]
+    # end def
+
+    def run_grid(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        # Evaluates the tape for all combinations of the given x- and y-coordinates and returns one row per y-coordinate.
+        # The coordinates are passed as a single row and a single column, so values that only depend on one of them (or
+        # none) keep their smaller shape and get calculated only once per column or row (see Dep).
+        # The result has the precision of the coordinates, e.g. float32 for float32 coordinates.
+        z = np.empty((len(ys), len(xs)), dtype=np.result_type(xs, ys, 0.))
+        z[...] = self.run(np.asarray(xs)[np.newaxis, :], np.asarray(ys)[:, np.newaxis])
+
+        return z
+    # end def
+# end class
+
+
+class TapeCompiler:
+    # Compiles an instantiated circuit into a flat list of operations on numbered value slots, topologically sorted, so
+    # that it can be evaluated by a simple loop without any recursion or flags for already calculated values.
+    # The pass-through layers of black boxes get resolved at compile time, repeat boxes become a loop with their own body.
+    def __init__(self) -> None:
+        self.__slots: Dict[IBlock, List[int]] = dict()
+        self.__n_slots = 0
+        self.__box_input_layers: Dict[IBlock, BlackBox] = dict()
+    # end def
+
+    def compile(self, circuit: Circuit, time_input: bool = False) -> Tape:
+        # The time of the circuit usually is a constant of the tape. With time_input it's an input like the coordinates
+        # instead, which is passed to Tape.run(), so the same tape can be evaluated at different points in time.
+        self.__slots = dict()
+        self.__box_input_layers = dict()
+        self.__n_slots = Tape.SLOT_T + 1
+        self.__slots[circuit.point] = [Tape.SLOT_X, Tape.SLOT_Y]
+        self.__slots[circuit.time] = [Tape.SLOT_T]
+
+        root = self.__resolve_conn(circuit.drawer.conn_in[0])
+        ops = self.__compile_scope([root])
+
+        return Tape(ops, self.__n_slots, self.__slot(root), dict() if time_input else {Tape.SLOT_T: circuit.time.t})
+    # end def
+
+    def __new_slots(self, n: int) -> List[int]:
+        slots = list(range(self.__n_slots, self.__n_slots + n))
+        self.__n_slots += n
+
+        return slots
+    # end def
+
+    def __slot(self, source: Tuple[Optional[IBlock], int]) -> int:
+        block, pin = source
+
+        return self.__slots[block][pin] if block is not None else Tape.SLOT_NONE
+    # end def
+
+    def __resolve_conn(self, conn) -> Tuple[Optional[IBlock], int]:
+        if conn is None:
+            return None, 0
+        # end if
+
+        block, pin = conn.in_block, conn.in_pin
+
+        # Skip all pass-through layers of (nested) black boxes, but not the ones of repeat boxes
+        while True:
+            if isinstance(block, RepeatBox):
+                return block, pin
+
+            elif isinstance(block, BlackBox):
+                self.__box_input_layers[block.input_layer] = block
+                conn = block.output_layer.conn_in[pin]
+
+            elif block in self.__box_input_layers:
+                conn = block.conn_in[pin]
+
+            else:
+                return block, pin
+            # end if
+
+            if conn is None:
+                return None, 0
+            # end if
+
+            block, pin = conn.in_block, conn.in_pin
+        # end while
+    # end def
+
+    def __deps(self, block: IBlock) -> List[Tuple[Optional[IBlock], int]]:
+        if isinstance(block, RepeatBox):
+            return [self.__resolve_conn(conn) for conn in block.input_layer.conn_in]
+
+        else:
+            return [self.__resolve_conn(conn) for conn in block.conn_in]
+        # end if
+    # end def
+
+    def __compile_scope(self, roots: List[Tuple[Optional[IBlock], int]]) -> List[Op]:
+        ops: List[Op] = list()
+
+        # Iterative depth-first search (post-order), so there's no limit on the depth of the circuit
+        stack: List[Tuple[IBlock, bool]] = [(block, False) for block, _ in roots if block is not None]
+
+        while len(stack) > 0:
+            block, expanded = stack.pop()
+
+            if block in self.__slots:
+                continue
+            # end if
+
+            deps = self.__deps(block)
+
+            if not expanded:
+                stack.append((block, True))
+
+                for dep, _ in deps:
+                    if dep is not None and dep not in self.__slots:
+                        stack.append((dep, False))
+                    # end if
+                # end for
+            else:
+                ins = [self.__slot(dep) for dep in deps]
+
+                if isinstance(block, RepeatBox):
+                    ops.append(self.__compile_repeat_box(block, ins))
+
+                else:
+                    self.__slots[block] = self.__new_slots(block.n_out)
+                    ops.append(Op(block, ins, self.__slots[block]))
+                # end if
+            # end if
+        # end while
+
+        return ops
+    # end def
+
+    def __compile_repeat_box(self, box: RepeatBox, ins: List[int]) -> LoopOp:
+        body_ins = self.__new_slots(box.input_layer.n_out)
+        self.__slots[box.input_layer] = body_ins
+
+        roots = [self.__resolve_conn(conn) for conn in box.output_layer.conn_in]
+        cont = self.__resolve_conn(box.cont) if box.cont is not None else None
+        body_ops = self.__compile_scope(roots + ([cont] if cont is not None else []))
+        body_outs = [self.__slot(root) for root in roots]
+        body_cont = self.__slot(cont) if cont is not None else None
+
+        self.__slots[box] = self.__new_slots(box.n_out)
+
+        return LoopOp(box, ins, self.__slots[box], body_ins, body_ops, body_outs, body_cont)
+    # end def
+# end class
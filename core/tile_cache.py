@@ -0,0 +1,91 @@
+from __future__ import annotations
+from typing import Hashable, Optional
+from collections import OrderedDict
+from threading import Lock
+import numpy as np
+
+
+__author__ = "Anton Höß"
+__copyright__ = "Copyright 2021"
+
+
+class TileCache:
+    # In-memory cache of rendered tiles with least recently used eviction. The tiles are kept as long as their total size
+    # stays within the byte budget, a single tile larger than the budget doesn't get cached at all. The cache may be
+    # shared by several renderers and threads, e.g. to reuse the tiles of a circuit when re-rendering or panning.
+    def __init__(self, max_bytes: int = 256 * 1024 ** 2) -> None:
+        if max_bytes < 0:
+            raise ValueError(f"The byte budget of the cache can't be negative, but is {max_bytes}.")
+        # end if
+
+        self.__max_bytes: int = max_bytes
+        self.__n_bytes: int = 0
+        self.__tiles: OrderedDict[Hashable, np.ndarray] = OrderedDict()  # Least recently used first
+        self.__lock: Lock = Lock()
+        self.hits: int = 0
+        self.misses: int = 0
+    # end def
+
+    def __len__(self) -> int:
+        return len(self.__tiles)
+    # end def
+
+    @property
+    def max_bytes(self) -> int:
+        return self.__max_bytes
+    # end def
+
+    @property
+    def n_bytes(self) -> int:
+        return self.__n_bytes
+    # end def
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        # Returns the tile (read-only) or None, if it isn't cached
+        with self.__lock:
+            tile = self.__tiles.get(key)
+
+            if tile is None:
+                self.misses += 1
+                return None
+            # end if
+
+            self.__tiles.move_to_end(key)
+            self.hits += 1
+
+            return tile
+        # end with
+    # end def
+
+    def put(self, key: Hashable, tile: np.ndarray) -> None:
+        if tile.nbytes > self.__max_bytes:
+            return
+        # end if
+
+        tile = tile.copy()
+        tile.flags.writeable = False
+
+        with self.__lock:
+            old = self.__tiles.pop(key, None)
+
+            if old is not None:
+                self.__n_bytes -= old.nbytes
+            # end if
+
+            self.__tiles[key] = tile
+            self.__n_bytes += tile.nbytes
+
+            while self.__n_bytes > self.__max_bytes:
+                _, evicted = self.__tiles.popitem(last=False)
+                self.__n_bytes -= evicted.nbytes
+            # end while
+        # end with
+    # end def
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__tiles.clear()
+            self.__n_bytes = 0
+        # end with
+    # end def
+# end class
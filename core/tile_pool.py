@@ -0,0 +1,208 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple, Union
+import multiprocessing
+import itertools
+import os
+import pickle
+import tempfile
+import numpy as np
+
+from base.basic import Circuit
+from core.block_manager import BlockManager
+from core.precision import Precision
+from core.tape import Tape, TapeCompiler
+from core.optimizer import TapeOptimizer
+from templates.box import BlackBoxFactory
+from templates.circuit import CircuitFactory
+
+
+__author__ = "Anton Höß"
+__copyright__ = "Copyright 2021"
+
+
+def tiles(width: int, height: int, tile_size: int) -> Iterator[Tuple[int, int, int, int]]:
+    # Splits an image into tiles of at most tile_size x tile_size pixels, given as (x_start, x_end, y_start, y_end)
+    for y in range(0, height, tile_size):
+        for x in range(0, width, tile_size):
+            yield x, min(x + tile_size, width), y, min(y + tile_size, height)
+        # end for
+    # end for
+# end def
+
+
+def aligned_tiles(xs: np.ndarray, ys: np.ndarray, size: float) -> Iterator[Tuple[int, int, int, int]]:
+    # Same as tiles(), but the borders of the tiles lie on a grid of the given size in the coordinate space instead of the
+    # image, so tiles of overlapping viewports contain the same coordinates
+    def spans(coords: np.ndarray) -> Iterator[Tuple[int, int]]:
+        borders = [0] + list(np.flatnonzero(np.diff(np.floor(coords / size))) + 1) + [len(coords)]
+
+        return zip(borders[:-1], borders[1:])
+    # end def
+
+    x_spans = list(spans(xs))
+
+    for y_start, y_end in spans(ys):
+        for x_start, x_end in x_spans:
+            yield x_start, x_end, y_start, y_end
+        # end for
+    # end for
+# end def
+
+
+def pixel_coords(start: int, end: int, size: int, center: float = 0., scale: float = 1.) -> np.ndarray:
+    # Coordinates of the pixels start..end-1 of an image row or column of the given size. The pixels are scale apart and
+    # the middle pixel of the image is at the center.
+    return (np.arange(start, end, dtype=float) + int(-size / 2)) * scale + center
+# end def
+
+
+# State of each worker process. The block manager gets set up once when the process starts, the tape of a render gets
+# loaded from the job's file and prepared with the first tile of this render the process works on.
+_block_manager: Optional[BlockManager] = None
+_factories: Dict[str, CircuitFactory] = dict()
+_tape: Tuple[Optional[int], Optional[Tape]] = (None, None)
+
+
+def _init_worker(base_dir: str, schema_filename: Optional[str]) -> None:
+    global _block_manager
+
+    _block_manager = BlockManager(base_dir=base_dir, schema_filename=schema_filename)
+    _block_manager.scan_dir()
+# end def
+
+
+def _prepare(circuit: Union[str, CircuitFactory, Tape], width: int, height: int) -> Tape:
+    if isinstance(circuit, Tape):
+        return circuit
+    # end if
+
+    if isinstance(circuit, str):
+        if circuit not in _factories:
+            factory = _block_manager.load(circuit)
+
+            if factory is None or isinstance(factory, BlackBoxFactory):
+                raise ValueError(f"There's no circuit named '{circuit}' in the library.")
+            # end if
+
+            _factories[circuit] = factory
+        # end if
+
+        circuit = _factories[circuit]
+    # end if
+
+    circuit = circuit.inst()
+    circuit.set_size(width, height)
+
+    return TapeOptimizer().optimize(TapeCompiler().compile(circuit))
+# end def
+
+
+def _run_task(args: Tuple[int, str, int, int, Callable[[Tape, Any], Any], Any]) -> Any:
+    global _tape
+
+    job, filename, width, height, func, task = args
+
+    if _tape[0] != job:
+        with open(filename, "rb") as f:
+            _tape = (job, _prepare(pickle.load(f), width, height))
+        # end with
+    # end if
+
+    return func(_tape[1], task)
+# end def
+
+
+def _render_tile(tape: Tape, task: Tuple[int, int, Tuple[float, float], float, Tuple[int, int, int, int], Precision]) -> Tuple[Tuple[int, int, int, int], np.ndarray]:
+    width, height, center, scale, tile, precision = task
+    x_start, x_end, y_start, y_end = tile
+
+    xs = pixel_coords(x_start, x_end, width, center[0], scale).astype(precision.dtype)
+    ys = pixel_coords(y_start, y_end, height, center[1], scale).astype(precision.dtype)
+
+    return tile, tape.run_grid(xs, ys)
+# end def
+
+
+class TilePool:
+    # Renders images in tiles on a pool of worker processes, which are started right away and load the library of the
+    # block manager once. A circuit can be given by its name in the library, as a factory or as an instantiated circuit.
+    # Names and factories get instantiated and compiled by each worker, instantiated circuits get compiled once and the
+    # tape is shipped to the workers.
+    __jobs = itertools.count()
+
+    def __init__(self, n_workers: Optional[int] = None, tile_size: int = 128, base_dir: str = "user_blocks",
+                 schema_filename: Optional[str] = "core/box_data_schema_v1.0.yaml") -> None:
+        if tile_size < 1:
+            raise ValueError(f"The tile size needs to be at least 1, but is {tile_size}.")
+        # end if
+
+        self.__n_workers: int = n_workers if n_workers is not None else multiprocessing.cpu_count()
+        self.__tile_size: int = tile_size
+        self.__pool = multiprocessing.Pool(self.__n_workers, initializer=_init_worker, initargs=(base_dir, schema_filename))
+    # end def
+
+    def __enter__(self) -> TilePool:
+        return self
+    # end def
+
+    def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        self.close()
+    # end def
+
+    @property
+    def n_workers(self) -> int:
+        return self.__n_workers
+    # end def
+
+    @property
+    def tile_size(self) -> int:
+        return self.__tile_size
+    # end def
+
+    def close(self) -> None:
+        self.__pool.terminate()
+        self.__pool.join()
+    # end def
+
+    def render(self, circuit: Union[str, CircuitFactory, Circuit], width: int, height: int, center: Tuple[float, float] = (0., 0.),
+               scale: float = 1., precision: Precision = Precision.DOUBLE) -> np.ndarray:
+        tasks = [(width, height, center, scale, tile, precision) for tile in tiles(width, height, self.__tile_size)]
+        z = np.empty((height, width), dtype=precision.dtype)
+
+        for (x_start, x_end, y_start, y_end), values in self.run(_render_tile, circuit, width, height, tasks):
+            z[y_start:y_end, x_start:x_end] = values
+        # end for
+
+        return z
+    # end def
+
+    def run(self, func: Callable[[Tape, Any], Any], circuit: Union[str, CircuitFactory, Circuit, Tape], width: int, height: int,
+            tasks: Iterable[Any]) -> Iterator[Any]:
+        # Calls func(tape, task) for each task on the workers, where tape is the compiled circuit for an image of the given
+        # size (or the given tape), and yields the results in the order they get finished. func needs to be a module level function, so it can
+        # be pickled.
+        if isinstance(circuit, Circuit):
+            circuit.set_size(width, height)
+            circuit = TapeOptimizer().optimize(TapeCompiler().compile(circuit))
+        # end if
+
+        # The circuit gets pickled into a file once, which each worker reads with its first task of this job, so the tasks
+        # themselves only carry the name of the file. The file gets removed once all results got yielded.
+        job = next(TilePool.__jobs)
+        fd, filename = tempfile.mkstemp(prefix="tile_pool_", suffix=".pickle")
+
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(circuit, f)
+        # end with
+
+        def results() -> Iterator[Any]:
+            try:
+                yield from self.__pool.imap_unordered(_run_task, ((job, filename, width, height, func, task) for task in tasks))
+            finally:
+                os.remove(filename)
+            # end try
+        # end def
+
+        return results()
+    # end def
+# end class
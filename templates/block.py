@@ -305,7 +305,10 @@ class BlockTemplateFactory:
 
 class BlockFactory:
     @staticmethod
-    def inst(block_template: BlockTemplate, value: Optional[float] = None, box_name: Optional[float] = None) -> Optional[IBlock]:
+    def inst(block_template: BlockTemplate, value: Optional[float] = None, box_name: Optional[float] = None,
+             flatten: bool = False) -> Optional[IBlock]:
+        name = block_template.name
+
         if block_template.type is BlockType.SYS_IN_POS:
             return None
 
@@ -313,114 +316,118 @@ class BlockFactory:
             return None
 
         elif block_template.type is BlockType.BOX:
-            from templates.box import BlackBoxFactory  # Due to circular dependency
+            from templates.box import BlackBoxFactory, RepeatBoxFactory  # Due to circular dependency
+
+            if box_name.endswith(".cmr"):
+                return RepeatBoxFactory().load(box_name).inst(name, flatten)
+            # end if
 
-            return BlackBoxFactory().load(box_name).inst()  # XXX Hier einen Namen mit übergeben? Wie könnte dies nützlich sein?
+            return BlackBoxFactory().load(box_name).inst(name, flatten)
 
         elif block_template.type is BlockType.VAL_CONST:
-            return Const(value)
+            return Const(value, name=name)
 
         elif block_template.type is BlockType.VAL_CONST_E:
-            return ConstE()
+            return ConstE(name=name)
 
         elif block_template.type is BlockType.VAL_CONST_PI:
-            return ConstPi()
+            return ConstPi(name=name)
 
         elif block_template.type is BlockType.VAL_VAR:
-            return Variable()
+            return Variable(name=name)
 
         elif block_template.type is BlockType.MATH_ADD:
-            return AddN()
+            return AddN(name=name)
 
         elif block_template.type is BlockType.MATH_SUB:
-            return Sub2()
+            return Sub2(name=name)
 
         elif block_template.type is BlockType.MATH_MUL:
-            return MulN()
+            return MulN(name=name)
 
         elif block_template.type is BlockType.MATH_DIV:
-            return Div2()
+            return Div2(name=name)
 
         elif block_template.type is BlockType.MATH_INV:
-            return Inv()
+            return Inv(name=name)
 
         elif block_template.type is BlockType.MATH_ABS:
-            return Abs()
+            return Abs(name=name)
 
         elif block_template.type is BlockType.MATH_MINUS:
-            return Minus()
+            return Minus(name=name)
 
         elif block_template.type is BlockType.MATH_MOD:
-            return Mod()
+            return Mod(name=name)
 
         elif block_template.type is BlockType.MATH_EXP:
-            return Exp()
+            return Exp(name=name)
 
         elif block_template.type is BlockType.MATH_LOG:
-            return Log()
+            return Log(name=name)
 
         elif block_template.type is BlockType.MATH_LN:
-            return Ln()
+            return Ln(name=name)
 
         elif block_template.type is BlockType.MATH_POW:
-            return Pow()
+            return Pow(name=name)
 
         elif block_template.type is BlockType.MATH_SQ:
-            return Sq()
+            return Sq(name=name)
 
         elif block_template.type is BlockType.MATH_SQRT:
-            return Sqrt()
+            return Sqrt(name=name)
 
         elif block_template.type is BlockType.MATH_MIN:
-            return MinN()
+            return MinN(name=name)
 
         elif block_template.type is BlockType.MATH_MAX:
-            return MaxN()
+            return MaxN(name=name)
 
         elif block_template.type is BlockType.MATH_SIN:
-            return Sin()
+            return Sin(name=name)
 
         elif block_template.type is BlockType.MATH_COS:
-            return Cos()
+            return Cos(name=name)
 
         elif block_template.type is BlockType.MATH_TAN:
-            return Tan()
+            return Tan(name=name)
 
         elif block_template.type is BlockType.MATH_ATAN:
-            return Atan()
+            return Atan(name=name)
 
         elif block_template.type is BlockType.MATH_ATAN2:
-            return Atan2()
+            return Atan2(name=name)
 
         elif block_template.type is BlockType.COMPLEX_ADD:
-            return ComplexAddN()
+            return ComplexAddN(name=name)
 
         elif block_template.type is BlockType.COMPLEX_SUB:
-            return ComplexSub()
+            return ComplexSub(name=name)
 
         elif block_template.type is BlockType.COMPLEX_MUL:
-            return ComplexMulN()
+            return ComplexMulN(name=name)
 
         elif block_template.type is BlockType.COMPLEX_DIV:
-            return ComplexDiv()
+            return ComplexDiv(name=name)
 
         elif block_template.type is BlockType.BOOL_AND:
-            return AndN()
+            return AndN(name=name)
 
         elif block_template.type is BlockType.BOOL_OR:
-            return OrN()
+            return OrN(name=name)
 
         elif block_template.type is BlockType.BOOL_NOT:
-            return Not()
+            return Not(name=name)
 
         elif block_template.type is BlockType.BOOL_GT:
-            return Gt()
+            return Gt(name=name)
 
         elif block_template.type is BlockType.BOOL_LT:
-            return Lt()
+            return Lt(name=name)
 
         elif block_template.type is BlockType.BOOL_EQ:
-            return EqN()
+            return EqN(name=name)
 
         else:
             return None
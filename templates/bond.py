@@ -10,6 +10,7 @@ __copyright__ = "Copyright 2021"
 class BoxSide(Enum):
     IN = "in"
     OUT = "out"
+    CONT = "cont"  # Condition to continue the repetitions of a repeat box, the box pin is not used
 # end class
 
 
@@ -1,8 +1,8 @@
 from __future__ import annotations
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Union
 
 from templates.bond import BondTemplate, BoxSide
-from base.black_box import BlackBox, RepeatBox
+from base.black_box import BlackBox, FlatBox, RepeatBox
 from templates.circuit import CircuitFactory
 
 
@@ -52,16 +52,31 @@ class BlackBoxFactory(CircuitFactory):
             # Prevent from counting in-pins with multiple connections more than once.
             if len([b for b in self._bonds if b.side is BoxSide.IN and b.box_pin == bond.box_pin]) == 1:
                 self._n_in += 1
-        else:
+        elif bond.side is BoxSide.OUT:
             self._n_out += 1
         # end if
     # end def
 
-    def inst(self, name: Optional[str] = None) -> BlackBox:
+    def inst(self, name: Optional[str] = None, flatten: bool = False) -> Union[BlackBox, FlatBox]:
+        # With flatten the box and all nested black boxes get no pass-through layers, but their inner blocks get connected
+        # directly to the blocks outside. Repeat boxes always keep their layers, since they need them for the repetitions.
         inst_obj = CircuitFactory.InstHelper()
-        inst_obj.box: BlackBox = BlackBox(self._n_in, self._n_out, name)
+        inst_obj.flatten = flatten
+
+        if flatten:
+            inst_obj.box: FlatBox = FlatBox(self._n_in, self._n_out, name, self._filename)
+        else:
+            inst_obj.box: BlackBox = BlackBox(self._n_in, self._n_out, name, self._filename)
+        # end if
+
         self._do_inst(inst_obj)
 
+        if flatten:
+            for block in inst_obj.blocks:
+                inst_obj.box.add_block(block["block"])
+            # end for
+        # end if
+
         return inst_obj.box
     # end def
 
@@ -73,8 +88,14 @@ class BlackBoxFactory(CircuitFactory):
                 if bond.side is BoxSide.IN:
                     inst_obj.box.assign_conn_in(block, bond.block_pin, bond.box_pin)
 
-                else:  # bond.side is BoxSide.OUT:
+                elif bond.side is BoxSide.OUT:
                     inst_obj.box.assign_pin_value(block, bond.block_pin, bond.box_pin)
+
+                elif isinstance(inst_obj.box, RepeatBox):  # bond.side is BoxSide.CONT
+                    inst_obj.box.assign_cont(block, bond.block_pin)
+
+                else:
+                    raise ValueError(f"Only repeat boxes can have a continue condition.")
                 # end if
             # end for
         # end if
@@ -150,9 +171,10 @@ class RepeatBoxFactory(BlackBoxFactory):
         # end if
     # end def
 
-    def inst(self, name: Optional[str] = None) -> RepeatBox:
+    def inst(self, name: Optional[str] = None, flatten: bool = False) -> RepeatBox:
         inst_obj = CircuitFactory.InstHelper()
-        inst_obj.box: RepeatBox = RepeatBox(self._n_in - self._n_in_special, name)
+        inst_obj.flatten = flatten  # Only applies to nested black boxes
+        inst_obj.box: RepeatBox = RepeatBox(self._n_in - self._n_in_special, name, self._filename)
         self._do_inst(inst_obj)
 
         return inst_obj.box
@@ -38,6 +38,7 @@ class CircuitFactory:
         self._n_out = None
         self._version: str = "1.0"
         self._desc = None
+        self._filename: Optional[str] = None  # File loaded from, which the instances of boxes keep
 
         # Flexible specify functions for loading data from file
         self._read_funcs = list()
@@ -81,8 +82,9 @@ class CircuitFactory:
         self._conns.append(conn)
     # end def
 
-    def inst(self) -> Circuit:
+    def inst(self, flatten: bool = False) -> Circuit:
         inst_obj = CircuitFactory.InstHelper()  # Helper object that allows the dynamic use of and sharing between instantiating functions
+        inst_obj.flatten = flatten  # Instantiate all black boxes without pass-through layers
         inst_obj.circuit: Circuit = Circuit()
         self._do_inst(inst_obj)
 
@@ -101,7 +103,8 @@ class CircuitFactory:
         inst_obj.blocks: List[Dict[str, Optional[IBlock]]] = list()
 
         for block in self._blocks:
-            inst_obj.blocks.append({"id": block.id, "block": bf.inst(block, value=block.value, box_name=block.box_name)})
+            inst_obj.blocks.append({"id": block.id, "block": bf.inst(block, value=block.value, box_name=block.box_name,
+                                                                     flatten=getattr(inst_obj, "flatten", False))})
         # end for
     # end def
 
@@ -125,6 +128,9 @@ class CircuitFactory:
 
             elif block_id == "2":
                 return inst_obj.circuit.size
+
+            elif block_id == "3":
+                return inst_obj.circuit.time
             # end if
 
         if hasattr(inst_obj, "blocks"):
@@ -151,6 +157,7 @@ class CircuitFactory:
             self._conns = list()
 
             self._name = name
+            self._filename = filename
 
             docs = [doc for doc in yaml.load_all(f, Loader=yaml.FullLoader)]
             doc = docs[0]
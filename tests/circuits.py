@@ -0,0 +1,247 @@
+from typing import Callable, Dict, Sequence
+
+from base.basic import Circuit, Point
+from base.black_box import BlackBox, RepeatBox
+from blocks.bool import Gt, Lt
+from blocks.complex import ComplexMulN
+from blocks.const_var import Const, Variable
+from blocks.deprecated import Add2, And2, Mul2
+from blocks.math import Abs, AddN, Cos, Minus, Mod, MulN, Sin, Sq, Sqrt, Sub2
+from core.block_manager import BlockManager
+
+
+__author__ = "Anton Höß"
+__copyright__ = "Copyright 2021"
+
+
+def block_manager() -> BlockManager:
+    # Block manager with the library of the repository
+    bm = BlockManager(base_dir="user_blocks", schema_filename="core/box_data_schema_v1.0.yaml")
+    bm.scan_dir()
+
+    return bm
+# end def
+
+
+# Circuits shared by the tests, mostly the ones of main.py. Each call builds a new circuit.
+def const() -> Circuit:
+    c = Circuit()
+    c.drawer.conn_to_prev_block(Const(4.27))
+
+    return c
+# end def
+
+
+def sin_y() -> Circuit:
+    c = Circuit()
+    sin = Sin(deg=True)
+    sin.conn_to_prev_block(c.point, 1)
+    c.drawer.conn_to_prev_block(sin)
+
+    return c
+# end def
+
+
+def cos_abs() -> Circuit:
+    # (cos(x) * |x| * y) ** 2
+    c = Circuit()
+    cos = Cos(deg=True)
+    cos.conn_to_prev_block(c.point, 0)
+    abs_x = Abs()
+    abs_x.conn_to_prev_block(c.point, 0)
+    mul_p = Mul2()
+    mul_p.conn_to_prev_block(abs_x, 0, 0)
+    mul_p.conn_to_prev_block(c.point, 1, 1)
+    mul_ps = Mul2()
+    mul_ps.conn_to_prev_block(cos)
+    mul_ps.conn_to_prev_block(mul_p, 0, 1)
+    c.drawer.conn_to_prev_block(Sq(mul_ps))
+
+    return c
+# end def
+
+
+def mod() -> Circuit:
+    c = Circuit()
+    mod_n = Const(4)
+    mod_x = Mod()
+    mod_x.conn_to_prev_block(c.point, 0, 0)
+    mod_x.conn_to_prev_block(mod_n, 0, 1)
+    mod_y = Mod()
+    mod_y.conn_to_prev_block(c.point, 1, 0)
+    mod_y.conn_to_prev_block(mod_n, 0, 1)
+    mul = Mul2()
+    mul.conn_to_prev_block(mod_x, 0, 0)
+    mul.conn_to_prev_block(mod_y, 0, 1)
+    c.drawer.conn_to_prev_block(mul)
+
+    return c
+# end def
+
+
+def circle() -> Circuit:
+    # Distance to a point, within a maximum distance
+    c = Circuit()
+    max_dist = Const(6)
+    point = Point(2, 1)
+    dx = Sub2()
+    dx.conn_to_prev_block(c.point, 0, 0)
+    dx.conn_to_prev_block(point, 0, 1)
+    dy = Sub2()
+    dy.conn_to_prev_block(c.point, 1, 0)
+    dy.conn_to_prev_block(point, 1, 1)
+    add = Add2()
+    add.conn_to_prev_block(Sq(dx), 0, 0)
+    add.conn_to_prev_block(Sq(dy), 0, 1)
+    dist = Sqrt(add)
+    gt = Gt()
+    gt.conn_to_prev_block(max_dist, 0, 0)
+    gt.conn_to_prev_block(dist, 0, 1)
+    mul = Mul2()
+    mul.conn_to_prev_block(dist, 0, 0)
+    mul.conn_to_prev_block(gt, 0, 1)
+    c.drawer.conn_to_prev_block(mul)
+
+    return c
+# end def
+
+
+def square() -> Circuit:
+    # Whether the point lies within a square, using a black box
+    c = Circuit()
+    dist = Const(3.)
+    gt_x = Gt()
+    gt_x.conn_to_prev_block(c.point, 0, 0)
+    gt_x.conn_to_prev_block(Minus(dist), 0, 1)
+    lt_x = Lt()
+    lt_x.conn_to_prev_block(c.point, 0, 0)
+    lt_x.conn_to_prev_block(dist, 0, 1)
+    gt_y = Gt()
+    gt_y.conn_to_prev_block(c.point, 1, 0)
+    gt_y.conn_to_prev_block(Minus(dist), 0, 1)
+    lt_y = Lt()
+    lt_y.conn_to_prev_block(c.point, 1, 0)
+    lt_y.conn_to_prev_block(dist, 0, 1)
+
+    bb = BlackBox(4, 1, "And4")
+    and_a = And2()
+    and_b = And2()
+    and_res = And2()
+    and_res.conn_to_prev_block(and_a, 0, 0)
+    and_res.conn_to_prev_block(and_b, 0, 1)
+    bb.assign_conn_in(and_a, 0, 0)
+    bb.assign_conn_in(and_a, 1, 1)
+    bb.assign_conn_in(and_b, 0, 2)
+    bb.assign_conn_in(and_b, 1, 3)
+    bb.assign_pin_value(and_res, 0, 0)
+    bb.conn_to_prev_block(gt_x, 0, 0)
+    bb.conn_to_prev_block(lt_x, 0, 1)
+    bb.conn_to_prev_block(gt_y, 0, 2)
+    bb.conn_to_prev_block(lt_y, 0, 3)
+    c.drawer.conn_to_prev_block(bb)
+
+    return c
+# end def
+
+
+def complex_sq() -> Circuit:
+    # Real part of (x + iy) ** 2 plus its imaginary part
+    c = Circuit()
+    mul = ComplexMulN()
+    mul.conn_to_prev_block(c.point, 0)
+    mul.conn_to_prev_block(c.point, 1)
+    mul.conn_to_prev_block(c.point, 0)
+    mul.conn_to_prev_block(c.point, 1)
+    add = AddN()
+    add.conn_to_prev_block(mul, 0)
+    add.conn_to_prev_block(mul, 1)
+    c.drawer.conn_to_prev_block(add)
+
+    return c
+# end def
+
+
+def fibonacci() -> Circuit:
+    # Fibonacci sequence starting with x and y, with |x| mod 6 repetitions per pixel
+    c = Circuit()
+    var = Variable()
+    add = Add2()
+    add.conn_to_prev_block(var, 0, 1)
+    rb = RepeatBox(2, "FibonacciN")
+    rb.assign_conn_in(add, 0, 0)
+    rb.assign_conn_in(var, 0, 1)
+    rb.assign_pin_value(var, 0, 0)
+    rb.assign_pin_value(add, 0, 1)
+    mod_n = Mod()
+    mod_n.conn_to_prev_block(Abs(c.point), 0, 0)
+    mod_n.conn_to_prev_block(Const(6), 0, 1)
+    rb.conn_to_prev_block(c.point, 0, 0)
+    rb.conn_to_prev_block(c.point, 1, 1)
+    rb.conn_to_prev_block(mod_n, 0, 2)
+    c.drawer.conn_to_prev_block(rb, 1)
+
+    return c
+# end def
+
+
+def doubling(pin: int = 0) -> Circuit:
+    # Doubles |x| + 1 until the result reaches 100 and counts the repetitions, which are at most 50
+    c = Circuit()
+    mul = MulN([Const(2.)])
+    add = AddN([Const(1.)])
+    lt = Lt()
+    lt.conn_to_prev_block(mul, 0, 0)
+    lt.conn_to_prev_block(Const(100.), 0, 1)
+    rb = RepeatBox(2, "Doubling")
+    rb.assign_conn_in(mul, None, 0)
+    rb.assign_conn_in(add, None, 1)
+    rb.assign_pin_value(mul, 0, 0)
+    rb.assign_pin_value(add, 0, 1)
+    rb.assign_cont(lt, 0)
+    rb.conn_to_prev_block(AddN([Abs(c.point), Const(1.)]), 0, 0)
+    rb.conn_to_prev_block(Const(0.), 0, 1)
+    rb.conn_to_prev_block(Const(50), 0, 2)
+    c.drawer.conn_to_prev_block(rb, pin)
+
+    return c
+# end def
+
+
+ALL: Dict[str, Callable[[], Circuit]] = dict(const=const, sin_y=sin_y, cos_abs=cos_abs, mod=mod, circle=circle, square=square,
+                                             complex_sq=complex_sq)
+
+
+def library(name: str, consts: Sequence[float] = (), flatten: bool = False, scale: float = .25) -> Circuit:
+    # Sum of all outputs of a box of the library, with the scaled coordinates connected to its first inputs (as far as there
+    # are inputs left) and the given constants to the others
+    c = Circuit()
+    factory = block_manager().load(name)
+    box = factory.inst(flatten=flatten)
+    n_coords = min(2, factory.n_in - len(consts))
+
+    for pin in range(n_coords):
+        coord = MulN([Const(scale)])
+        coord.conn_to_prev_block(c.point, pin)
+        box.conn_to_prev_block(coord, 0, pin)
+    # end for
+
+    for pin, value in enumerate(consts, n_coords):
+        box.conn_to_prev_block(Const(value), 0, pin)
+    # end for
+
+    add = AddN()
+
+    for pin in range(factory.n_out):
+        add.conn_to_prev_block(box, pin)
+    # end for
+
+    c.drawer.conn_to_prev_block(add)
+
+    return c
+# end def
+
+
+# Constants for the inputs of the boxes of the library besides the coordinates (except the mandelbrot box, see
+# TestCodeGenerator)
+LIBRARY: Dict[str, Sequence[float]] = dict(cart2pol=(), normal_standard_pdf=(), dist_euclidean_scaled=(1., 2., .5), mat_rot=(1.,),
+                                           if_else=(3.,), mandelbrot_inner=(0., 0., 1., 0., 10))
@@ -0,0 +1,12 @@
+import os
+import sys
+
+
+__author__ = "Anton Höß"
+__copyright__ = "Copyright 2021"
+
+
+# The modules get imported relative to the root of the repository and the box files refer to each other relative to it
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
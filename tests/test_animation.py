@@ -0,0 +1,82 @@
+import unittest
+import numpy as np
+
+from base.basic import Circuit
+from base.context import EvalContext
+from blocks.math import AddN, MulN, Sin
+from circuits import circle
+from core.animation import AnimationRenderer
+from core.crazy_matrix import CrazyMatrix, EvalMode
+
+
+__author__ = "Anton Höß"
+__copyright__ = "Copyright 2021"
+
+
+class TestAnimation(unittest.TestCase):
+    @staticmethod
+    def wave() -> Circuit:
+        # sin(x + t)
+        c = Circuit()
+        add = AddN()
+        add.conn_to_prev_block(c.point, 0)
+        add.conn_to_prev_block(c.time, 0)
+        c.drawer.conn_to_prev_block(Sin(add))
+
+        return c
+    # end def
+
+    @staticmethod
+    def pulse() -> Circuit:
+        # The circle of the shared circuits scaled by sin(t)
+        c = circle()
+        dist = c.drawer.conn_in[0].in_block
+        mul = MulN([dist])
+        mul.conn_to_prev_block(Sin(c.time))
+        c.drawer.conn_to_prev_block(mul)
+
+        return c
+    # end def
+
+    def test_frames(self):
+        # Each frame is the image of the circuit at its point in time
+        times = [0., 30., 45.5, 90.]
+
+        for circuit in (TestAnimation.wave, TestAnimation.pulse):
+            with self.subTest(name=circuit.__name__):
+                animation = AnimationRenderer(circuit(), 9, 6, center=(.5, 1.), scale=2.)
+                frames = animation.calc_frames(times)
+
+                self.assertGreater(animation.n_dynamic_ops, 0)
+                self.assertEqual(frames.shape, (len(times), 6, 9))
+
+                for t, z in zip(times, frames):
+                    c = circuit()
+                    c.set_time(t)
+                    ref = CrazyMatrix(c, 9, 6, eval_mode=EvalMode.SCALAR, center=(.5, 1.), scale=2.).calc_image()
+
+                    np.testing.assert_allclose(z, ref, rtol=1e-12, atol=1e-15)
+                # end for
+            # end with
+        # end for
+
+        # Only the blocks downstream of the time get evaluated per frame
+        animation = AnimationRenderer(TestAnimation.pulse(), 9, 6)
+
+        self.assertEqual((animation.n_static_ops, animation.n_dynamic_ops), (8, 2))
+    # end def
+
+    def test_interleaved_animations(self):
+        # Stopping one animation early while iterating another one leaves the evaluation context as it was
+        ctx = EvalContext.current()
+        a = AnimationRenderer(self.wave(), 6, 4).iter_frames([0., 1., 2.])
+        b = AnimationRenderer(self.wave(), 6, 4).iter_frames([5., 6.])
+
+        next(a)
+        next(b)
+        a.close()
+        list(b)
+
+        self.assertIs(EvalContext.current(), ctx)
+    # end def
+# end class
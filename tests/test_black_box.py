@@ -0,0 +1,144 @@
+import unittest
+import numpy as np
+
+from base.basic import Circuit
+from base.black_box import BlackBox, FlatBox, RepeatBox
+from blocks.const_var import Const
+from blocks.math import AddN, MulN
+from circuits import LIBRARY, block_manager, doubling, fibonacci, library
+from core.codegen import CodeGenerator
+from core.crazy_matrix import CrazyMatrix, EvalMode
+from core.tape import TapeCompiler
+from core.tile_pool import pixel_coords
+from templates.bond import BondTemplate, BoxSide
+from templates.box import RepeatBoxFactory
+
+
+__author__ = "Anton Höß"
+__copyright__ = "Copyright 2021"
+
+
+class TestBlackBox(unittest.TestCase):
+    def test_flatten(self):
+        # Flattened boxes give the same images as nested ones, for the repeat box including the boxes inside of it
+        for name, consts in LIBRARY.items():
+            ref = CrazyMatrix(library(name, consts), 9, 6, eval_mode=EvalMode.SCALAR).calc_image()
+
+            for mode in (EvalMode.SCALAR, EvalMode.VECTORIZED, EvalMode.TAPE):
+                with self.subTest(name=name, mode=mode):
+                    z = CrazyMatrix(library(name, consts, flatten=True), 9, 6, eval_mode=mode).calc_image()
+
+                    np.testing.assert_allclose(z, ref, rtol=1e-12)
+                # end with
+            # end for
+        # end for
+    # end def
+
+    def test_flat_box(self):
+        # The pins of a flattened box lead directly to the blocks inside of it
+        factory = block_manager().load("cart2pol")
+        box = factory.inst(flatten=True)
+
+        self.assertIsInstance(box, FlatBox)
+        self.assertIsInstance(factory.inst(), BlackBox)
+
+        for pin in range(box.n_in):
+            box.conn_to_prev_block(Const(3. - 7. * pin), 0, pin)
+        # end for
+
+        for pin in range(box.n_out):
+            block, block_pin = box.source(pin)
+
+            self.assertIn(block, box.blocks)
+            self.assertEqual(box.value(pin), block.value(block_pin))
+        # end for
+
+        self.assertEqual(box.value(0), 5.)
+    # end def
+
+    def test_repeat_counts(self):
+        # The number of repetitions differs per pixel
+        ref = CrazyMatrix(fibonacci(), 9, 6, eval_mode=EvalMode.SCALAR).calc_image()
+
+        # x = 4, y = 0 gets repeated 4 times: (4, 0) -> (0, 4) -> (4, 4) -> (4, 8) -> (8, 12)
+        self.assertEqual(ref[3, 8], 12.)
+
+        for mode in (EvalMode.VECTORIZED, EvalMode.TAPE):
+            with self.subTest(mode=mode):
+                np.testing.assert_array_equal(CrazyMatrix(fibonacci(), 9, 6, eval_mode=mode).calc_image(), ref)
+            # end with
+        # end for
+
+        # Without any pixels there are no repetition counts either
+        c = fibonacci()
+        c.set_size(9, 6)
+
+        self.assertEqual(TapeCompiler().compile(c).run_grid(np.empty(0), pixel_coords(0, 6, 6)).shape, (6, 0))
+    # end def
+
+    def test_many_repetitions(self):
+        # The repetitions run in a loop, so their number isn't limited by the recursion depth
+        c = Circuit()
+        add = AddN([Const(1.)])
+        rb = RepeatBox(1, "Count")
+        rb.assign_conn_in(add, None, 0)
+        rb.assign_pin_value(add, 0, 0)
+        rb.conn_to_prev_block(Const(0.), 0, 0)
+        rb.conn_to_prev_block(Const(5000), 0, 1)
+        c.drawer.conn_to_prev_block(rb)
+
+        self.assertEqual(c.eval(0., 0.), 5000.)
+    # end def
+
+    def test_continue(self):
+        ref = [CrazyMatrix(doubling(pin), 9, 6, eval_mode=EvalMode.SCALAR).calc_image() for pin in range(2)]
+
+        # x = 0 stops at 128 after 7 repetitions, x = -4 at 5 * 32 after 5
+        self.assertEqual((ref[0][0, 4], ref[1][0, 4]), (128., 7.))
+        self.assertEqual((ref[0][0, 0], ref[1][0, 0]), (160., 5.))
+
+        for mode in (EvalMode.VECTORIZED, EvalMode.TAPE):
+            for pin in range(2):
+                with self.subTest(mode=mode, pin=pin):
+                    np.testing.assert_array_equal(CrazyMatrix(doubling(pin), 9, 6, eval_mode=mode).calc_image(), ref[pin])
+                # end with
+            # end for
+        # end for
+    # end def
+
+    def test_continue_mandelbrot(self):
+        # Stopping the iteration as soon as the result is known doesn't change it, neither for instances of the box nor for
+        # its generated code
+        def mandelbrot(factory: RepeatBoxFactory) -> Circuit:
+            c = Circuit()
+            box = factory.inst()
+
+            box.conn_to_prev_block(MulN([c.point, Const(.25)]), 0, 0)
+            box.conn_to_prev_block(c.point, 1, 1)
+
+            for pin, value in enumerate((0., 0., 1., 0., 20), 2):
+                box.conn_to_prev_block(Const(value), 0, pin)
+            # end for
+
+            c.drawer.conn_to_prev_block(box, 5)
+
+            return c
+        # end def
+
+        bm = block_manager()
+        factory = bm.load("mandelbrot_inner")
+        factory.add_bond(BondTemplate(BoxSide.CONT, "f7a9", 0, 0))  # The condition res == 0
+        ref = CrazyMatrix(mandelbrot(bm.load("mandelbrot_inner")), 9, 6, eval_mode=EvalMode.SCALAR).calc_image()
+
+        for mode in (EvalMode.SCALAR, EvalMode.TAPE):
+            with self.subTest(mode=mode):
+                np.testing.assert_array_equal(CrazyMatrix(mandelbrot(factory), 9, 6, eval_mode=mode).calc_image(), ref)
+            # end with
+        # end for
+
+        xs, ys = pixel_coords(0, 9, 9, scale=.25), pixel_coords(0, 6, 6)
+        z = CodeGenerator().compile(factory)(xs[np.newaxis, :], ys[:, np.newaxis], 0., 0., 1., 0., 20)[5]
+
+        np.testing.assert_array_equal(z, ref)
+    # end def
+# end class
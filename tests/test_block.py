@@ -0,0 +1,62 @@
+import math
+import unittest
+
+from base.basic import Circuit
+from base.block import BlockFixed
+from blocks.math import AddN, Sin
+from circuits import ALL
+from core.crazy_matrix import CrazyMatrix, EvalMode
+from core.tile_pool import pixel_coords
+
+
+__author__ = "Anton Höß"
+__copyright__ = "Copyright 2021"
+
+
+class _Counted(BlockFixed):
+    # Passes its input on and counts how often it got calculated
+    def __init__(self, name=None):
+        BlockFixed.__init__(self, 1, 1, name)
+        self.n_calcs = 0
+    # end def
+
+    def _calc_values(self):
+        self.n_calcs += 1
+        self._pin_value[0] = self._conn_in[0].value
+    # end def
+# end class
+
+
+class TestBlock(unittest.TestCase):
+    def test_diamond_evaluated_once(self):
+        # sin(x) + sin(x) + sin(x) (in degrees): the shared block gets calculated once per evaluation and again for the next one
+        c = Circuit()
+        counted = _Counted()
+        counted.conn_to_prev_block(c.point, 0)
+        sin = Sin(counted)
+        c.drawer.conn_to_prev_block(AddN([sin, sin, sin]))
+
+        for n, x in enumerate((0.5, 2., 0.5, -1.), 1):
+            self.assertAlmostEqual(c.eval(x, 0.), 3 * math.sin(math.radians(x)), places=12)
+            self.assertEqual(counted.n_calcs, n)
+        # end for
+    # end def
+
+    def test_successive_points(self):
+        # Evaluating one circuit pixel by pixel never reuses values of the previous pixel
+        width, height = 9, 6
+        xs, ys = pixel_coords(0, width, width), pixel_coords(0, height, height)
+
+        for name, circuit in ALL.items():
+            with self.subTest(name=name):
+                ref = CrazyMatrix(circuit(), width, height, eval_mode=EvalMode.SCALAR).calc_image()
+                c = circuit()
+                c.set_size(width, height)
+
+                for i, j in ((0, 0), (0, 1), (1, 1), (5, 8), (5, 8), (0, 0)):
+                    self.assertEqual(c.eval(xs[j], ys[i]), ref[i, j])
+                # end for
+            # end with
+        # end for
+    # end def
+# end class
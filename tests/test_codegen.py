@@ -0,0 +1,93 @@
+from typing import Sequence
+import unittest
+import numpy as np
+
+from base.basic import Circuit
+from blocks.const_var import Const
+from circuits import block_manager
+from core.codegen import CodeGenerator
+from core.crazy_matrix import CrazyMatrix, EvalMode
+from core.tile_pool import pixel_coords
+from templates.block import BlockTemplateFactory, BlockType, IdGenerator
+from templates.box import BlackBoxFactory
+from templates.circuit import CircuitFactory
+from templates.conn import ConnTemplate
+
+
+__author__ = "Anton Höß"
+__copyright__ = "Copyright 2021"
+
+
+class TestCodeGenerator(unittest.TestCase):
+    # Input values of the boxes of the library to evaluate them with, for repeat boxes including the number of repetitions.
+    # The mandelbrot box refers to its inner box by a Windows path, so it only loads on Windows.
+    BOX_INPUTS = {
+        "cart2pol": [(3., -4.), (-1., 0.5)],
+        "normal_standard_pdf": [(0.7,), (-2.,)],
+        "if_else": [(1., 5., 7.), (0., 5., 7.)],
+        "dist_euclidean_scaled": [(1., 2., 4., 6., 0.5)],
+        "mat_rot": [(30., 1., 2.)],
+        "mandelbrot_inner": [(0.3, 0.2, 0., 0., 1., 0., 10), (1., 1., 0., 0., 1., 0., 10)],
+    }
+
+    @staticmethod
+    def eval_box(factory: BlackBoxFactory, inputs: Sequence[float], pin: int) -> float:
+        # Scalar reference: the output pin of an instance of the box with constant inputs
+        c = Circuit()
+        box = factory.inst()
+
+        for in_pin, value in enumerate(inputs):
+            box.conn_to_prev_block(Const(value), 0, in_pin)
+        # end for
+
+        c.drawer.conn_to_prev_block(box, pin, 0)
+
+        return c.eval(0., 0.)
+    # end def
+
+    def test_boxes(self):
+        bm = block_manager()
+        generator = CodeGenerator()
+
+        for name, inputs_list in TestCodeGenerator.BOX_INPUTS.items():
+            factory = bm.load(name)
+            func = generator.compile(factory)
+
+            for inputs in inputs_list:
+                with self.subTest(name=name, inputs=inputs):
+                    outs = func(*inputs)
+
+                    self.assertEqual(len(outs), factory.n_out)
+
+                    for pin, value in enumerate(outs):
+                        np.testing.assert_allclose(value, TestCodeGenerator.eval_box(factory, inputs, pin), rtol=1e-12)
+                    # end for
+                # end with
+            # end for
+
+            # Functions are compiled once per source code
+            self.assertIs(generator.compile(factory), func)
+        # end for
+    # end def
+
+    def test_circuit(self):
+        # The product of the polar coordinates of each pixel
+        bm = block_manager()
+        btf = BlockTemplateFactory(IdGenerator())
+        factory = CircuitFactory()
+        box = factory.add_block(btf.get_block_template(BlockType.BOX, box_name=bm.get_filename_from_name("cart2pol")))
+        mul = factory.add_block(btf.get_block_template(BlockType.MATH_MUL))
+        factory.add_conn(ConnTemplate("0", 0, box.id, 0))
+        factory.add_conn(ConnTemplate("0", 1, box.id, 1))
+        factory.add_conn(ConnTemplate(box.id, 0, mul.id, None))
+        factory.add_conn(ConnTemplate(box.id, 1, mul.id, None))
+        factory.add_conn(ConnTemplate(mul.id, 0, "1", 0))
+
+        width, height = 9, 6
+        func = CodeGenerator().compile(factory)
+        z = func(pixel_coords(0, width, width)[np.newaxis, :], pixel_coords(0, height, height)[:, np.newaxis], width, height)
+        ref = CrazyMatrix(factory.inst(), width, height, eval_mode=EvalMode.SCALAR).calc_image()
+
+        np.testing.assert_allclose(z, ref, rtol=1e-12)
+    # end def
+# end class
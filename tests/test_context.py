@@ -0,0 +1,82 @@
+from typing import List
+from concurrent.futures import ThreadPoolExecutor
+import gc
+import unittest
+import weakref
+import numpy as np
+
+from base.basic import Circuit
+from base.context import EvalContext
+from blocks.math import Sin
+from circuits import fibonacci
+from core.crazy_matrix import CrazyMatrix, EvalMode
+from core.tile_pool import pixel_coords
+
+
+__author__ = "Anton Höß"
+__copyright__ = "Copyright 2021"
+
+
+class TestEvalContext(unittest.TestCase):
+    def test_default_context_releases_blocks(self):
+        # Circuits evaluated without a context must not be kept alive by the thread's default context
+        refs = list()
+
+        for _ in range(3):
+            circuit = Circuit()
+            sin = Sin()
+            sin.conn_to_prev_block(circuit.point, 0)
+            circuit.drawer.conn_to_prev_block(sin)
+            circuit.eval_vec(np.linspace(0., 1., 100)[np.newaxis, :], np.linspace(0., 1., 100)[:, np.newaxis])
+            refs.append(weakref.ref(sin))
+        # end for
+
+        del circuit, sin
+        gc.collect()
+
+        self.assertEqual([ref() for ref in refs], [None] * 3)
+    # end def
+
+    def test_concurrent_evaluation(self):
+        # Threads evaluating the same circuit (including the state of its repeat box) at different points don't interfere
+        ref = CrazyMatrix(fibonacci(), 9, 6, eval_mode=EvalMode.SCALAR).calc_image()
+        xs, ys = pixel_coords(0, 9, 9), pixel_coords(0, 6, 6)
+        circuit = fibonacci()
+        circuit.set_size(9, 6)
+
+        def calc_row(i: int) -> List[float]:
+            with EvalContext():
+                return [circuit.eval(x, ys[i]) for _ in range(20) for x in xs][-len(xs):]
+            # end with
+        # end def
+
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            rows = list(executor.map(calc_row, range(len(ys))))
+        # end with
+
+        np.testing.assert_array_equal(rows, ref)
+    # end def
+
+    def test_nested_contexts(self):
+        # Values calculated within a context are only visible within it
+        circuit = Circuit()
+        sin = Sin(deg=False)
+        sin.conn_to_prev_block(circuit.point, 0)
+        circuit.drawer.conn_to_prev_block(sin)
+
+        with EvalContext() as outer:
+            circuit.point.set_x(1.)
+            sin.value()
+
+            with EvalContext() as inner:
+                self.assertIs(EvalContext.current(), inner)
+
+                circuit.point.set_x(2.)
+                self.assertEqual(sin.value(), np.sin(2.))
+            # end with
+
+            self.assertIs(EvalContext.current(), outer)
+            self.assertEqual(sin.value(), np.sin(1.))
+        # end with
+    # end def
+# end class
@@ -0,0 +1,199 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+
+from base.basic import Circuit
+from base.block import BlockFixed
+from blocks.bool import Gt
+from blocks.const_var import Const
+from blocks.math import AddN
+from core.crazy_matrix import CrazyMatrix, EvalMode
+from core.precision import Precision
+from circuits import ALL, circle, fibonacci
+
+
+__author__ = "Anton Höß"
+__copyright__ = "Copyright 2021"
+
+
+class _Twice(BlockFixed):
+    # User defined block without a kernel
+    def __init__(self, name=None):
+        BlockFixed.__init__(self, 1, 1, name)
+    # end def
+
+    def _calc_values(self):
+        self._pin_value[0] = 2 * self._conn_in[0].value
+    # end def
+# end class
+
+
+class TestCrazyMatrix(unittest.TestCase):
+    def test_vectorized(self):
+        # Same images as the scalar reference, also for odd sizes and other viewports
+        for name, circuit in ALL.items():
+            for width, height, center, scale in ((9, 6, (0., 0.), 1.), (8, 5, (1.5, -2.), .25)):
+                with self.subTest(name=name, width=width, height=height):
+                    ref = CrazyMatrix(circuit(), width, height, eval_mode=EvalMode.SCALAR, center=center, scale=scale).calc_image()
+                    z = CrazyMatrix(circuit(), width, height, eval_mode=EvalMode.VECTORIZED, center=center, scale=scale).calc_image()
+
+                    self.assertEqual(z.shape, (height, width))
+                    np.testing.assert_allclose(z, ref, rtol=1e-12)
+                # end with
+            # end for
+        # end for
+    # end def
+
+    def test_threads(self):
+        # Tiles evaluated on multiple threads, also by the object graph of a single circuit in SCALAR mode
+        for name, circuit in dict(ALL, fibonacci=fibonacci).items():
+            ref = CrazyMatrix(circuit(), 9, 6, eval_mode=EvalMode.SCALAR).calc_image()
+
+            for mode in (EvalMode.SCALAR, EvalMode.VECTORIZED, EvalMode.TAPE):
+                with self.subTest(name=name, mode=mode):
+                    z = CrazyMatrix(circuit(), 9, 6, eval_mode=mode, n_threads=3, tile_size=2).calc_image()
+
+                    np.testing.assert_allclose(z, ref, rtol=1e-12)
+                # end with
+            # end for
+        # end for
+    # end def
+
+    def test_progressive(self):
+        # Each level shows the pixels evaluated so far, the last one is the whole image
+        for name, circuit in dict(ALL, fibonacci=fibonacci).items():
+            ref = CrazyMatrix(circuit(), 11, 7, eval_mode=EvalMode.SCALAR).calc_image()
+
+            for mode in (EvalMode.SCALAR, EvalMode.TAPE):
+                with self.subTest(name=name, mode=mode):
+                    images = list(CrazyMatrix(circuit(), 11, 7, eval_mode=mode).iter_image_progressive(n_levels=3))
+
+                    self.assertEqual(len(images), 3)
+
+                    for level, z in enumerate(images):
+                        step = 2 ** (2 - level)
+
+                        self.assertEqual(z.shape, ref.shape)
+                        np.testing.assert_allclose(z[::step, ::step], ref[::step, ::step], rtol=1e-12)
+                    # end for
+
+                    np.testing.assert_allclose(images[-1], ref, rtol=1e-12)
+                # end with
+            # end for
+        # end for
+
+        images = list()
+        z = CrazyMatrix(fibonacci(), 11, 7).calc_image_progressive(images.append, n_levels=1)
+
+        self.assertEqual(len(images), 1)
+        self.assertIs(z, images[0])
+    # end def
+
+    def test_adaptive(self):
+        for name, circuit in dict(ALL, fibonacci=fibonacci).items():
+            ref = CrazyMatrix(circuit(), 11, 7, eval_mode=EvalMode.SCALAR).calc_image()
+
+            for mode in (EvalMode.SCALAR, EvalMode.TAPE):
+                with self.subTest(name=name, mode=mode):
+                    # Strict mode evaluates every pixel, no matter the tolerance
+                    z = CrazyMatrix(circuit(), 11, 7, eval_mode=mode).calc_image_adaptive(tolerance=np.inf, max_cell_size=4, strict=True)
+                    np.testing.assert_allclose(z, ref, rtol=1e-12)
+
+                    # Without a tolerance only cells with equal corners get interpolated, i.e. only the ones of constant images
+                    if name == "const":
+                        z = CrazyMatrix(circuit(), 11, 7, eval_mode=mode).calc_image_adaptive(tolerance=0., max_cell_size=4)
+                        np.testing.assert_array_equal(z, ref)
+                    # end if
+
+                    # The corners of the coarsest cells always get evaluated
+                    z = CrazyMatrix(circuit(), 11, 7, eval_mode=mode).calc_image_adaptive(tolerance=np.inf, max_cell_size=4)
+                    self.assertEqual(z.shape, ref.shape)
+                    np.testing.assert_allclose(z[::4, ::4], ref[::4, ::4], rtol=1e-12)
+                # end with
+            # end for
+        # end for
+    # end def
+
+    def test_adaptive_tolerance(self):
+        # The distance to a point is smooth away from it, so most pixels get interpolated, but stay close to their values
+        ref = CrazyMatrix(circle(), 32, 32, eval_mode=EvalMode.SCALAR, scale=.01).calc_image()
+        z = CrazyMatrix(circle(), 32, 32, eval_mode=EvalMode.TAPE, scale=.01).calc_image_adaptive(tolerance=.1, max_cell_size=8)
+
+        self.assertGreater(np.count_nonzero(z != ref), z.size // 2)
+        np.testing.assert_allclose(z, ref, atol=1e-3)
+    # end def
+
+    def test_image_to_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "image.npy")
+
+            for name, circuit in dict(ALL, fibonacci=fibonacci).items():
+                ref = CrazyMatrix(circuit(), 11, 7, eval_mode=EvalMode.SCALAR).calc_image()
+
+                for mode, use_symmetry, n_threads in ((EvalMode.SCALAR, False, 1), (EvalMode.TAPE, False, 2), (EvalMode.TAPE, True, 1),
+                                                      (EvalMode.VECTORIZED, True, 3)):
+                    with self.subTest(name=name, mode=mode, use_symmetry=use_symmetry, n_threads=n_threads):
+                        z = CrazyMatrix(circuit(), 11, 7, eval_mode=mode, tile_size=3, use_symmetry=use_symmetry,
+                                        n_threads=n_threads).calc_image_to_file(filename)
+
+                        self.assertIsInstance(z, np.memmap)
+                        np.testing.assert_allclose(z, ref, rtol=1e-12)
+                        del z
+
+                        np.testing.assert_allclose(np.load(filename, mmap_mode="r"), ref, rtol=1e-12)
+                    # end with
+                # end for
+            # end for
+
+            z = CrazyMatrix(fibonacci(), 11, 7, precision=Precision.SINGLE).calc_image_to_file(filename)
+
+            self.assertEqual(z.dtype, np.float32)
+            del z
+        # end with
+    # end def
+
+    def test_blocks_without_kernel(self):
+        # Get evaluated per pixel in all modes, even with constant inputs and culling
+        def circuit() -> Circuit:
+            c = Circuit()
+            twice_x, twice_c = _Twice(), _Twice()
+            twice_x.conn_to_prev_block(c.point, 0, 0)
+            twice_c.conn_to_prev_block(Const(3.), 0, 0)
+            c.drawer.conn_to_prev_block(AddN([twice_x, twice_c]))
+
+            return c
+        # end def
+
+        ref = CrazyMatrix(circuit(), 9, 4, eval_mode=EvalMode.SCALAR).calc_image()
+        np.testing.assert_array_equal(ref[0], np.arange(-4, 5) * 2 + 6)
+
+        for mode in (EvalMode.VECTORIZED, EvalMode.TAPE):
+            for cull_tiles in (False, True):
+                z = CrazyMatrix(circuit(), 9, 4, eval_mode=mode, tile_size=2, cull_tiles=cull_tiles).calc_image()
+
+                np.testing.assert_array_equal(z, ref)
+            # end for
+        # end for
+    # end def
+
+    def test_cull_tiles_single_precision(self):
+        # In double precision x > 0.99999999 holds for x = 1, but in single precision the constant gets rounded to 1
+        def circuit() -> Circuit:
+            c = Circuit()
+            gt = Gt()
+            gt.conn_to_prev_block(c.point, 0, 0)
+            gt.conn_to_prev_block(Const(0.99999999), 0, 1)
+            c.drawer.conn_to_prev_block(gt)
+
+            return c
+        # end def
+
+        for mode in (EvalMode.TAPE, EvalMode.VECTORIZED):
+            culled = CrazyMatrix(circuit(), 14, 3, eval_mode=mode, tile_size=4, cull_tiles=True, precision=Precision.SINGLE).calc_image()
+            ref = CrazyMatrix(circuit(), 14, 3, eval_mode=mode, tile_size=4, precision=Precision.SINGLE).calc_image()
+
+            np.testing.assert_array_equal(culled, ref)
+        # end for
+    # end def
+# end class
@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+
+from base.basic import Circuit
+from blocks.const_var import Const
+from blocks.math import MulN
+from core.block_manager import BlockManager
+from core.crazy_matrix import CrazyMatrix, EvalMode
+from core.render_cache import RenderCache
+
+
+__author__ = "Anton Höß"
+__copyright__ = "Copyright 2021"
+
+
+class TestDeepZoom(unittest.TestCase):
+    @staticmethod
+    def mandelbrot(n_rep: int) -> Circuit:
+        # The box gets instantiated without a name, so it's only known by the file it was loaded from
+        bm = BlockManager(base_dir="user_blocks", schema_filename="core/box_data_schema_v1.0.yaml")
+        bm.scan_dir()
+
+        c = Circuit()
+        scale = Const(0.2)
+        box = bm.load("mandelbrot_inner").inst()
+
+        for pin in range(2):
+            mul = MulN()
+            mul.conn_to_prev_block(scale)
+            mul.conn_to_prev_block(c.point, pin)
+            box.conn_to_prev_block(mul, 0, pin)
+        # end for
+
+        for pin, value in enumerate([0, 0, 1, 0, n_rep]):
+            box.conn_to_prev_block(Const(value), 0, 2 + pin)
+        # end for
+
+        c.drawer.conn_to_prev_block(box, 5, 0)
+
+        return c
+    # end def
+
+    def test_deep_zoom_matches_tape(self):
+        for n_rep, center, scale in ((30, (0., 0.), 1.), (100, (-3.7, 0.5), 0.05)):
+            z = CrazyMatrix(self.mandelbrot(n_rep), 40, 30, eval_mode=EvalMode.DEEP_ZOOM, center=center, scale=scale).calc_image()
+            ref = CrazyMatrix(self.mandelbrot(n_rep), 40, 30, eval_mode=EvalMode.TAPE, center=center, scale=scale).calc_image()
+
+            np.testing.assert_array_equal(z, ref)
+        # end for
+    # end def
+
+    def test_render_cache_keeps_deep_zoom_apart(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = RenderCache(cache_dir)
+
+            for mode in (EvalMode.DEEP_ZOOM, EvalMode.TAPE):
+                CrazyMatrix(self.mandelbrot(30), 40, 30, eval_mode=mode, render_cache=cache).calc_image()
+            # end for
+
+            self.assertEqual(len(os.listdir(cache_dir)), 2)
+        # end with
+    # end def
+# end class
@@ -0,0 +1,104 @@
+from functools import partial
+import unittest
+import numpy as np
+
+from base import intervals, kernels
+from base.basic import Circuit
+from base.intervals import Interval
+from blocks.math import Pow
+from circuits import ALL, LIBRARY, doubling, fibonacci, library, square
+from core.crazy_matrix import CrazyMatrix, EvalMode
+from core.optimizer import TapeOptimizer
+from core.tape import TapeCompiler
+from core.tile_pool import pixel_coords, tiles
+
+
+__author__ = "Anton Höß"
+__copyright__ = "Copyright 2021"
+
+
+class TestIntervals(unittest.TestCase):
+    CIRCUITS = dict(ALL, fibonacci=fibonacci, doubling=doubling, **{name: partial(library, name, consts) for name, consts in LIBRARY.items()})
+
+    def test_bounds_contain_values(self):
+        # The bounds of each tile contain all values of the scalar reference within the tile
+        width, height = 12, 9
+        xs, ys = pixel_coords(0, width, width), pixel_coords(0, height, height)
+
+        for name, circuit in TestIntervals.CIRCUITS.items():
+            with self.subTest(name=name):
+                ref = CrazyMatrix(circuit(), width, height, eval_mode=EvalMode.SCALAR).calc_image()
+                c = circuit()
+                c.set_size(width, height)
+                tape = TapeOptimizer().optimize(TapeCompiler().compile(c))
+
+                for x_start, x_end, y_start, y_end in tiles(width, height, 3):
+                    bounds = tape.run_interval(Interval(xs[x_start], xs[x_end - 1]), Interval(ys[y_start], ys[y_end - 1]))
+                    z = ref[y_start:y_end, x_start:x_end]
+                    defined = z[~np.isnan(z)]
+
+                    self.assertTrue(((defined >= bounds.lo) & (defined <= bounds.hi)).all(), f"{bounds} for {z}")
+                    self.assertTrue(bounds.nan or defined.size == z.size, f"{bounds} for {z}")
+                # end for
+            # end with
+        # end for
+    # end def
+
+    def test_cull_tiles(self):
+        for name, circuit in TestIntervals.CIRCUITS.items():
+            ref = CrazyMatrix(circuit(), 12, 9, eval_mode=EvalMode.SCALAR).calc_image()
+
+            for mode in (EvalMode.VECTORIZED, EvalMode.TAPE):
+                with self.subTest(name=name, mode=mode):
+                    z = CrazyMatrix(circuit(), 12, 9, eval_mode=mode, tile_size=2, cull_tiles=True).calc_image()
+
+                    np.testing.assert_allclose(z, ref, rtol=1e-12)
+                # end with
+            # end for
+        # end for
+
+        # The tiles outside of the square and the ones inside of it are a single value
+        c = square()
+        c.set_size(12, 9)
+        tape = TapeOptimizer().optimize(TapeCompiler().compile(c))
+
+        self.assertEqual(tape.run_interval(Interval(-6., -4.), Interval(-4., -3.)).value, 0.)
+        self.assertEqual(tape.run_interval(Interval(-1., 1.), Interval(-1., 1.)).value, 1.)
+        self.assertFalse(tape.run_interval(Interval(2., 4.), Interval(-1., 1.)).single)
+    # end def
+
+    def test_pow_contains_values(self):
+        # Bases and exponents of both signs, including negative exponents of bases above 1
+        bounds = [(0., 0.), (0., 2.), (.5, .75), (1., 3.), (2., 5.), (-1., 2.)]
+        exps = [(-8., -6.), (-1., 1.), (0., 0.), (.5, 3.), (2., 2.), (-2., -2.)]
+
+        for a_lo, a_hi in bounds:
+            for b_lo, b_hi in exps:
+                res = intervals.pow_(Interval(a_lo, a_hi), Interval(b_lo, b_hi))
+                a, b = np.meshgrid(np.linspace(a_lo, a_hi, 9), np.linspace(b_lo, b_hi, 9))
+                z = kernels.pow_(a, b)
+                z = z[~np.isnan(z)]
+
+                self.assertTrue(((z >= res.lo) & (z <= res.hi)).all(), f"{res} for [{a_lo}, {a_hi}] ** [{b_lo}, {b_hi}]")
+            # end for
+        # end for
+    # end def
+
+    def test_cull_tiles_pow(self):
+        # Tiles with bases above 1 and negative exponents used to get culled as undefined
+        def circuit() -> Circuit:
+            c = Circuit()
+            pow_ = Pow()
+            pow_.conn_to_prev_block(c.point, 0, 0)
+            pow_.conn_to_prev_block(c.point, 1, 1)
+            c.drawer.conn_to_prev_block(pow_)
+
+            return c
+        # end def
+
+        culled = CrazyMatrix(circuit(), 23, 16, eval_mode=EvalMode.TAPE, tile_size=3, cull_tiles=True).calc_image()
+        ref = CrazyMatrix(circuit(), 23, 16, eval_mode=EvalMode.TAPE, tile_size=3).calc_image()
+
+        np.testing.assert_array_equal(culled, ref)
+    # end def
+# end class
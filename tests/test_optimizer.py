@@ -0,0 +1,137 @@
+from typing import Tuple
+import unittest
+import numpy as np
+
+from base.basic import Circuit
+from base.black_box import RepeatBox
+from blocks.const_var import Const
+from blocks.math import AddN, MulN, Sin, Sq
+from circuits import ALL, block_manager, circle, const
+from core.crazy_matrix import CrazyMatrix, EvalMode
+from core.optimizer import TapeOptimizer
+from core.tape import LoopOp, Tape, TapeCompiler
+from core.tile_pool import pixel_coords
+
+
+__author__ = "Anton Höß"
+__copyright__ = "Copyright 2021"
+
+
+class TestTapeOptimizer(unittest.TestCase):
+    @staticmethod
+    def optimize(circuit: Circuit, width: int = 9, height: int = 6) -> Tuple[Tape, TapeOptimizer]:
+        circuit.set_size(width, height)
+        optimizer = TapeOptimizer()
+
+        return optimizer.optimize(TapeCompiler().compile(circuit)), optimizer
+    # end def
+
+    @staticmethod
+    def squares() -> Circuit:
+        # Squares x and y twice in a repeat box, but only uses x
+        c = Circuit()
+        sq_x, sq_y = Sq(), Sq()
+        rb = RepeatBox(2, "squares")
+        rb.assign_conn_in(sq_x, 0, 0)
+        rb.assign_conn_in(sq_y, 0, 1)
+        rb.assign_pin_value(sq_x, 0, 0)
+        rb.assign_pin_value(sq_y, 0, 1)
+        rb.conn_to_prev_block(c.point, 0, 0)
+        rb.conn_to_prev_block(c.point, 1, 1)
+        rb.conn_to_prev_block(Const(2), 0, 2)
+        c.drawer.conn_to_prev_block(rb, 0)
+
+        return c
+    # end def
+
+    @staticmethod
+    def polar() -> Circuit:
+        # r ** 2 * theta with the radius of two instances of the cart2pol box on the same inputs
+        c = Circuit()
+        factory = block_manager().load("cart2pol")
+        mul = MulN()
+
+        for pins in ((0,), (0, 1)):
+            box = factory.inst()
+            box.conn_to_prev_block(c.point, 0, 0)
+            box.conn_to_prev_block(c.point, 1, 1)
+
+            for pin in pins:
+                mul.conn_to_prev_block(box, pin)
+            # end for
+        # end for
+
+        c.drawer.conn_to_prev_block(mul)
+
+        return c
+    # end def
+
+    @staticmethod
+    def sines() -> Circuit:
+        # sin(x) in degrees and radians and twice the sine in degrees, where only the last two are the same
+        c = Circuit()
+        add = AddN()
+
+        for deg in (True, False, True):
+            sin = Sin(deg=deg)
+            sin.conn_to_prev_block(c.point, 0)
+            add.conn_to_prev_block(sin)
+        # end for
+
+        c.drawer.conn_to_prev_block(add)
+
+        return c
+    # end def
+
+    def test_results(self):
+        width, height = 9, 6
+        xs, ys = pixel_coords(0, width, width), pixel_coords(0, height, height)
+
+        for name, circuit in dict(ALL, squares=TestTapeOptimizer.squares, polar=TestTapeOptimizer.polar, sines=TestTapeOptimizer.sines).items():
+            with self.subTest(name=name):
+                ref = CrazyMatrix(circuit(), width, height, eval_mode=EvalMode.SCALAR).calc_image()
+                tape, _ = TestTapeOptimizer.optimize(circuit(), width, height)
+
+                np.testing.assert_allclose(tape.run_grid(xs, ys), ref, rtol=1e-12)
+            # end with
+        # end for
+    # end def
+
+    def test_fold(self):
+        tape, optimizer = TestTapeOptimizer.optimize(const())
+
+        self.assertEqual(tape.ops, list())
+        self.assertEqual(tape.consts[tape.out_slot], 4.27)
+
+        # The constant point and the maximum distance
+        tape, optimizer = TestTapeOptimizer.optimize(circle())
+
+        self.assertEqual(sorted(optimizer.report.folded), ["Const", "Point"])
+        self.assertEqual((optimizer.report.n_ops_before, optimizer.report.n_ops_after), (10, 8))
+        self.assertEqual(len(tape.ops), 8)
+    # end def
+
+    def test_dead_loop_pins(self):
+        # The pin of y is removed from the loop along with its block
+        tape, optimizer = TestTapeOptimizer.optimize(TestTapeOptimizer.squares())
+        loop = next(op for op in tape.ops if isinstance(op, LoopOp))
+
+        self.assertEqual(optimizer.report.removed, ["Sq"])
+        self.assertEqual(len(loop.outs), 1)
+        self.assertEqual(len(loop.body_ops), 1)
+    # end def
+
+    def test_merge(self):
+        # The blocks calculating the radius of both instances of the box get merged
+        tape, optimizer = TestTapeOptimizer.optimize(TestTapeOptimizer.polar())
+
+        self.assertEqual(sorted(optimizer.report.merged), ["AddN('sum_xy_sq')", "Sq('x_sq')", "Sq('y_sq')", "Sqrt('r')"])
+        self.assertEqual((optimizer.report.n_ops_before, optimizer.report.n_ops_after), (10, 6))
+
+        # Blocks with different parameters are kept apart
+        tape, optimizer = TestTapeOptimizer.optimize(TestTapeOptimizer.sines())
+
+        self.assertEqual(optimizer.report.merged, ["Sin"])
+        self.assertEqual(sum(type(op.block) is Sin for op in tape.ops), 2)
+    # end def
+# end class
@@ -0,0 +1,110 @@
+import os
+import tempfile
+import unittest
+import matplotlib.image as mpimg
+import matplotlib.pyplot as plt
+import numpy as np
+
+from circuits import ALL, fibonacci
+from core.crazy_matrix import CrazyMatrix, EvalMode
+from core.pyramid import PyramidExporter
+from core.tile_pool import TilePool
+
+
+__author__ = "Anton Höß"
+__copyright__ = "Copyright 2021"
+
+
+class TestPyramidExporter(unittest.TestCase):
+    WIDTH, HEIGHT, TILE_SIZE, OVERLAP = 11, 7, 4, 1
+
+    @staticmethod
+    def stitch(level_dir: str, width: int, height: int) -> np.ndarray:
+        # Puts the tiles of a level back together, without their overlap
+        size, overlap = TestPyramidExporter.TILE_SIZE, TestPyramidExporter.OVERLAP
+        z = np.zeros((height, width, 4), dtype=np.float32)
+
+        for row in range(-(-height // size)):
+            for col in range(-(-width // size)):
+                tile = mpimg.imread(os.path.join(level_dir, f"{col}_{row}.png"))
+                x_start, y_start = col * size - (overlap if col > 0 else 0), row * size - (overlap if row > 0 else 0)
+
+                # The tile spans the overlap on every side with a neighbour
+                np.testing.assert_array_equal(tile.shape[:2], (min((row + 1) * size + overlap, height) - y_start,
+                                                               min((col + 1) * size + overlap, width) - x_start))
+                z[row * size:(row + 1) * size, col * size:(col + 1) * size] = tile[row * size - y_start:, col * size - x_start:][:size, :size]
+            # end for
+        # end for
+
+        return z
+    # end def
+
+    def test_full_resolution(self):
+        # The finest level shows the same image as the scalar reference
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for name, circuit in dict(ALL, fibonacci=fibonacci).items():
+                with self.subTest(name=name):
+                    ref = CrazyMatrix(circuit(), self.WIDTH, self.HEIGHT, eval_mode=EvalMode.SCALAR, scale=.5).calc_image()
+                    v_min, v_max = np.nanmin(ref), np.nanmax(ref) + 1.  # Not an empty range for the constant image
+                    plt.imsave(os.path.join(tmp_dir, f"{name}.png"), ref, cmap="viridis", vmin=v_min, vmax=v_max, format="png")
+
+                    exporter = PyramidExporter(circuit(), self.WIDTH, self.HEIGHT, scale=.5, cmap="viridis", v_min=v_min, v_max=v_max,
+                                               tile_size=self.TILE_SIZE, overlap=self.OVERLAP)
+                    exporter.export(os.path.join(tmp_dir, f"{name}.dzi"))
+                    level_dir = os.path.join(tmp_dir, f"{name}_files", str(exporter.n_levels - 1))
+
+                    np.testing.assert_array_equal(self.stitch(level_dir, self.WIDTH, self.HEIGHT),
+                                                  mpimg.imread(os.path.join(tmp_dir, f"{name}.png")))
+                # end with
+            # end for
+        # end with
+    # end def
+
+    def test_levels(self):
+        exporter = PyramidExporter(fibonacci(), self.WIDTH, self.HEIGHT, tile_size=self.TILE_SIZE, overlap=self.OVERLAP)
+
+        self.assertEqual(exporter.n_levels, 5)
+        self.assertEqual([exporter.level_size(level) for level in range(exporter.n_levels)], [(1, 1), (2, 1), (3, 2), (6, 4), (11, 7)])
+    # end def
+
+    def test_reexport(self):
+        # Only missing tiles get rendered, unless the settings changed
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "image.dzi")
+            n_tiles = 1 + 1 + 1 + 2 + 6
+
+            def export(scale: float = 1.) -> int:
+                return CrazyMatrix(fibonacci(), self.WIDTH, self.HEIGHT, scale=scale).export_pyramid(filename, tile_size=self.TILE_SIZE,
+                                                                                                   overlap=self.OVERLAP)
+            # end def
+
+            self.assertEqual(export(), n_tiles)
+            self.assertEqual(export(), 0)
+
+            os.remove(os.path.join(tmp_dir, "image_files", "4", "1_1.png"))
+
+            self.assertEqual(export(), 1)
+            self.assertEqual(export(scale=.5), n_tiles)
+        # end with
+    # end def
+
+    def test_tile_pool(self):
+        # The workers render the same tiles
+        with tempfile.TemporaryDirectory() as tmp_dir, TilePool(n_workers=2) as pool:
+            for name, tile_pool in (("local", None), ("pool", pool)):
+                exporter = PyramidExporter(fibonacci(), self.WIDTH, self.HEIGHT, tile_size=self.TILE_SIZE, overlap=self.OVERLAP,
+                                           tile_pool=tile_pool)
+                exporter.export(os.path.join(tmp_dir, f"{name}.dzi"))
+            # end for
+
+            for level in range(5):
+                level_dir = os.path.join(tmp_dir, "local_files", str(level))
+
+                for tile in os.listdir(level_dir):
+                    np.testing.assert_array_equal(mpimg.imread(os.path.join(level_dir, tile)),
+                                                  mpimg.imread(os.path.join(tmp_dir, "pool_files", str(level), tile)))
+                # end for
+            # end for
+        # end with
+    # end def
+# end class
@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+
+from circuits import ALL, fibonacci
+from core.crazy_matrix import CrazyMatrix, EvalMode
+from core.render_cache import RenderCache
+
+
+__author__ = "Anton Höß"
+__copyright__ = "Copyright 2021"
+
+
+class TestRenderCache(unittest.TestCase):
+    def test_hits(self):
+        # Separate instances of the same circuit share their images, which get loaded as read-only memory maps
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = RenderCache(cache_dir)
+
+            for name, circuit in dict(ALL, fibonacci=fibonacci).items():
+                with self.subTest(name=name):
+                    ref = CrazyMatrix(circuit(), 9, 6, eval_mode=EvalMode.SCALAR).calc_image()
+                    z = CrazyMatrix(circuit(), 9, 6, render_cache=cache).calc_image()
+
+                    self.assertNotIsInstance(z, np.memmap)
+                    np.testing.assert_allclose(z, ref, rtol=1e-12)
+
+                    z = CrazyMatrix(circuit(), 9, 6, render_cache=cache).calc_image()
+
+                    self.assertIsInstance(z, np.memmap)
+                    self.assertFalse(z.flags.writeable)
+                    np.testing.assert_allclose(z, ref, rtol=1e-12)
+                # end with
+            # end for
+
+            # Other viewports are other images
+            ref = CrazyMatrix(fibonacci(), 9, 6, eval_mode=EvalMode.SCALAR, center=(1., 0.)).calc_image()
+            z = CrazyMatrix(fibonacci(), 9, 6, render_cache=cache, center=(1., 0.)).calc_image()
+
+            self.assertNotIsInstance(z, np.memmap)
+            np.testing.assert_allclose(z, ref, rtol=1e-12)
+            self.assertEqual(len(os.listdir(cache_dir)), len(ALL) + 2)
+        # end with
+    # end def
+
+    def test_byte_budget(self):
+        # Only the most recently used image fits
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = RenderCache(cache_dir, max_bytes=9 * 6 * 8 + 200)  # Including the header of the .npy files
+            CrazyMatrix(fibonacci(), 9, 6, render_cache=cache).calc_image()
+            CrazyMatrix(fibonacci(), 9, 6, render_cache=cache, center=(1., 0.)).calc_image()
+
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            self.assertIsInstance(CrazyMatrix(fibonacci(), 9, 6, render_cache=cache, center=(1., 0.)).calc_image(), np.memmap)
+            self.assertNotIsInstance(CrazyMatrix(fibonacci(), 9, 6, render_cache=cache).calc_image(), np.memmap)
+        # end with
+    # end def
+# end class
@@ -0,0 +1,127 @@
+import unittest
+from typing import Dict
+import numpy as np
+
+from base.basic import Circuit
+from base.black_box import RepeatBox
+from blocks.bool import Gt
+from blocks.const_var import Const, Variable
+from blocks.deprecated import Mul2
+from blocks.math import AddN, Div2, Sq, Sqrt
+from core.crazy_matrix import CrazyMatrix, EvalMode
+from core.sweep import ParameterSweep
+
+
+__author__ = "Anton Höß"
+__copyright__ = "Copyright 2021"
+
+
+def swept(radius: float = 6., offset: float = 0., step: float = 0., n_rep: int = 3) -> Circuit:
+    # Distance to the origin within the radius, plus 1 / (x + y + 3) with the offset where it's undefined, plus the radius times
+    # a Fibonacci-like sequence starting with x and y, which adds the step with each of its repetitions. Both constants of the
+    # radius get swept together.
+    c = Circuit()
+    sq_y = Sq()
+    sq_y.conn_to_prev_block(c.point, 1)
+    dist = Sqrt(AddN([Sq(c.point), sq_y]))
+    gt = Gt()
+    gt.conn_to_prev_block(Const(radius, "radius"), 0, 0)
+    gt.conn_to_prev_block(dist, 0, 1)
+    within = Mul2()
+    within.conn_to_prev_block(dist, 0, 0)
+    within.conn_to_prev_block(gt, 0, 1)
+
+    var = Variable()
+    add = AddN([Const(step, "step"), var])
+    rb = RepeatBox(2, "Fibonacci")
+    rb.assign_conn_in(add, None, 0)
+    rb.assign_conn_in(var, 0, 1)
+    rb.assign_pin_value(var, 0, 0)
+    rb.assign_pin_value(add, 0, 1)
+    rb.conn_to_prev_block(c.point, 0, 0)
+    rb.conn_to_prev_block(c.point, 1, 1)
+    rb.conn_to_prev_block(Const(n_rep), 0, 2)
+    seq = Mul2()
+    seq.conn_to_prev_block(rb, 1, 0)
+    seq.conn_to_prev_block(Const(radius, "radius"), 0, 1)
+
+    sum_xy = AddN([c.point, Const(3.)])
+    sum_xy.conn_to_prev_block(c.point, 1)
+    inv = Div2(Const(1.))
+    inv.conn_to_prev_block(sum_xy, 0, 1)
+    var_inv = Variable(offset, "offset")
+    var_inv.conn_to_prev_block(inv)
+
+    c.drawer.conn_to_prev_block(AddN([within, var_inv, seq]))
+
+    return c
+# end def
+
+
+class TestParameterSweep(unittest.TestCase):
+    # x + y + 3 is only 0 for the first pixel. Later on the scalar evaluation would keep the value of the previous pixel instead
+    # of the offset.
+    WIDTH, HEIGHT, CENTER, SCALE = 9, 6, (1., -.5), .5
+    NAMES = ["radius", "offset", "step", "Fibonacci"]
+    ASSIGNMENTS = [dict(radius=6., offset=0., step=0., Fibonacci=3), dict(radius=2., offset=-1.5, step=.5, Fibonacci=1),
+                   dict(radius=1.5, offset=2., step=-1., Fibonacci=5), dict(radius=4., offset=.25, step=2., Fibonacci=2)]
+
+    def ref(self, assignment: Dict[str, float]) -> np.ndarray:
+        # Scalar reference of the circuit built with the values of the assignment
+        c = swept(assignment["radius"], assignment["offset"], assignment["step"], assignment["Fibonacci"])
+
+        return CrazyMatrix(c, self.WIDTH, self.HEIGHT, eval_mode=EvalMode.SCALAR, center=self.CENTER, scale=self.SCALE).calc_image()
+    # end def
+
+    def sweep(self, **kwargs) -> ParameterSweep:
+        return ParameterSweep(swept(), self.WIDTH, self.HEIGHT, self.NAMES, center=self.CENTER, scale=self.SCALE, **kwargs)
+    # end def
+
+    def test_images(self):
+        # Each variant shows the same image as the circuit built with its values, no matter how the variants are batched
+        refs = np.array([self.ref(assignment) for assignment in self.ASSIGNMENTS])
+
+        for batch_size, n_threads in ((None, 1), (1, 1), (3, 1), (1, 2)):
+            with self.subTest(batch_size=batch_size, n_threads=n_threads):
+                z = self.sweep(batch_size=batch_size, n_threads=n_threads).calc_images(self.ASSIGNMENTS)
+
+                self.assertEqual(z.shape, (len(self.ASSIGNMENTS), self.HEIGHT, self.WIDTH))
+                np.testing.assert_allclose(z, refs, rtol=1e-12)
+            # end with
+        # end for
+
+        self.assertEqual(self.sweep().calc_images([]).shape, (0, self.HEIGHT, self.WIDTH))
+    # end def
+
+    def test_subset(self):
+        # Parameters that don't get swept keep the values of the circuit
+        sweep = ParameterSweep(swept(), self.WIDTH, self.HEIGHT, ["step"], center=self.CENTER, scale=self.SCALE)
+        assignments = [dict(radius=6., offset=0., step=step, Fibonacci=3) for step in (0., 1.)]
+        z = sweep.calc_images([dict(step=assignment["step"]) for assignment in assignments])
+
+        np.testing.assert_allclose(z, [self.ref(assignment) for assignment in assignments], rtol=1e-12)
+    # end def
+
+    def test_shared_ops(self):
+        # The distance only depends on the coordinates, so it gets evaluated once for all variants
+        sweep = self.sweep()
+
+        self.assertEqual(sweep.names, self.NAMES)
+        self.assertGreaterEqual(sweep.n_shared_ops, 4)
+        self.assertGreater(sweep.n_variant_ops, 0)
+    # end def
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            ParameterSweep(swept(), self.WIDTH, self.HEIGHT, ["radius", "missing"])
+        # end with
+
+        with self.assertRaises(ValueError):
+            self.sweep().calc_images([dict(radius=1., offset=0., step=0.)])
+        # end with
+
+        with self.assertRaises(ValueError):
+            self.sweep().calc_images([dict(self.ASSIGNMENTS[0], missing=1.)])
+        # end with
+    # end def
+# end class
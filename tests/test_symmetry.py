@@ -0,0 +1,96 @@
+from functools import partial
+import unittest
+import numpy as np
+
+from base.basic import Circuit
+from blocks.const_var import Const
+from blocks.math import MulN, Pow, Sq, Sub2
+from circuits import ALL, LIBRARY, doubling, fibonacci, library
+from core.crazy_matrix import CrazyMatrix, EvalMode
+from core.symmetry import Parity
+
+
+__author__ = "Anton Höß"
+__copyright__ = "Copyright 2021"
+
+
+class TestSymmetry(unittest.TestCase):
+    CIRCUITS = dict(ALL, fibonacci=fibonacci, doubling=doubling, **{name: partial(library, name, consts) for name, consts in LIBRARY.items()})
+
+    def test_mirrored(self):
+        # Images of odd sizes are symmetric around the middle pixel, even ones have an extra pixel at the start without a mirror
+        # image
+        for name, circuit in TestSymmetry.CIRCUITS.items():
+            for width, height in ((9, 7), (8, 6)):
+                ref = CrazyMatrix(circuit(), width, height, eval_mode=EvalMode.SCALAR).calc_image()
+
+                for mode in (EvalMode.VECTORIZED, EvalMode.TAPE):
+                    with self.subTest(name=name, width=width, mode=mode):
+                        z = CrazyMatrix(circuit(), width, height, eval_mode=mode, use_symmetry=True).calc_image()
+
+                        np.testing.assert_allclose(z, ref, rtol=1e-12)
+                    # end with
+                # end for
+            # end for
+        # end for
+    # end def
+
+    def test_parities(self):
+        expected = dict(const=(Parity.EVEN, Parity.EVEN), sin_y=(Parity.EVEN, Parity.ODD), cos_abs=(Parity.EVEN, Parity.EVEN),
+                        circle=(Parity.NONE, Parity.NONE), normal_standard_pdf=(Parity.EVEN, Parity.EVEN),
+                        if_else=(Parity.EVEN, Parity.NONE))
+
+        for name, parities in expected.items():
+            matrix = CrazyMatrix(TestSymmetry.CIRCUITS[name](), 9, 7, eval_mode=EvalMode.TAPE, use_symmetry=True)
+            matrix.calc_image()
+
+            self.assertEqual(matrix.symmetry, parities, name)
+        # end for
+    # end def
+
+    def test_mirrored_tiles(self):
+        # Along with threads, culling and tiles that contain the axis
+        for name in ("sin_y", "cos_abs", "normal_standard_pdf"):
+            ref = CrazyMatrix(TestSymmetry.CIRCUITS[name](), 15, 11, eval_mode=EvalMode.SCALAR).calc_image()
+            z = CrazyMatrix(TestSymmetry.CIRCUITS[name](), 15, 11, use_symmetry=True, n_threads=2, tile_size=3, cull_tiles=True).calc_image()
+
+            np.testing.assert_allclose(z, ref, rtol=1e-12, err_msg=name)
+        # end for
+    # end def
+
+    @staticmethod
+    def inv_pow(square: bool) -> Circuit:
+        # ((x - x) * x) ** -1, which is inf for x > 0 and -inf for x < 0, or (x - x) ** 2 ** -1, which is inf everywhere
+        c = Circuit()
+        sub = Sub2()
+        sub.conn_to_prev_block(c.point, 0, 0)
+        sub.conn_to_prev_block(c.point, 0, 1)
+
+        if square:
+            base = Sq(sub)
+        else:
+            base = MulN([sub])
+            base.conn_to_prev_block(c.point, 0)
+        # end if
+
+        pow_ = Pow()
+        pow_.conn_to_prev_block(base, 0, 0)
+        pow_.conn_to_prev_block(Const(-1.), 0, 1)
+        c.drawer.conn_to_prev_block(pow_)
+
+        return c
+    # end def
+
+    def test_sign_of_zero(self):
+        for square, parity in ((False, Parity.NONE), (True, Parity.EVEN)):
+            ref = CrazyMatrix(self.inv_pow(square), 7, 3, eval_mode=EvalMode.SCALAR).calc_image()
+
+            for mode in (EvalMode.VECTORIZED, EvalMode.TAPE):
+                matrix = CrazyMatrix(self.inv_pow(square), 7, 3, eval_mode=mode, use_symmetry=True)
+
+                np.testing.assert_array_equal(matrix.calc_image(), ref)
+                self.assertIs(matrix.symmetry[0], parity)
+            # end for
+        # end for
+    # end def
+# end class
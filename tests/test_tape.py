@@ -0,0 +1,81 @@
+import unittest
+import numpy as np
+
+from base.black_box import BlackBox
+from core.crazy_matrix import CrazyMatrix, EvalMode
+from core.tape import Tape, TapeCompiler
+from core.tile_pool import pixel_coords
+from circuits import ALL, const, cos_abs, sin_y, square
+
+
+__author__ = "Anton Höß"
+__copyright__ = "Copyright 2021"
+
+
+class TestTape(unittest.TestCase):
+    def test_run(self):
+        # Evaluating the tape for single coordinates gives the pixels of the scalar reference
+        width, height = 9, 6
+        xs, ys = pixel_coords(0, width, width), pixel_coords(0, height, height)
+
+        for name, circuit in ALL.items():
+            with self.subTest(name=name):
+                ref = CrazyMatrix(circuit(), width, height, eval_mode=EvalMode.SCALAR).calc_image()
+                c = circuit()
+                c.set_size(width, height)
+                tape = TapeCompiler().compile(c)
+
+                for i, j in ((0, 0), (2, 7), (5, 4), (3, 8)):
+                    self.assertAlmostEqual(float(tape.run(xs[j], ys[i])), ref[i, j], places=12)
+                # end for
+
+                np.testing.assert_allclose(tape.run_grid(xs, ys), ref, rtol=1e-12)
+            # end with
+        # end for
+    # end def
+
+    def test_tape_mode(self):
+        for name, circuit in ALL.items():
+            with self.subTest(name=name):
+                ref = CrazyMatrix(circuit(), 9, 6, eval_mode=EvalMode.SCALAR).calc_image()
+                z = CrazyMatrix(circuit(), 9, 6, eval_mode=EvalMode.TAPE).calc_image()
+
+                np.testing.assert_allclose(z, ref, rtol=1e-12)
+            # end with
+        # end for
+    # end def
+
+    def test_broadcasting(self):
+        # Values that only depend on one of the coordinates keep the shape of its row or column
+        width, height = 9, 6
+        xs, ys = pixel_coords(0, width, width), pixel_coords(0, height, height)
+
+        for circuit, shape in ((const, ()), (sin_y, (height, 1)), (cos_abs, (height, width))):
+            with self.subTest(name=circuit.__name__):
+                c = circuit()
+                c.set_size(width, height)
+                tape = TapeCompiler().compile(c)
+                ref = CrazyMatrix(circuit(), width, height, eval_mode=EvalMode.SCALAR).calc_image()
+
+                self.assertEqual(np.shape(tape.run(xs[np.newaxis, :], ys[:, np.newaxis])), shape)
+                np.testing.assert_allclose(tape.run_grid(xs, ys), ref, rtol=1e-12)
+            # end with
+        # end for
+    # end def
+
+    def test_box_layers_resolved(self):
+        # The pass-through layers of black boxes don't make it onto the tape, only the blocks inside the box
+        tape = TapeCompiler().compile(square())
+
+        self.assertFalse(any(isinstance(op.block, BlackBox) or type(op.block).__name__.startswith("_PassThrough") for op in tape.ops))
+        self.assertEqual(sum(type(op.block).__name__ == "And2" for op in tape.ops), 3)
+
+        # Topologically sorted, i.e. every slot gets written before it's read
+        written = {Tape.SLOT_X, Tape.SLOT_Y, Tape.SLOT_NONE, Tape.SLOT_T} | set(tape.consts)
+
+        for op in tape.ops:
+            self.assertLessEqual(op.reads(), written)
+            written |= set(op.outs)
+        # end for
+    # end def
+# end class
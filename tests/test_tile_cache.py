@@ -0,0 +1,86 @@
+import unittest
+import numpy as np
+
+from base.basic import Circuit
+from blocks.const_var import Const
+from blocks.math import MulN, Sin
+from circuits import ALL, fibonacci
+from core.crazy_matrix import CrazyMatrix, EvalMode
+from core.precision import Precision
+from core.tile_cache import TileCache
+
+
+__author__ = "Anton Höß"
+__copyright__ = "Copyright 2021"
+
+
+class TestTileCache(unittest.TestCase):
+    @staticmethod
+    def sin() -> Circuit:
+        c = Circuit()
+        mul = MulN([Const(1.1)])
+        mul.conn_to_prev_block(c.point, 0)
+        c.drawer.conn_to_prev_block(Sin(mul))
+
+        return c
+    # end def
+
+    def test_modes_kept_apart(self):
+        # With single precision, the scalar mode calculates with Python floats and only rounds the results
+        cache = TileCache()
+
+        for mode in (EvalMode.SCALAR, EvalMode.VECTORIZED):
+            z = CrazyMatrix(self.sin(), 8, 2, eval_mode=mode, tile_size=4, tile_cache=cache, precision=Precision.SINGLE).calc_image()
+            ref = CrazyMatrix(self.sin(), 8, 2, eval_mode=mode, tile_size=4, precision=Precision.SINGLE).calc_image()
+
+            np.testing.assert_array_equal(z, ref)
+        # end for
+    # end def
+
+    def test_hits(self):
+        # Cached tiles are aligned to the coordinates, i.e. x from -8 to 7 makes 4 columns of tiles. Re-rendering takes all
+        # tiles from the cache, panning by a tile the 3 columns both images have in common.
+        for name, circuit in dict(ALL, fibonacci=fibonacci).items():
+            with self.subTest(name=name):
+                cache = TileCache()
+                ref = CrazyMatrix(circuit(), 16, 8, eval_mode=EvalMode.SCALAR).calc_image()
+                z = CrazyMatrix(circuit(), 16, 8, tile_size=4, tile_cache=cache).calc_image()
+
+                np.testing.assert_allclose(z, ref, rtol=1e-12)
+                self.assertEqual((cache.hits, cache.misses, len(cache)), (0, 8, 8))
+
+                z = CrazyMatrix(circuit(), 16, 8, tile_size=4, tile_cache=cache).calc_image()
+
+                np.testing.assert_allclose(z, ref, rtol=1e-12)
+                self.assertEqual((cache.hits, cache.misses), (8, 8))
+
+                ref = CrazyMatrix(circuit(), 16, 8, eval_mode=EvalMode.SCALAR, center=(4., 0.)).calc_image()
+                z = CrazyMatrix(circuit(), 16, 8, tile_size=4, tile_cache=cache, center=(4., 0.)).calc_image()
+
+                np.testing.assert_allclose(z, ref, rtol=1e-12)
+                self.assertEqual((cache.hits, cache.misses), (14, 10))
+            # end with
+        # end for
+    # end def
+
+    def test_byte_budget(self):
+        # Least recently used tiles get evicted first, tiles larger than the budget don't get cached at all
+        tile = np.zeros((4, 4))
+        cache = TileCache(max_bytes=2 * tile.nbytes)
+        cache.put("a", tile)
+        cache.put("b", tile + 1)
+        cache.get("a")
+        cache.put("c", tile + 2)
+
+        self.assertIsNone(cache.get("b"))
+        np.testing.assert_array_equal(cache.get("a"), tile)
+        np.testing.assert_array_equal(cache.get("c"), tile + 2)
+        self.assertEqual(cache.n_bytes, 2 * tile.nbytes)
+        self.assertFalse(cache.get("a").flags.writeable)
+
+        cache.put("d", np.zeros((8, 8)))
+
+        self.assertIsNone(cache.get("d"))
+        self.assertEqual(len(cache), 2)
+    # end def
+# end class
@@ -0,0 +1,47 @@
+import glob
+import os
+import tempfile
+import unittest
+import numpy as np
+
+from circuits import ALL, fibonacci
+from core.crazy_matrix import CrazyMatrix, EvalMode
+from core.tile_pool import TilePool, tiles
+
+
+__author__ = "Anton Höß"
+__copyright__ = "Copyright 2021"
+
+
+class TestTilePool(unittest.TestCase):
+    def test_tiles(self):
+        # The tiles cover the image without overlapping
+        covered = np.zeros((7, 10), dtype=int)
+
+        for x_start, x_end, y_start, y_end in tiles(10, 7, 4):
+            self.assertLessEqual(max(x_end - x_start, y_end - y_start), 4)
+            covered[y_start:y_end, x_start:x_end] += 1
+        # end for
+
+        np.testing.assert_array_equal(covered, 1)
+    # end def
+
+    def test_render(self):
+        pattern = os.path.join(tempfile.gettempdir(), "tile_pool_*.pickle")
+        files = set(glob.glob(pattern))
+
+        with TilePool(n_workers=2, tile_size=4) as pool:
+            for name, circuit in dict(ALL, fibonacci=fibonacci).items():
+                with self.subTest(name=name):
+                    ref = CrazyMatrix(circuit(), 9, 6, eval_mode=EvalMode.SCALAR, center=(1., -.5), scale=.5).calc_image()
+                    z = CrazyMatrix(circuit(), 9, 6, tile_pool=pool, center=(1., -.5), scale=.5).calc_image()
+
+                    np.testing.assert_allclose(z, ref, rtol=1e-12)
+                # end with
+            # end for
+        # end with
+
+        # The circuits shipped to the workers got cleaned up
+        self.assertEqual(set(glob.glob(pattern)), files)
+    # end def
+# end class